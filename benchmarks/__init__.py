@@ -0,0 +1,10 @@
+import logging
+
+
+def quiet_logging():
+    """Silence the per-task INFO logging of the scheduler modules."""
+
+    for name in ("scheduler.runner", "scheduler.task_tracker",
+                 "scheduler.compact_tracker", "scheduler.executor",
+                 "scheduler.graph_cache"):
+        logging.getLogger(name).setLevel(logging.WARNING)
@@ -0,0 +1,66 @@
+"""Compare the makespan of a deep and wide graph with and without
+critical path priorities.
+
+Usage::
+
+    python -m benchmarks.critical_path --width 32 --depth 8 --limit 4
+"""
+import argparse
+import asyncio
+import time
+from benchmarks import quiet_logging
+from scheduler.models import RunnerConfig, Task
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+
+def build_chain_and_layer(width: int, depth: int,
+                          duration: float) -> TaskTracker:
+    """Build a graph with a wide layer of independent tasks, inserted first,
+    next to a long chain of tasks of the same duration."""
+
+    arguments = f"import time; time.sleep({duration})"
+    task_tracker = TaskTracker()
+    for i in range(width):
+        task_tracker.add_task(f"wide{i}",
+                              Task(type="eval", arguments=arguments))
+    for i in range(depth):
+        dependencies = (f"chain{i - 1}",) if i else ()
+        task_tracker.add_task(
+            f"chain{i}",
+            Task(type="eval", arguments=arguments,
+                 dependencies=dependencies),
+        )
+    task_tracker.prepare_topo_sorter()
+    return task_tracker
+
+
+async def measure(args, prioritize: bool) -> float:
+    """Run the graph and return the makespan in seconds."""
+
+    task_tracker = build_chain_and_layer(args.width, args.depth,
+                                         args.duration)
+    if not prioritize:
+        task_tracker.priorities = {}
+    start = time.perf_counter()
+    await run_tasks(task_tracker, RunnerConfig(max_concurrency=args.limit))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=32)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=0.05)
+    args = parser.parse_args()
+
+    quiet_logging()
+    fifo = asyncio.run(measure(args, prioritize=False))
+    critical = asyncio.run(measure(args, prioritize=True))
+    print(f"FIFO order:         {fifo:.3f}s")
+    print(f"Critical path order: {critical:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
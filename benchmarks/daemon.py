@@ -0,0 +1,92 @@
+"""Compare the per-graph overhead of cold runs with submissions to a daemon.
+
+Usage::
+
+    python -m benchmarks.daemon --graphs 20 --size 20
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.generators import chain, write_input
+from scheduler.submit import submit
+
+SCHEMA = os.path.join("assignment", "schema.json")
+
+
+def cold_runs(graphs: int, path: str) -> float:
+    """Run the graph `graphs` times with a new runner process each time and
+    return the mean wall clock time per graph in seconds."""
+
+    start = time.perf_counter()
+    for _ in range(graphs):
+        subprocess.run([sys.executable, "-m", "scheduler.runner",
+                        "--input", path, "--schema", SCHEMA,
+                        "--summary", "none"],
+                       check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) / graphs
+
+
+def client_runs(graphs: int, path: str, address: str) -> float:
+    """Submit the graph `graphs` times with a new client process each time
+    and return the mean wall clock time per graph in seconds."""
+
+    start = time.perf_counter()
+    for _ in range(graphs):
+        subprocess.run([sys.executable, "-m", "scheduler.submit", path,
+                        "--connect", address, "--quiet"],
+                       check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) / graphs
+
+
+async def warm_runs(graphs: int, path: str, address: str) -> float:
+    """Submit the graph `graphs` times from this process and return the mean
+    wall clock time per graph in seconds."""
+
+    start = time.perf_counter()
+    for _ in range(graphs):
+        done = await submit(address, path)
+        assert done["ok"]
+    return (time.perf_counter() - start) / graphs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--graphs", type=int, default=20,
+                        help="Number of graphs to run in each mode")
+    parser.add_argument("--size", type=int, default=20,
+                        help="Number of 'eval' tasks in the chain of each "
+                             "graph")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "input.json")
+        write_input(path, chain(args.size))
+        address = f"unix:{os.path.join(directory, 'daemon.sock')}"
+
+        print(f"{args.graphs} graphs of a {args.size}-task chain")
+        print(f"cold runner:  {cold_runs(args.graphs, path) * 1000:8.1f} "
+              "ms/graph")
+
+        daemon = subprocess.Popen(
+            [sys.executable, "-m", "scheduler.daemon", "--listen", address,
+             "--schema", SCHEMA],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(address[len("unix:"):]):
+                time.sleep(0.01)
+            elapsed = client_runs(args.graphs, path, address)
+            print(f"submit CLI:   {elapsed * 1000:8.1f} ms/graph")
+            elapsed = asyncio.run(warm_runs(args.graphs, path, address))
+            print(f"warm client:  {elapsed * 1000:8.1f} ms/graph")
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Measure per-edge dispatch latency on a long chain of no-op tasks.
+
+Usage::
+
+    python -m benchmarks.dispatch_latency --length 200
+"""
+import argparse
+import asyncio
+import time
+from benchmarks import quiet_logging
+from scheduler.models import Task
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+
+def build_chain(length: int, task_type: str = "eval") -> TaskTracker:
+    """Build a TaskTracker holding a linear chain of no-op tasks.
+
+    :param length: The number of tasks in the chain.
+    :param task_type: The type of the no-op tasks, "eval" or "exec".
+    :return: A TaskTracker with a prepared topological sorter.
+    """
+
+    arguments = "pass" if task_type == "eval" else "true"
+    task_tracker = TaskTracker()
+    for i in range(length):
+        dependencies = (f"task{i - 1}",) if i else ()
+        task_tracker.add_task(
+            f"task{i}",
+            Task(type=task_type, arguments=arguments,
+                 dependencies=dependencies),
+        )
+    task_tracker.prepare_topo_sorter()
+    return task_tracker
+
+
+async def measure(length: int, task_type: str = "eval") -> float:
+    """Run a chain and return the wall clock time in seconds."""
+
+    task_tracker = build_chain(length, task_type)
+    start = time.perf_counter()
+    await run_tasks(task_tracker)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--length", type=int, default=200)
+    parser.add_argument("--type", choices=["eval", "exec"], default="eval")
+    args = parser.parse_args()
+
+    quiet_logging()
+
+    elapsed = asyncio.run(measure(args.length, args.type))
+    print(f"{args.length} {args.type} tasks in {elapsed:.4f}s, "
+          f"{elapsed / args.length * 1e6:.1f} us per edge")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Measure throughput as worker processes are added to a coordinator.
+
+Usage::
+
+    python -m benchmarks.distributed --workers 1 2 4 8 --width 400 \\
+        --capacity 4 --sleep 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from benchmarks import quiet_logging
+from benchmarks.fanout import build_fanout
+from scheduler.coordinator import RemoteExecutor
+from scheduler.models import RunnerConfig, Task
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+
+def build_sleeps(width: int, sleep: float) -> TaskTracker:
+    """Build a fan-out of `width` exec tasks that sleep for `sleep` seconds,
+    or of no-op tasks if it is 0."""
+
+    if not sleep:
+        return build_fanout(width)
+    task_tracker = TaskTracker()
+    task_tracker.add_task("root", Task(type="exec", arguments="true"))
+    for i in range(width):
+        task_tracker.add_task(
+            f"task{i}",
+            Task(type="exec", arguments=f"sleep {sleep}",
+                 dependencies=("root",)))
+    task_tracker.prepare_topo_sorter()
+    return task_tracker
+
+
+async def measure(workers: int, capacity: int,
+                  task_tracker: TaskTracker) -> float:
+    """Run a graph on `workers` worker processes and return the wall clock
+    time in seconds, from all workers being connected to the end."""
+
+    with tempfile.TemporaryDirectory() as directory:
+        address = f"unix:{os.path.join(directory, 'coordinator.sock')}"
+        async with RemoteExecutor(address) as executor:
+            processes = [
+                await asyncio.create_subprocess_exec(
+                    sys.executable, "-m", "scheduler.worker",
+                    "--connect", address, "--capacity", str(capacity),
+                    stdout=asyncio.subprocess.DEVNULL)
+                for _ in range(workers)]
+            while len(executor.workers) < workers:
+                await asyncio.sleep(0.01)
+            start = time.perf_counter()
+            await run_tasks(task_tracker, executor=executor)
+            elapsed = time.perf_counter() - start
+        for process in processes:
+            await process.wait()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[1, 2, 4, 8])
+    parser.add_argument("--width", type=int, default=400)
+    parser.add_argument("--capacity", type=int, default=4,
+                        help="Tasks each worker runs at once")
+    parser.add_argument("--sleep", type=float, default=0.05,
+                        help="Duration of each task, 0 for no-op tasks")
+    args = parser.parse_args()
+
+    quiet_logging()
+    arguments = f"sleep {args.sleep}" if args.sleep else "true"
+    print(f"{args.width} x '{arguments}', capacity {args.capacity} "
+          "per worker")
+
+    # A local run with the capacity of one worker, as the baseline
+    task_tracker = build_sleeps(args.width, args.sleep)
+    config = RunnerConfig(max_concurrency=args.capacity)
+    start = time.perf_counter()
+    asyncio.run(run_tasks(task_tracker, config))
+    elapsed = time.perf_counter() - start
+    print(f"local:     {elapsed:7.2f}s  {args.width / elapsed:8.1f} tasks/s")
+
+    for workers in args.workers:
+        task_tracker = build_sleeps(args.width, args.sleep)
+        elapsed = asyncio.run(measure(workers, args.capacity, task_tracker))
+        print(f"{workers} workers: {elapsed:7.2f}s  "
+              f"{args.width / elapsed:8.1f} tasks/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Measure the throughput of tiny 'eval' tasks with and without batching.
+
+Usage::
+
+    python -m benchmarks.eval_batching --width 20000 --eval-mode thread
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks import quiet_logging
+from benchmarks.fanout import build_fanout
+from scheduler import logger as scheduler_logger
+from scheduler.logger import configure_logging
+from scheduler.models import RunnerConfig
+from scheduler.runner import run_tasks
+
+
+async def measure(width: int, config: RunnerConfig) -> float:
+    """Run a fan-out of no-op 'eval' tasks and return the wall clock time
+    in seconds."""
+
+    task_tracker = build_fanout(width, "eval")
+    start = time.perf_counter()
+    await run_tasks(task_tracker, config)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=20000)
+    parser.add_argument("--eval-mode", choices=["thread", "process"],
+                        default="thread")
+    parser.add_argument("--log", action="store_true",
+                        help="Keep the per-task logging, written to "
+                             "/dev/null")
+    args = parser.parse_args()
+
+    if args.log:
+        scheduler_logger._output.setStream(open(os.devnull, "w"))
+    else:
+        quiet_logging()
+
+    for threshold in (0.0, 0.001):
+        config = RunnerConfig(eval_mode=args.eval_mode,
+                              eval_batch_threshold=threshold)
+        elapsed = asyncio.run(measure(args.width, config))
+        label = "unbatched" if not threshold else "batched"
+        print(f"{label:10} {args.width + 1} tasks in {elapsed:.3f}s, "
+              f"{(args.width + 1) / elapsed:.0f} tasks/s")
+    # Wait for the queued records before exiting
+    configure_logging(queued=False)
+
+
+if __name__ == "__main__":
+    main()
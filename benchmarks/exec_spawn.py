@@ -0,0 +1,57 @@
+"""Measure the throughput of short 'exec' tasks in every exec mode.
+
+Usage::
+
+    python -m benchmarks.exec_spawn --count 2000 --command true
+"""
+import argparse
+import asyncio
+import time
+from benchmarks import quiet_logging
+from scheduler.models import RunnerConfig, Task
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+MODES = {
+    "shell": {"exec_mode": "shell"},
+    "direct": {"exec_mode": "direct"},
+    "direct+spawner": {"exec_mode": "direct", "exec_spawner": True},
+}
+
+
+def build_independent(count: int, command: str) -> TaskTracker:
+    """Build a TaskTracker with `count` independent 'exec' tasks."""
+
+    task_tracker = TaskTracker()
+    for i in range(count):
+        task_tracker.add_task(f"task{i}",
+                              Task(type="exec", arguments=command))
+    task_tracker.prepare_topo_sorter()
+    return task_tracker
+
+
+async def measure(count: int, command: str, config: RunnerConfig) -> float:
+    """Run the tasks and return the throughput in tasks per second."""
+
+    task_tracker = build_independent(count, command)
+    start = time.perf_counter()
+    await run_tasks(task_tracker, config)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--command", default="true")
+    parser.add_argument("--max-exec", type=int, default=16)
+    args = parser.parse_args()
+
+    quiet_logging()
+    for mode, options in MODES.items():
+        config = RunnerConfig(max_exec=args.max_exec, **options)
+        rate = asyncio.run(measure(args.count, args.command, config))
+        print(f"{mode:>15}: {rate:8.0f} tasks/s  ({args.command!r})")
+
+
+if __name__ == "__main__":
+    main()
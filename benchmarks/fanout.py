@@ -0,0 +1,66 @@
+"""Measure throughput of a wide fan-out of no-op tasks.
+
+Usage::
+
+    python -m benchmarks.fanout --width 5000 --max-exec 16
+"""
+import argparse
+import asyncio
+import time
+from benchmarks import quiet_logging
+from scheduler.models import RunnerConfig, Task
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+
+def build_fanout(width: int, task_type: str = "exec") -> TaskTracker:
+    """Build a TaskTracker with one root task and `width` dependents.
+
+    :param width: The number of tasks depending on the root task.
+    :param task_type: The type of the no-op tasks, "eval" or "exec".
+    :return: A TaskTracker with a prepared topological sorter.
+    """
+
+    arguments = "pass" if task_type == "eval" else "true"
+    task_tracker = TaskTracker()
+    task_tracker.add_task("root", Task(type=task_type, arguments=arguments))
+    for i in range(width):
+        task_tracker.add_task(
+            f"task{i}",
+            Task(type=task_type, arguments=arguments,
+                 dependencies=("root",)),
+        )
+    task_tracker.prepare_topo_sorter()
+    return task_tracker
+
+
+async def measure(width: int, task_type: str,
+                  config: RunnerConfig) -> float:
+    """Run a fan-out and return the wall clock time in seconds."""
+
+    task_tracker = build_fanout(width, task_type)
+    start = time.perf_counter()
+    await run_tasks(task_tracker, config)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=5000)
+    parser.add_argument("--type", choices=["eval", "exec"], default="exec")
+    parser.add_argument("--max-concurrency", type=int)
+    parser.add_argument("--max-exec", type=int)
+    parser.add_argument("--max-eval", type=int)
+    args = parser.parse_args()
+
+    quiet_logging()
+    config = RunnerConfig(max_concurrency=args.max_concurrency,
+                          max_exec=args.max_exec,
+                          max_eval=args.max_eval)
+    elapsed = asyncio.run(measure(args.width, args.type, config))
+    print(f"{args.width + 1} {args.type} tasks in {elapsed:.3f}s, "
+          f"{(args.width + 1) / elapsed:.0f} tasks/s")
+
+
+if __name__ == "__main__":
+    main()
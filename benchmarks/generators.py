@@ -0,0 +1,97 @@
+"""Generators of synthetic task graphs in the input file format.
+
+Every generator returns a list of task records with `size` tasks in
+topological order, running no-op commands or snippets of the given type.
+"""
+import json
+import random
+from typing import Any, Callable, Dict, List
+
+Record = Dict[str, Any]
+
+NOOP = {"exec": "true", "eval": "pass"}
+
+
+def _record(name: str, task_type: str, dependencies: List[str]) -> Record:
+    return {"name": name, "type": task_type, "arguments": NOOP[task_type],
+            "dependencies": dependencies}
+
+
+def chain(size: int, task_type: str = "eval") -> List[Record]:
+    """A single chain, every task depends on the previous one."""
+
+    return [_record(f"t{i}", task_type, [f"t{i - 1}"] if i else [])
+            for i in range(size)]
+
+
+def fanout(size: int, task_type: str = "eval") -> List[Record]:
+    """One root task with `size - 1` dependents."""
+
+    return [_record("t0", task_type, [])] + [
+        _record(f"t{i}", task_type, ["t0"]) for i in range(1, size)]
+
+
+def fanin(size: int, task_type: str = "eval") -> List[Record]:
+    """`size - 1` independent tasks and one task depending on all of them."""
+
+    records = [_record(f"t{i}", task_type, []) for i in range(size - 1)]
+    records.append(_record(f"t{size - 1}", task_type,
+                           [record["name"] for record in records]))
+    return records
+
+
+def diamonds(size: int, task_type: str = "eval",
+             width: int = 8) -> List[Record]:
+    """A chain of diamonds: every join task fans out to `width` tasks,
+    which all fan back in to the next join task."""
+
+    records = [_record("t0", task_type, [])]
+    join = "t0"
+    while len(records) < size:
+        middle = []
+        for _ in range(min(width, size - len(records) - 1) or 1):
+            name = f"t{len(records)}"
+            records.append(_record(name, task_type, [join]))
+            middle.append(name)
+        if len(records) < size:
+            join = f"t{len(records)}"
+            records.append(_record(join, task_type, middle))
+    return records
+
+
+def layered(size: int, task_type: str = "eval", width: int = 100,
+            max_dependencies: int = 4, seed: int = 0) -> List[Record]:
+    """Layers of `width` tasks, each depending on up to `max_dependencies`
+    random tasks of the previous layer."""
+
+    rng = random.Random(seed)
+    records = []
+    previous: List[str] = []
+    while len(records) < size:
+        layer = []
+        for _ in range(min(width, size - len(records))):
+            name = f"t{len(records)}"
+            dependencies = []
+            if previous:
+                count = rng.randint(1, min(max_dependencies, len(previous)))
+                dependencies = rng.sample(previous, count)
+            records.append(_record(name, task_type, dependencies))
+            layer.append(name)
+        previous = layer
+    return records
+
+
+SHAPES: Dict[str, Callable[..., List[Record]]] = {
+    "chain": chain,
+    "fanout": fanout,
+    "fanin": fanin,
+    "diamonds": diamonds,
+    "layered": layered,
+}
+
+
+def write_input(path: str, records: List[Record]):
+    """Write task records to an input file."""
+
+    with open(path, "w") as f:
+        json.dump({"tasks": records}, f)
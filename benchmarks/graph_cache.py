@@ -0,0 +1,59 @@
+"""Compare loading and preparing a graph with and without the graph cache.
+
+Every measurement loads the input file into a new tracker and prepares it,
+validated against the schema of the assignment: without a cache, on a
+miss, which also writes the cache, and on a hit.
+
+Usage::
+
+    python -m benchmarks.graph_cache --sizes 10000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+from benchmarks import quiet_logging
+from benchmarks.generators import layered, write_input
+from scheduler.compact_tracker import CompactTaskTracker
+from scheduler.loader import load_tasks
+from scheduler.task_tracker import TaskTracker
+
+SCHEMA = os.path.join(os.path.dirname(__file__), os.pardir, "assignment",
+                      "schema.json")
+
+TRACKERS = {"dict": TaskTracker, "compact": CompactTaskTracker}
+
+
+def measure(tracker_class, path: str, cache_dir=None) -> float:
+    start = time.perf_counter()
+    tracker = tracker_class()
+    load_tasks(tracker, path, SCHEMA, cache_dir=cache_dir)
+    tracker.prepare_topo_sorter()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000])
+    parser.add_argument("--trackers", nargs="+", choices=list(TRACKERS),
+                        default=list(TRACKERS))
+    args = parser.parse_args()
+
+    quiet_logging()
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "input.json")
+            write_input(path, layered(size))
+            for name in args.trackers:
+                cache_dir = os.path.join(directory, f"cache-{name}")
+                tracker_class = TRACKERS[name]
+                uncached = measure(tracker_class, path)
+                miss = measure(tracker_class, path, cache_dir)
+                hit = measure(tracker_class, path, cache_dir)
+                print(f"{size:8} {name:8} no cache {uncached:7.3f}s  "
+                      f"miss {miss:7.3f}s  hit {hit:7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
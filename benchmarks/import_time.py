@@ -0,0 +1,71 @@
+"""Measure the import time of the command line entry points.
+
+Every module is imported in a fresh interpreter with `-X importtime`, and
+the median of the cumulative time is compared with a budget. The exit
+status is 1 when a module exceeds its budget, so this can run in CI.
+
+Usage::
+
+    python -m benchmarks.import_time --runs 9 --budget 450
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import List, Tuple
+
+MODULES = ("scheduler.runner", "scheduler.submit", "scheduler.worker")
+
+
+def import_times(module: str) -> List[Tuple[int, int, str]]:
+    """Import a module in a fresh interpreter and return the depth, the
+    cumulative import time in microseconds and the name of every module it
+    imported, in the order of the `-X importtime` report."""
+
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True)
+    times = []
+    for line in process.stderr.splitlines()[1:]:
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.append((depth, int(cumulative), name.strip()))
+    return times
+
+
+def measure(module: str, runs: int) -> Tuple[float, List[Tuple[int, str]]]:
+    """Return the median import time of a module in milliseconds, and the
+    slowest of the modules it imports directly in the last run."""
+
+    medians = []
+    for _ in range(runs):
+        times = import_times(module)
+        medians.append(times[-1][1] / 1000)
+    direct = [(cumulative, name) for depth, cumulative, name in times
+              if depth == 1]
+    return statistics.median(medians), sorted(direct, reverse=True)[:5]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument("--budget", type=float, metavar="MS",
+                        help="Fail if a module takes longer than this to "
+                             "import")
+    args = parser.parse_args()
+
+    over_budget = False
+    for module in args.modules:
+        median, slowest = measure(module, args.runs)
+        print(f"{module:20} {median:8.1f} ms")
+        for cumulative, name in slowest:
+            print(f"    {name:28} {cumulative / 1000:8.1f} ms")
+        if args.budget is not None and median > args.budget:
+            print(f"    over the budget of {args.budget:.0f} ms")
+            over_budget = True
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
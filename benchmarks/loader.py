@@ -0,0 +1,112 @@
+"""Measure load time and peak memory of the task loader.
+
+Usage::
+
+    python -m benchmarks.loader --sizes 10000 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from benchmarks import quiet_logging
+from scheduler.loader import (
+    load_and_validate_data,
+    load_tasks,
+    populate_task_tracker,
+    validate_eval_snippets,
+    validate_unique_task_names,
+)
+from scheduler.task_tracker import TaskTracker
+
+SCHEMA = os.path.join(os.path.dirname(__file__), os.pardir, "assignment",
+                      "schema.json")
+
+
+def write_input(path: str, count: int):
+    """Write an input file with `count` tasks, each depending on the
+    previous two."""
+
+    tasks = []
+    for i in range(count):
+        tasks.append({
+            "name": f"task{i}",
+            "type": "exec" if i % 2 else "eval",
+            "arguments": "true" if i % 2 else "x = 1",
+            "dependencies": [f"task{j}" for j in (i - 1, i - 2) if j >= 0],
+        })
+    with open(path, "w") as f:
+        json.dump({"tasks": tasks}, f)
+
+
+def load_full(path: str) -> TaskTracker:
+    """Load a file with the previous multi-pass loader."""
+
+    task_tracker = TaskTracker()
+    data = load_and_validate_data(path, SCHEMA)
+    validate_unique_task_names(data.tasks)
+    validate_eval_snippets(data.tasks)
+    populate_task_tracker(task_tracker, data.tasks)
+    return task_tracker
+
+
+def load_streaming(path: str) -> TaskTracker:
+    task_tracker = TaskTracker()
+    load_tasks(task_tracker, path, SCHEMA)
+    return task_tracker
+
+
+def load_unchecked(path: str) -> TaskTracker:
+    """Load a file without the schema, validating the Pydantic model."""
+
+    task_tracker = TaskTracker()
+    load_tasks(task_tracker, path)
+    return task_tracker
+
+
+def load_trusted(path: str) -> TaskTracker:
+    """Load a file without the schema, with the trusted fast path."""
+
+    task_tracker = TaskTracker()
+    load_tasks(task_tracker, path, trusted=True)
+    return task_tracker
+
+
+def measure(loader, path: str):
+    """Return the load time in seconds and the peak traced memory in MiB."""
+
+    start = time.perf_counter()
+    loader(path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    loader(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 50000, 100000])
+    args = parser.parse_args()
+
+    quiet_logging()
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"input{size}.json")
+            write_input(path, size)
+            for name, loader in (("full", load_full),
+                                 ("streaming", load_streaming),
+                                 ("no schema", load_unchecked),
+                                 ("trusted", load_trusted)):
+                elapsed, peak = measure(loader, path)
+                print(f"{size:>8} tasks {name:>9}: {elapsed:7.3f}s "
+                      f"({elapsed / size * 1e6:5.1f} us/task), "
+                      f"peak {peak:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
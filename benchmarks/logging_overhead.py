@@ -0,0 +1,67 @@
+"""Measure the cost of logging per task, with a slow log sink.
+
+Usage::
+
+    python -m benchmarks.logging_overhead --count 5000 --write-delay 0.0001
+"""
+import argparse
+import asyncio
+import logging
+import time
+from benchmarks import quiet_logging
+from benchmarks.fanout import build_fanout
+from scheduler import logger as scheduler_logger
+from scheduler.logger import configure_logging
+from scheduler.models import RunnerConfig
+from scheduler.runner import run_tasks
+
+
+class SlowStream:
+    """A stream that takes `delay` seconds for every write, like a slow
+    terminal or a full pipe."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def write(self, data: str) -> int:
+        time.sleep(self.delay)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def measure(count: int) -> float:
+    """Run a fan-out of no-op eval tasks, return the seconds per task."""
+
+    task_tracker = build_fanout(count - 1, "eval")
+    start = time.perf_counter()
+    # Without batching, every task logs its start and end
+    asyncio.run(run_tasks(task_tracker, RunnerConfig(eval_batch_threshold=0)))
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--write-delay", type=float, default=0.0001)
+    args = parser.parse_args()
+
+    scheduler_logger._output.setStream(SlowStream(args.write_delay))
+    for mode in ("quiet", "sync", "queued", "json"):
+        if mode == "quiet":
+            quiet_logging()
+        else:
+            for name in ("scheduler.runner", "scheduler.task_tracker",
+                         "scheduler.executor"):
+                logging.getLogger(name).setLevel(logging.INFO)
+            configure_logging("json" if mode == "json" else "text",
+                              queued=mode != "sync")
+        per_task = measure(args.count)
+        print(f"{mode:>7}: {per_task * 1e6:6.1f} us/task")
+    # Wait for the queued records before exiting
+    configure_logging(queued=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measure how well tasks with CPU requirements are packed.
+
+A few chains of one-CPU tasks, which are on the critical path, run next to
+wide tasks that need all CPUs and independent one-CPU tasks, against a
+fixed capacity: with a plain count limit, in strict priority order and
+with backfilling. The tasks sleep, so the CPUs are only accounted for, and
+the utilization is the share of the CPU seconds of the capacity that the
+tasks reserved.
+
+Usage::
+
+    python -m benchmarks.packing --cpus 8 --chains 3 --wide 2 --narrow 40
+"""
+import argparse
+import asyncio
+import time
+from benchmarks import quiet_logging
+from scheduler.models import RunnerConfig, Task
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+
+def build_mix(cpus: int, chains: int, length: int, wide: int, narrow: int,
+              sleep: float) -> TaskTracker:
+    """Build `chains` chains of `length` one-CPU tasks, `wide` tasks that
+    need all `cpus` and run four times longer, and `narrow` independent
+    one-CPU tasks."""
+
+    task_tracker = TaskTracker()
+    for chain in range(chains):
+        for i in range(length):
+            dependencies = (f"chain{chain}_{i - 1}",) if i else ()
+            task_tracker.add_task(f"chain{chain}_{i}", Task(
+                type="exec", arguments=f"sleep {sleep}", duration=sleep,
+                dependencies=dependencies, cpus=1))
+    for i in range(wide):
+        task_tracker.add_task(f"wide{i}", Task(
+            type="exec", arguments=f"sleep {4 * sleep}", duration=4 * sleep,
+            cpus=cpus))
+    for i in range(narrow):
+        task_tracker.add_task(f"narrow{i}", Task(
+            type="exec", arguments=f"sleep {sleep}", duration=sleep, cpus=1))
+    task_tracker.prepare_topo_sorter()
+    return task_tracker
+
+
+async def measure(task_tracker: TaskTracker, config: RunnerConfig) -> float:
+    start = time.perf_counter()
+    await run_tasks(task_tracker, config)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cpus", type=int, default=8)
+    parser.add_argument("--chains", type=int, default=3)
+    parser.add_argument("--length", type=int, default=10)
+    parser.add_argument("--wide", type=int, default=2)
+    parser.add_argument("--narrow", type=int, default=40)
+    parser.add_argument("--sleep", type=float, default=0.1,
+                        help="Duration of a narrow task")
+    args = parser.parse_args()
+
+    quiet_logging()
+    reserved = (args.chains * args.length + args.wide * args.cpus * 4
+                + args.narrow) * args.sleep
+    modes = (
+        # Requirements ignored, only the number of tasks is limited
+        ("count limit", RunnerConfig(max_concurrency=args.cpus,
+                                     cpu_capacity=float("inf"))),
+        ("strict order", RunnerConfig(cpu_capacity=args.cpus,
+                                      backfill_window=0)),
+        ("backfill", RunnerConfig(cpu_capacity=args.cpus)),
+    )
+    for label, config in modes:
+        task_tracker = build_mix(args.cpus, args.chains, args.length,
+                                 args.wide, args.narrow, args.sleep)
+        elapsed = asyncio.run(measure(task_tracker, config))
+        utilization = reserved / (args.cpus * elapsed)
+        print(f"{label:13} {elapsed:6.2f}s  utilization "
+              f"{utilization:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
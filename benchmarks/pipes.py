@@ -0,0 +1,81 @@
+"""Compare passing data between exec tasks through files and through pipes.
+
+A producer writes random data, which is compressed and decompressed by a
+chain of tasks and then counted and hashed by two readers. The tasks pass
+the data through intermediate files in one run and stream it through pipes
+in the other, where the fan-out at the end goes through `tee`.
+
+Usage::
+
+    python -m benchmarks.pipes --size-mb 64
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from benchmarks import quiet_logging
+from scheduler.models import RunnerConfig, Task, TaskStatus
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+STAGES = [("produce", "head -c {size}M /dev/urandom"),
+          ("compress", "gzip -1"),
+          ("decompress", "gzip -d")]
+READERS = [("count", "wc -c"), ("hash", "sha256sum")]
+
+
+def build_pipeline(size_mb: int, directory: str, piped: bool
+                   ) -> TaskTracker:
+    """Build the stages and the readers, with files or pipes between them.
+
+    :param size_mb: The amount of data the producer writes, in MiB.
+    :param directory: The directory of the intermediate and output files.
+    :param piped: Whether to connect the tasks with pipes.
+    :return: A TaskTracker with a prepared topological sorter.
+    """
+
+    task_tracker = TaskTracker()
+    source = None
+    for name, command in [*STAGES, *READERS]:
+        command = command.format(size=size_mb)
+        if source is not None and not piped:
+            command += f" < {os.path.join(directory, source)}"
+        if name in dict(READERS) or not piped:
+            command += f" > {os.path.join(directory, name)}"
+        task_tracker.add_task(name, Task(
+            type="exec", arguments=command,
+            dependencies=(source,) if source else (),
+            stdin_from=source if piped else None))
+        if name in dict(STAGES):
+            source = name
+    task_tracker.prepare_topo_sorter()
+    return task_tracker
+
+
+async def measure(size_mb: int, piped: bool) -> float:
+    """Run the pipeline and return the wall clock time in seconds."""
+
+    with tempfile.TemporaryDirectory() as directory:
+        task_tracker = build_pipeline(size_mb, directory, piped)
+        start = time.perf_counter()
+        await run_tasks(task_tracker, RunnerConfig())
+        elapsed = time.perf_counter() - start
+        assert all(task.status == TaskStatus.OK
+                   for task in task_tracker.tasks.values())
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64)
+    args = parser.parse_args()
+
+    quiet_logging()
+    for piped in (False, True):
+        elapsed = asyncio.run(measure(args.size_mb, piped))
+        print(f"{'pipes' if piped else 'files':6} {elapsed:7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare running a whole graph with running a selected part of it.
+
+The graph is a layered graph of no-op `eval` tasks. The selections are
+one task of an early layer with its dependencies (`--target`) and one task
+of a late layer with its dependents (`--only-downstream-of`). The time
+covers the selection, the preparation of the graph and the run, not the
+loading.
+
+Usage::
+
+    python -m benchmarks.selection --size 50000 --width 100
+"""
+import argparse
+import asyncio
+import time
+from benchmarks import quiet_logging
+from benchmarks.generators import layered
+from scheduler.compact_tracker import CompactTaskTracker
+from scheduler.models import RunnerConfig, Task
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+TRACKERS = {"dict": TaskTracker, "compact": CompactTaskTracker}
+
+
+def build(tracker_class, records):
+    tracker = tracker_class()
+    for record in records:
+        tracker.add_task(record["name"], Task(
+            type=record["type"], arguments=record["arguments"],
+            dependencies=tuple(record["dependencies"])))
+    return tracker
+
+
+async def measure(tracker, selection) -> float:
+    start = time.perf_counter()
+    if selection:
+        tracker.select(**selection)
+    tracker.prepare_topo_sorter()
+    await run_tasks(tracker, RunnerConfig())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--width", type=int, default=100)
+    parser.add_argument("--trackers", nargs="+", choices=list(TRACKERS),
+                        default=list(TRACKERS))
+    args = parser.parse_args()
+
+    quiet_logging()
+    records = layered(args.size, width=args.width)
+    selections = (
+        ("all", {}),
+        ("target", {"targets": [records[5 * args.width]["name"]]}),
+        ("downstream", {"downstream_of": [
+            records[-5 * args.width]["name"]]}),
+    )
+    for name in args.trackers:
+        for label, selection in selections:
+            tracker = build(TRACKERS[name], records)
+            elapsed = asyncio.run(measure(tracker, selection))
+            print(f"{name:8} {label:11} {len(tracker.tasks):7} tasks "
+                  f"{elapsed:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
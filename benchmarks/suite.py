@@ -0,0 +1,197 @@
+"""Run the scheduler on synthetic graphs and record its overhead.
+
+Every case generates a graph, writes it to an input file and runs it in a
+fresh interpreter, which measures the load time, the prepare time, the
+makespan of the run, the wall time per task and the peak RSS. The
+results are written to a JSON file, which can be compared with an earlier
+one.
+
+Usage::
+
+    python -m benchmarks.suite --shapes chain layered --sizes 1000 100000 \\
+        --output results.json --baseline previous.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks import quiet_logging
+from benchmarks.generators import SHAPES, write_input
+from scheduler.compact_tracker import CompactTaskTracker
+from scheduler.loader import load_tasks
+from scheduler.models import RunnerConfig
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+from typing import Any, Dict, List, Optional
+
+SCHEMA = os.path.join(os.path.dirname(__file__), os.pardir, "assignment",
+                      "schema.json")
+
+TRACKERS = {"dict": TaskTracker, "compact": CompactTaskTracker}
+
+# Metrics where a lower value is better, compared with the baseline
+METRICS = ("load_s", "prepare_s", "makespan_s", "wall_us_per_task",
+           "peak_rss_mib")
+
+# Former names of the metrics, found in older result files
+RENAMED = {"wall_us_per_task": "dispatch_us_per_task"}
+
+
+def run_case(path: str, size: int, tracker: str, run: bool,
+             config: RunnerConfig) -> Dict[str, Any]:
+    """Load, prepare and run an input file in this process.
+
+    :return: The measurements of the case.
+    """
+
+    quiet_logging()
+    task_tracker = TRACKERS[tracker]()
+
+    start = time.perf_counter()
+    load_tasks(task_tracker, path, SCHEMA)
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    task_tracker.prepare_topo_sorter()
+    prepare = time.perf_counter() - start
+
+    result = {"load_s": load, "prepare_s": prepare}
+    if run:
+        start = time.perf_counter()
+        asyncio.run(run_tasks(task_tracker, config))
+        makespan = time.perf_counter() - start
+        result["makespan_s"] = makespan
+        # The whole run per task, including the time the tasks take
+        result["wall_us_per_task"] = makespan / size * 1e6
+
+    # ru_maxrss is in KiB on Linux
+    result["peak_rss_mib"] = (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+    return result
+
+
+def measure(shape: str, size: int, task_type: str, tracker: str, run: bool,
+            config: RunnerConfig, tmp: str) -> Dict[str, Any]:
+    """Generate a case and measure it in a child interpreter, so the peak
+    RSS of every case is measured on its own.
+
+    The input is generated in another child: Linux carries the peak RSS of
+    the parent over into the child, so the parent has to stay small.
+    """
+
+    path = os.path.join(tmp, f"{shape}-{size}-{task_type}.json")
+    if not os.path.exists(path):
+        subprocess.run([sys.executable, "-m", "benchmarks.suite",
+                        "--generate", shape, str(size), task_type, path],
+                       check=True)
+    case = {"path": path, "size": size, "tracker": tracker, "run": run,
+            "config": config.model_dump(mode="json")}
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--case", json.dumps(case)],
+        check=True, capture_output=True, text=True).stdout
+    result = {"shape": shape, "size": size, "type": task_type,
+              "tracker": tracker}
+    result.update(json.loads(output.splitlines()[-1]))
+    return result
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any]):
+    """Print the relative change of every metric against a baseline."""
+
+    def key(result):
+        return (result["shape"], result["size"], result["type"],
+                result["tracker"])
+
+    previous = {key(result): result for result in baseline["results"]}
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        changes = []
+        for metric in METRICS:
+            before = old.get(metric, old.get(RENAMED.get(metric)))
+            if metric in result and before:
+                change = (result[metric] - before) / before * 100
+                changes.append(f"{metric} {change:+.1f}%")
+        print(f"{'/'.join(map(str, key(result)))}: {', '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shapes", nargs="+", choices=list(SHAPES),
+                        default=list(SHAPES))
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000])
+    parser.add_argument("--types", nargs="+", choices=["eval", "exec"],
+                        default=["eval"])
+    parser.add_argument("--trackers", nargs="+", choices=list(TRACKERS),
+                        default=["dict"])
+    parser.add_argument("--max-run-size", type=int, default=100000,
+                        help="Only load and prepare larger graphs")
+    parser.add_argument("--max-concurrency", type=int)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline",
+                        help="Earlier results to compare with")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--generate", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.generate:
+        shape, size, task_type, path = args.generate
+        write_input(path, SHAPES[shape](int(size), task_type))
+        return
+
+    if args.case:
+        case = json.loads(args.case)
+        result = run_case(case["path"], case["size"], case["tracker"],
+                          case["run"], RunnerConfig(**case["config"]))
+        print(json.dumps(result))
+        return
+
+    config = RunnerConfig(max_concurrency=args.max_concurrency)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for shape in args.shapes:
+            for size in args.sizes:
+                for task_type in args.types:
+                    for tracker in args.trackers:
+                        result = measure(shape, size, task_type, tracker,
+                                         size <= args.max_run_size,
+                                         config, tmp)
+                        results.append(result)
+                        print(_format(result), flush=True)
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "time": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": config.model_dump(mode="json"),
+            "results": results,
+        }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+def _format(result: Dict[str, Any]) -> str:
+    makespan: Optional[float] = result.get("makespan_s")
+    run = ("not run" if makespan is None else
+           f"makespan {makespan:8.3f}s "
+           f"({result['wall_us_per_task']:6.1f} us/task)")
+    return (f"{result['shape']:>8} {result['size']:>8} {result['type']} "
+            f"{result['tracker']:>7}: load {result['load_s']:7.3f}s, "
+            f"prepare {result['prepare_s']:7.3f}s, {run}, "
+            f"peak {result['peak_rss_mib']:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
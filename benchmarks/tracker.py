@@ -0,0 +1,75 @@
+"""Compare the memory and the ready/done cost of the task trackers.
+
+Usage::
+
+    python -m benchmarks.tracker --sizes 100000 1000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from benchmarks import quiet_logging
+from scheduler.compact_tracker import CompactTaskTracker
+from scheduler.models import Task, TaskStatus
+from scheduler.task_tracker import TaskTracker
+
+TRACKERS = {"dict": TaskTracker, "compact": CompactTaskTracker}
+
+
+def build(tracker_class, size: int):
+    """Build a graph of layers of 100 tasks, each depending on two tasks of
+    the previous layer."""
+
+    tracker = tracker_class()
+    for i in range(size):
+        dependencies = ((f"task{i - 100}", f"task{i - 100 + (i + 1) % 100}")
+                        if i >= 100 else ())
+        tracker.add_task(f"task{i}", Task.model_construct(
+            type="exec", arguments="true", dependencies=dependencies,
+            duration=None, status=TaskStatus.PENDING))
+    tracker.prepare_topo_sorter()
+    return tracker
+
+
+def drain(tracker) -> int:
+    """Hand out and finish every task, return the number of tasks."""
+
+    count = 0
+    while tracker.is_active():
+        for name in tracker.get_ready():
+            tracker.set_status(name, TaskStatus.OK)
+            tracker.done(name)
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000])
+    parser.add_argument("--trackers", nargs="+", choices=list(TRACKERS),
+                        default=list(TRACKERS))
+    args = parser.parse_args()
+
+    quiet_logging()
+    for size in args.sizes:
+        for name in args.trackers:
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter()
+            tracker = build(TRACKERS[name], size)
+            built = time.perf_counter() - start
+            memory, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            drain(tracker)
+            drained = time.perf_counter() - start
+            print(f"{size:>8} tasks {name:>7}: {memory / 2 ** 20:7.1f} MiB "
+                  f"({memory / size:5.0f} B/task), build {built:6.2f}s, "
+                  f"ready/done {drained / size * 1e6:5.1f} us/task")
+            del tracker
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,692 @@
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping
+from graphlib import CycleError
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from scheduler.logger import get_logger
+from scheduler.models import Task, TaskStatus
+from scheduler.pipes import check_pipe
+from scheduler.selection import select_tasks
+
+logger = get_logger(__name__)
+
+_TYPES = ("exec", "eval")
+_TYPE_IDS = {name: index for index, name in enumerate(_TYPES)}
+
+# Progress of a task through get_ready() and done()
+_WAITING = 0
+_RETURNED = 1
+_DONE = 2
+
+
+def _dependents(count: int, dependency_offsets, dependency_ids
+                ) -> Tuple[array, array]:
+    """Build the reverse edges of a graph in CSR arrays.
+
+    :param count: The number of tasks.
+    :param dependency_offsets: The offsets of the dependencies of every
+                               task in `dependency_ids`.
+    :param dependency_ids: The ids of the dependencies.
+    :return: The offsets and the ids of the dependents of every task.
+    """
+
+    # Count the dependents of every task, then fill them in place
+    offsets = array("q", bytes(8 * (count + 1)))
+    for dep in dependency_ids:
+        offsets[dep + 1] += 1
+    for task_id in range(count):
+        offsets[task_id + 1] += offsets[task_id]
+    dependent_ids = array("i", bytes(4 * len(dependency_ids)))
+    cursor = array("q", offsets)
+    for task_id in range(count):
+        for index in range(dependency_offsets[task_id],
+                           dependency_offsets[task_id + 1]):
+            dep = dependency_ids[index]
+            dependent_ids[cursor[dep]] = task_id
+            cursor[dep] += 1
+    return offsets, dependent_ids
+
+
+class _NameTable:
+    """The task names by id, stored back to back in a single buffer.
+
+    A string object and a dict entry for every task would take most of the
+    memory of the tracker, so the names are kept UTF-8 encoded with their
+    offsets and found through an open addressing table of ids. The hash is
+    CRC-32 rather than `hash()`, which changes from one process to the
+    next, so the graph cache can store the table as it is.
+    """
+
+    def __init__(self, blob=None, offsets=None, slots=None):
+        self.blob = bytearray() if blob is None else blob
+        self.offsets = array("q", [0]) if offsets is None else offsets
+        self.slots = array("i", [-1]) * 8 if slots is None else slots
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, task_id: int) -> str:
+        return str(self.blob[self.offsets[task_id]:self.offsets[task_id + 1]],
+                   "utf-8", "surrogatepass")
+
+    def __iter__(self) -> Iterator[str]:
+        for task_id in range(len(self)):
+            yield self[task_id]
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and self.find(name) >= 0
+
+    def find(self, name: str) -> int:
+        """Get the id of a task, -1 if there is no task of that name."""
+
+        task_id, _ = self._probe(name.encode("utf-8", "surrogatepass"))
+        return task_id
+
+    def add(self, name: str) -> int:
+        """Append a name to the table.
+
+        :return: The id of the name, -1 if it was already in the table.
+        """
+
+        task_id = len(self)
+        # Keep the table at most half full, so that probes stay short
+        if 2 * (task_id + 1) > len(self.slots):
+            self.slots = array("i", [-1]) * (2 * len(self.slots))
+            blob, offsets = self.blob, self.offsets
+            for other_id in range(task_id):
+                _, slot = self._probe(blob[offsets[other_id]:
+                                           offsets[other_id + 1]])
+                self.slots[slot] = other_id
+        key = name.encode("utf-8", "surrogatepass")
+        found, slot = self._probe(key)
+        if found >= 0:
+            return -1
+        self.blob += key
+        self.offsets.append(len(self.blob))
+        self.slots[slot] = task_id
+        return task_id
+
+    def _probe(self, key) -> Tuple[int, int]:
+        """Find the slot of an encoded name, or the empty slot it would
+        take, along with its id, -1 if it is not in the table."""
+
+        blob, offsets, slots = self.blob, self.offsets, self.slots
+        mask = len(slots) - 1
+        slot = zlib.crc32(key) & mask
+        while (task_id := slots[slot]) >= 0:
+            if blob[offsets[task_id]:offsets[task_id + 1]] == key:
+                return task_id, slot
+            slot = (slot + 1) & mask
+        return -1, slot
+
+
+class _NameIds(Mapping):
+    """A read-only mapping of task names to ids, over a _NameTable."""
+
+    def __init__(self, names: _NameTable):
+        self.names = names
+
+    def __getitem__(self, name: str) -> int:
+        task_id = self.names.find(name) if isinstance(name, str) else -1
+        if task_id < 0:
+            raise KeyError(name)
+        return task_id
+
+    def __contains__(self, name) -> bool:
+        return name in self.names
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class _TaskView(Mapping):
+    """A read-only mapping of task names to Task models.
+
+    The models are built on access from the arrays of the tracker, so they
+    do not take any memory while the tasks are waiting.
+    """
+
+    def __init__(self, tracker: "CompactTaskTracker"):
+        self.tracker = tracker
+
+    def __getitem__(self, name: str) -> Task:
+        return self.tracker._task(self.tracker.ids[name])
+
+    def __contains__(self, name) -> bool:
+        return name in self.tracker.ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tracker.names)
+
+    def __len__(self) -> int:
+        return len(self.tracker.names)
+
+
+class CompactTaskTracker:
+    """A TaskTracker for very large task graphs.
+
+    Task names are mapped to integer ids and stored encoded in a single
+    buffer, see `_NameTable`. Types and statuses are kept in byte arrays,
+    arguments in a list of interned strings and the edges of the graph in
+    CSR (compressed sparse row) arrays, in both directions.
+    The ready set is maintained with per-task counters of unfinished
+    dependencies instead of `graphlib.TopologicalSorter`, so marking a task
+    done only touches its own dependents, whatever the size of the graph.
+
+    It offers the same interface as TaskTracker and can be used wherever
+    a TaskTracker is. `tasks` is a read-only view that builds Task models
+    on access; use `set_status()` to change the status of a task.
+    """
+
+    names: _NameTable
+    ids: _NameIds
+    history: Dict[str, float]
+    durations: Dict[str, float]
+    status_listeners: List[Callable[[str, TaskStatus], None]]
+
+    def __init__(self):
+        self.names = _NameTable()
+        self.ids = _NameIds(self.names)
+        self.types = bytearray()
+        self.statuses = bytearray()
+        self.arguments = []
+        self.declared_durations = {}
+        self.declared_timeouts = {}
+        self.declared_requirements = {}
+        self.stdin_sources = {}
+        self.history = {}
+        self.durations = {}
+        self.status_listeners = []
+        self.tasks = _TaskView(self)
+
+        # Dependencies by name while loading, since they may refer to
+        # tasks that are added later
+        self.dependency_offsets = array("q", [0])
+        self.dependency_names = []
+
+        # Built by prepare_topo_sorter()
+        self.dependency_ids = array("i")
+        self.dependent_offsets = array("q", [0])
+        self.dependent_ids = array("i")
+        self.remaining = array("i")
+        self.progress = bytearray()
+        self.priorities = array("d")
+        self.ready = []
+        self.active = 0
+        self.prepared = False
+        # The tasks returned by get_ready() and not done yet, by name
+        self.returned = {}
+
+    def add_task(self, name: str, task: Task):
+        """Adds a task to the tracker.
+
+        :param name: The name of the task.
+        :param task: The task object to add.
+        """
+
+        task_id = self.names.add(name)
+        if task_id < 0:
+            raise ValueError(f"Duplicate task name found: {name}")
+        self.types.append(_TYPE_IDS[task.type])
+        self.statuses.append(task.status.value)
+        self.arguments.append(sys.intern(task.arguments))
+        if task.duration is not None:
+            self.declared_durations[task_id] = task.duration
+        if task.timeout is not None:
+            self.declared_timeouts[task_id] = task.timeout
+        if task.cpus is not None or task.memory_mb is not None:
+            self.declared_requirements[task_id] = (task.cpus, task.memory_mb)
+        if task.stdin_from is not None:
+            self.stdin_sources[task_id] = task.stdin_from
+        self.dependency_names.extend(task.dependencies)
+        self.dependency_offsets.append(len(self.dependency_names))
+
+    def _dependencies(self, task_id: int) -> List[str]:
+        start = self.dependency_offsets[task_id]
+        end = self.dependency_offsets[task_id + 1]
+        if self.prepared:
+            return [self.names[dep]
+                    for dep in self.dependency_ids[start:end]]
+        return self.dependency_names[start:end]
+
+    def _task(self, task_id: int) -> Task:
+        cpus, memory_mb = self.declared_requirements.get(task_id,
+                                                         (None, None))
+        return Task.model_construct(
+            type=_TYPES[self.types[task_id]],
+            arguments=self.arguments[task_id],
+            dependencies=tuple(self._dependencies(task_id)),
+            duration=self.declared_durations.get(task_id),
+            timeout=self.declared_timeouts.get(task_id),
+            cpus=cpus,
+            memory_mb=memory_mb,
+            stdin_from=self.stdin_sources.get(task_id),
+            status=TaskStatus(self.statuses[task_id]),
+        )
+
+    def task_type(self, name: str) -> str:
+        """Get the type of a task.
+
+        :param name: The name of the task.
+        :return: Either 'exec' or 'eval'.
+        """
+
+        return _TYPES[self.types[self._id(name)]]
+
+    def status(self, name: str) -> TaskStatus:
+        """Get the status of a task.
+
+        :param name: The name of the task.
+        :return: The current status of the task.
+        """
+
+        return TaskStatus(self.statuses[self._id(name)])
+
+    def set_status(self, name: str, status: TaskStatus):
+        """Change the status of a task and notify the status listeners.
+
+        When a task fails or times out, all tasks downstream of it are
+        skipped right away.
+
+        :param name: The name of the task.
+        :param status: The new status of the task.
+        """
+
+        task_id = self._id(name)
+        self.statuses[task_id] = status.value
+        for listener in self.status_listeners:
+            listener(name, status)
+        if status in (TaskStatus.FAILED, TaskStatus.TIMEOUT):
+            self._skip_downstream(task_id)
+
+    def _skip_downstream(self, task_id: int):
+        """Mark the pending tasks downstream of a failed task as SKIPPED.
+
+        Like TaskTracker._skip_downstream(), every skipped task is visited
+        a single time.
+
+        :param task_id: The id of the failed task.
+        """
+
+        pending = TaskStatus.PENDING.value
+        stack = [task_id]
+        while stack:
+            task_id = stack.pop()
+            for index in range(self.dependent_offsets[task_id],
+                               self.dependent_offsets[task_id + 1]):
+                dependent = self.dependent_ids[index]
+                if self.statuses[dependent] == pending:
+                    name = self.names[dependent]
+                    logger.info(f"Skipped: {name}",
+                                extra={"task": name,
+                                       "status": TaskStatus.SKIPPED.name})
+                    self.statuses[dependent] = TaskStatus.SKIPPED.value
+                    for listener in self.status_listeners:
+                        listener(name, TaskStatus.SKIPPED)
+                    stack.append(dependent)
+
+    def restore(self, statuses: Dict[str, TaskStatus]) -> int:
+        """Restore the outcome of an earlier, interrupted run.
+
+        Tasks that succeeded are marked OK, so that they are not run again.
+        Tasks with any other status are left PENDING and run as usual. Like
+        in TaskTracker.restore(), the sources of a task that runs again are
+        left PENDING.
+
+        :param statuses: The last known status of tasks by name.
+        :return: The number of tasks restored as OK.
+        """
+
+        ok = TaskStatus.OK.value
+        for name, status in statuses.items():
+            if status == TaskStatus.OK and name in self.ids:
+                self.statuses[self.ids[name]] = ok
+        for task_id, source in self.stdin_sources.items():
+            if self.statuses[task_id] == ok:
+                continue
+            source_id = self.ids.get(source)
+            while source_id is not None and self.statuses[source_id] == ok:
+                self.statuses[source_id] = TaskStatus.PENDING.value
+                source_id = self.ids.get(self.stdin_sources.get(source_id))
+        return self.statuses.count(ok)
+
+    def select(self, targets: Iterable[str] = (),
+               exclude: Iterable[str] = (),
+               downstream_of: Iterable[str] = ()):
+        """Keep only the tasks that need to run, like TaskTracker.select().
+
+        The kept tasks are renumbered in their input order and the arrays
+        are rebuilt with them only.
+
+        :raises KeyError: If one of the given names is not a task, or a
+                          selected task has a dependency on a task that
+                          does not exist.
+        :raises ValueError: If the graph was already prepared.
+        """
+
+        # The progress is only allocated by prepare_topo_sorter()
+        if self.progress:
+            raise ValueError("Tasks must be selected before the graph is "
+                             "prepared")
+        selected = select_tasks(
+            self.ids, lambda name: self._dependencies(self.ids[name]),
+            targets, exclude, downstream_of)
+        old_ids = sorted(self.ids[name] for name in selected)
+        new_ids = {old_id: new_id for new_id, old_id in enumerate(old_ids)}
+
+        dependency_offsets = array("q", [0])
+        dependency_names = []
+        for old_id in old_ids:
+            deps = self._dependencies(old_id)
+            missing_deps = {dep for dep in deps if dep not in self.ids}
+            if missing_deps:
+                raise KeyError(
+                    f"Task '{self.names[old_id]}' has unknown dependencies: "
+                    f"{', '.join(missing_deps)}"
+                )
+            dependency_names.extend(dep for dep in deps if dep in selected)
+            dependency_offsets.append(len(dependency_names))
+
+        logger.info(f"Selected {len(old_ids)} of {len(self.names)} tasks")
+        names = _NameTable()
+        for old_id in old_ids:
+            names.add(self.names[old_id])
+        self.names = names
+        self.ids = _NameIds(names)
+        self.types = bytearray(self.types[old_id] for old_id in old_ids)
+        self.statuses = bytearray(self.statuses[old_id]
+                                  for old_id in old_ids)
+        self.arguments = [self.arguments[old_id] for old_id in old_ids]
+        self.declared_durations = self._remap(self.declared_durations,
+                                              new_ids)
+        self.declared_timeouts = self._remap(self.declared_timeouts, new_ids)
+        self.declared_requirements = self._remap(self.declared_requirements,
+                                                 new_ids)
+        self.stdin_sources = {
+            task_id: source for task_id, source in self._remap(
+                self.stdin_sources, new_ids).items()
+            if source in selected}
+        self.dependency_offsets = dependency_offsets
+        self.dependency_names = dependency_names
+        self.dependency_ids = array("i")
+        self.dependent_offsets = array("q", [0])
+        self.dependent_ids = array("i")
+        self.prepared = False
+
+    @staticmethod
+    def _remap(declared: Dict[int, object], new_ids: Dict[int, int]
+               ) -> Dict[int, object]:
+        return {new_ids[old_id]: value for old_id, value in declared.items()
+                if old_id in new_ids}
+
+    def validate_dependencies(self):
+        """Check if all task dependencies refer to existing tasks, and that
+        the tasks reading the output of another one can be piped.
+
+        The dependencies are resolved to ids on the way, which finds the
+        missing ones, see `_resolve_dependencies()`.
+
+        :raises KeyError: If a task has a dependency on a task that
+                          does not exist.
+        :raises ValueError: If a task cannot read the output of its source.
+        """
+
+        if not self.prepared:
+            self._resolve_dependencies()
+        for task_id, source in self.stdin_sources.items():
+            source_id = self.ids.get(source)
+            check_pipe(self.names[task_id], _TYPES[self.types[task_id]],
+                       self._dependencies(task_id), source,
+                       None if source_id is None
+                       else _TYPES[self.types[source_id]],
+                       () if source_id is None
+                       else self._dependencies(source_id))
+
+    def prepare_topo_sorter(self):
+        """Build the graph arrays and the initial ready set.
+
+        The dependency names are resolved to ids and deduplicated, the
+        reverse (dependent) edges are built with a counting sort, and the
+        critical path priorities are computed, which also detects cycles.
+
+        :raises KeyError: If a task has a dependency on a task that
+                          does not exist.
+        :raises graphlib.CycleError: If a circular dependency is detected in
+                                     the task graph.
+        """
+
+        if not self.prepared:
+            self.validate_dependencies()
+        count = len(self.names)
+
+        # The graph cache provides the dependents along with the ids
+        if len(self.dependent_offsets) != count + 1:
+            self.dependent_offsets, self.dependent_ids = _dependents(
+                count, self.dependency_offsets, self.dependency_ids)
+
+        self.remaining = array("i", (
+            self.dependency_offsets[task_id + 1]
+            - self.dependency_offsets[task_id]
+            for task_id in range(count)))
+        self.progress = bytearray(count)
+        self.ready = [task_id for task_id in range(count)
+                      if self.remaining[task_id] == 0]
+        self.active = count
+        self._compute_priorities()
+
+    def _resolve_dependencies(self):
+        """Replace the dependency names by deduplicated ids.
+
+        :raises KeyError: If a task has a dependency on a task that
+                          does not exist, before anything is replaced.
+        """
+
+        find = self.names.find
+        offsets = array("q", [0])
+        dependency_ids = array("i")
+        for task_id in range(len(self.names)):
+            start = self.dependency_offsets[task_id]
+            end = self.dependency_offsets[task_id + 1]
+            deps = self.dependency_names[start:end]
+            if len(deps) > 1:
+                deps = dict.fromkeys(deps)
+            ids = [find(dep) for dep in deps]
+            if -1 in ids:
+                missing_deps = {dep for dep, dep_id in zip(deps, ids)
+                                if dep_id < 0}
+                raise KeyError(
+                    f"Task '{self.names[task_id]}' has unknown "
+                    f"dependencies: {', '.join(missing_deps)}"
+                )
+            dependency_ids.extend(ids)
+            offsets.append(len(dependency_ids))
+        self.dependency_offsets = offsets
+        self.dependency_ids = dependency_ids
+        self.dependency_names = []
+        self.prepared = True
+
+    def pipes(self) -> Dict[str, List[str]]:
+        """Get the tasks that read the output of another task, like
+        TaskTracker.pipes().
+        """
+
+        consumers = {}
+        for task_id in sorted(self.stdin_sources):
+            consumers.setdefault(self.stdin_sources[task_id], []).append(
+                self.names[task_id])
+        return consumers
+
+    def dependents_of(self, name: str) -> List[str]:
+        """Get the names of the tasks that depend on a task.
+
+        :param name: The name of the task.
+        :return: The names of its direct dependents.
+        """
+
+        task_id = self._id(name)
+        return [self.names[dependent] for dependent in self.dependent_ids[
+            self.dependent_offsets[task_id]:
+            self.dependent_offsets[task_id + 1]]]
+
+    def expected_duration(self, name: str) -> Optional[float]:
+        """Get the expected duration of a task in seconds.
+
+        :param name: The name of the task.
+        :return: The declared duration of the task, else its duration in
+                 the history, else None.
+        """
+
+        return self._expected_duration(self._id(name), name)
+
+    def _expected_duration(self, task_id: int, name: Optional[str] = None
+                           ) -> Optional[float]:
+        duration = self.declared_durations.get(task_id)
+        if duration is None and self.history:
+            if name is None:
+                name = self.names[task_id]
+            duration = self.history.get(name)
+        return duration
+
+    def timeout(self, name: str) -> Optional[float]:
+        """Get the declared timeout of a task in seconds, or None."""
+
+        return self.declared_timeouts.get(self._id(name))
+
+    def requirements(self, name: str) -> Tuple[float, float]:
+        """Get the declared resource requirements of a task.
+
+        :param name: The name of the task.
+        :return: The number of CPUs and the memory in MiB, 0 for what the
+                 task does not declare.
+        """
+
+        cpus, memory_mb = self.declared_requirements.get(self._id(name),
+                                                         (None, None))
+        return cpus or 0.0, memory_mb or 0.0
+
+    def priority(self, name: str) -> float:
+        """Get the critical path priority of a task.
+
+        :param name: The name of the task.
+        :return: The priority, higher runs first.
+        """
+
+        return self.priorities[self._id(name)]
+
+    def _compute_priorities(self):
+        """Compute the critical path priority of every task.
+
+        This follows TaskTracker._compute_priorities(), on the arrays.
+
+        :raises graphlib.CycleError: If not every task could be visited.
+        """
+
+        count = len(self.names)
+        weights = [self._expected_duration(task_id)
+                   for task_id in range(count)]
+        known = [weight for weight in weights if weight is not None]
+        default = sum(known) / len(known) if known else 1.0
+
+        priorities = array("d", bytes(8 * count))
+        remaining = array("i", (
+            self.dependent_offsets[task_id + 1]
+            - self.dependent_offsets[task_id]
+            for task_id in range(count)))
+        stack = [task_id for task_id in range(count)
+                 if remaining[task_id] == 0]
+        visited = 0
+        while stack:
+            task_id = stack.pop()
+            visited += 1
+            weight = weights[task_id]
+            longest = 0.0
+            for index in range(self.dependent_offsets[task_id],
+                               self.dependent_offsets[task_id + 1]):
+                longest = max(longest,
+                              priorities[self.dependent_ids[index]])
+            priorities[task_id] = (
+                (default if weight is None else weight) + longest)
+            for index in range(self.dependency_offsets[task_id],
+                               self.dependency_offsets[task_id + 1]):
+                dep = self.dependency_ids[index]
+                remaining[dep] -= 1
+                if remaining[dep] == 0:
+                    stack.append(dep)
+
+        if visited < count:
+            cycle = [self.names[task_id] for task_id in range(count)
+                     if remaining[task_id]]
+            raise CycleError("nodes are in a cycle", cycle)
+        self.priorities = priorities
+
+    def get_ready(self) -> set[str]:
+        """Get a set of tasks that are ready to be executed.
+
+        Like TaskTracker.get_ready(), skipped tasks and tasks that already
+        succeeded are marked done right away and are not included in the
+        returned set, and the tasks this unblocks are retrieved as well.
+
+        :return: A set of names of the tasks that are ready to be executed.
+        """
+
+        to_run_tasks = set()
+        while self.ready:
+            ready, self.ready = self.ready, []
+            for task_id in ready:
+                self.progress[task_id] = _RETURNED
+                status = self.statuses[task_id]
+                if status == TaskStatus.OK.value:
+                    logger.info(f"Already done: {self.names[task_id]}")
+                    self._done(task_id)
+                elif status == TaskStatus.SKIPPED.value:
+                    self._done(task_id)
+                else:
+                    name = self.names[task_id]
+                    self.returned[name] = task_id
+                    to_run_tasks.add(name)
+
+        return to_run_tasks
+
+    def done(self, name: str):
+        """Mark a task as finished, so that its dependents can become ready.
+
+        :param name: The name of a task returned by `get_ready()`.
+        :raises ValueError: If the task was not returned by `get_ready()`
+                            or was already marked done.
+        """
+
+        task_id = self.returned.pop(name, None)
+        if task_id is None:
+            task_id = self.ids[name]
+        if self.progress[task_id] != _RETURNED:
+            raise ValueError(
+                f"Task '{name}' was not returned by get_ready() "
+                "or is already done")
+        self._done(task_id)
+
+    def _done(self, task_id: int):
+        self.progress[task_id] = _DONE
+        self.active -= 1
+        for index in range(self.dependent_offsets[task_id],
+                           self.dependent_offsets[task_id + 1]):
+            dependent = self.dependent_ids[index]
+            self.remaining[dependent] -= 1
+            if self.remaining[dependent] == 0:
+                self.ready.append(dependent)
+
+    def _id(self, name: str) -> int:
+        # The tasks in flight are looked up often, by the dispatcher
+        task_id = self.returned.get(name)
+        return self.ids[name] if task_id is None else task_id
+
+    def is_active(self) -> bool:
+        """Check whether any task is still ready, running or waiting.
+
+        :return: True until every task has been marked done.
+        """
+
+        return self.active > 0
@@ -0,0 +1,229 @@
+import asyncio
+import itertools
+import time
+from scheduler.logger import get_logger
+from scheduler.models import ExecutionResult, RunnerConfig, Task
+from scheduler.process_pool import WorkerLostError
+from scheduler.protocol import (Message, check_token, decode_result, receive,
+                                require_token, send, start_server)
+from typing import Dict, List, Optional, Tuple
+
+logger = get_logger(__name__)
+
+
+class _Worker:
+    """The coordinator side of a connected worker."""
+
+    def __init__(self, name: str, capacity: int,
+                 writer: asyncio.StreamWriter):
+        self.name = name
+        self.capacity = capacity
+        self.writer = writer
+        self.in_flight: Dict[int, asyncio.Future] = {}
+        self.last_seen = time.monotonic()
+        self.completed = 0
+        self.lost = False
+
+    @property
+    def free(self) -> int:
+        return self.capacity - len(self.in_flight)
+
+
+class RemoteExecutor:
+    """Execute tasks on remote workers.
+
+    This has the interface of TaskExecutor, so the Dispatcher and the
+    TaskTracker work as usual and only the execution of each task is
+    shipped to a worker (`python -m scheduler.worker`). Workers connect
+    over TCP or a Unix socket, advertise how many tasks they run at once
+    and send heartbeats. Each task goes to the connected worker with the
+    most free slots. When a worker disconnects or misses its heartbeats,
+    the tasks it was running are reassigned to the other workers.
+
+    Workers receive the commands and snippets of the tasks and report their
+    results, so like the daemon, the Unix socket is only accessible to the
+    user and a TCP listener requires a shared token in the hello of every
+    worker.
+    """
+
+    def __init__(self, address: str, config: Optional[RunnerConfig] = None,
+                 heartbeat_timeout: float = 5.0,
+                 token: Optional[str] = None):
+        """Create a coordinator.
+
+        :param address: The address to listen on, 'HOST:PORT' or
+                        'unix:PATH'.
+        :param config: The runner configuration.
+        :param heartbeat_timeout: Seconds without any message after which a
+                                  worker is considered lost.
+        :param token: The token workers must carry. Required to listen on
+                      TCP, optional on a Unix socket.
+        :raises ValueError: If a TCP address is given without a token.
+        """
+
+        require_token(address, token)
+        self.address = address
+        self.token = token
+        self.config = config or RunnerConfig()
+        self.heartbeat_timeout = heartbeat_timeout
+        self.workers: List[_Worker] = []
+        self.ids = itertools.count()
+        self.changed: Optional[asyncio.Event] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.monitor: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Listen for workers and start watching their heartbeats."""
+
+        self.changed = asyncio.Event()
+        self.server = await start_server(self._serve, self.address)
+        self.monitor = asyncio.create_task(self._monitor())
+        logger.info(f"Waiting for workers on {self.address}")
+
+    async def close(self):
+        """Stop listening and disconnect all workers."""
+
+        if self.monitor is not None:
+            self.monitor.cancel()
+            self.monitor = None
+        for worker in list(self.workers):
+            send(worker.writer, {"type": "shutdown"})
+            self._lose(worker, "coordinator closed")
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _check_hello(self, hello: Optional[Message]) -> Tuple[str, int]:
+        """Check the first message of a worker.
+
+        :return: The name and the capacity of the worker.
+        :raises ValueError: If it is not a valid hello with the token.
+        """
+
+        if not isinstance(hello, dict) or hello.get("type") != "hello":
+            raise ValueError("Expected a hello message")
+        if not check_token(self.token, hello):
+            raise ValueError("Invalid token")
+        name, capacity = hello.get("name"), hello.get("capacity")
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"Invalid worker name: {name!r}")
+        if (not isinstance(capacity, int) or isinstance(capacity, bool)
+                or capacity < 1):
+            raise ValueError(f"Invalid capacity of worker {name}: "
+                             f"{capacity!r}")
+        return name, capacity
+
+    async def _serve(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter):
+        try:
+            name, capacity = self._check_hello(await receive(reader))
+        except ValueError as e:
+            # Also raised by receive() for a line that is not JSON
+            logger.warning(f"Rejected a worker: {e}")
+            send(writer, {"type": "error", "message": str(e)})
+            writer.close()
+            return
+        worker = _Worker(name, capacity, writer)
+        self.workers.append(worker)
+        logger.info(f"Worker {worker.name} connected with capacity "
+                    f"{worker.capacity}")
+        self.changed.set()
+
+        try:
+            while True:
+                message = await receive(reader)
+                if message is None:
+                    break
+                worker.last_seen = time.monotonic()
+                if message.get("type") == "result":
+                    future = worker.in_flight.pop(message.get("id"), None)
+                    if future is not None and not future.done():
+                        try:
+                            future.set_result(
+                                decode_result(message["result"]))
+                        except (KeyError, TypeError, ValueError) as e:
+                            future.set_result(ExecutionResult(exception=e))
+                    worker.completed += 1
+        except (ValueError, AttributeError, TypeError):
+            logger.warning(f"Worker {worker.name} sent an invalid message")
+        finally:
+            self._lose(worker, "disconnected")
+
+    def _lose(self, worker: _Worker, reason: str):
+        """Drop a worker and fail the tasks it was running, so they are
+        reassigned."""
+
+        if worker.lost:
+            return
+        worker.lost = True
+        self.workers.remove(worker)
+        worker.writer.close()
+        if worker.in_flight:
+            logger.warning(f"Lost worker {worker.name} ({reason}) with "
+                           f"{len(worker.in_flight)} tasks in flight")
+        for future in worker.in_flight.values():
+            if not future.done():
+                future.set_exception(
+                    WorkerLostError(f"Worker {worker.name} {reason}"))
+        worker.in_flight.clear()
+        self.changed.set()
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_timeout / 4)
+            deadline = time.monotonic() - self.heartbeat_timeout
+            for worker in list(self.workers):
+                if worker.last_seen < deadline:
+                    self._lose(worker, "missed its heartbeats")
+
+    async def _acquire(self) -> _Worker:
+        """Wait for a worker with a free slot."""
+
+        while True:
+            candidates = [worker for worker in self.workers if worker.free]
+            if candidates:
+                return max(candidates, key=lambda worker: worker.free)
+            self.changed.clear()
+            await self.changed.wait()
+
+    async def execute(self, task: Task,
+                      name: Optional[str] = None) -> ExecutionResult:
+        """Execute a task on a worker, and on another one if it is lost.
+
+        :param task: The task to execute.
+        :param name: The name of the task, used for logging reassignments.
+        :return: An ExecutionResult containing the output and status of the
+                 execution.
+        """
+
+        timeout = task.timeout
+        if timeout is None:
+            timeout = self.config.default_timeout
+        while True:
+            worker = await self._acquire()
+            task_id = next(self.ids)
+            future = asyncio.get_running_loop().create_future()
+            worker.in_flight[task_id] = future
+            send(worker.writer, {
+                "type": "task", "id": task_id,
+                "task": {"type": task.type, "arguments": task.arguments,
+                         "timeout": timeout},
+            })
+            try:
+                return await future
+            except WorkerLostError as e:
+                logger.warning(f"Reassigning {name}: {e}")
+            except asyncio.CancelledError:
+                if worker.in_flight.pop(task_id, None) is not None:
+                    send(worker.writer, {"type": "cancel", "id": task_id})
+                raise
+            finally:
+                self.changed.set()
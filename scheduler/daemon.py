@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import io
+import itertools
+import json
+from scheduler.executor import TaskExecutor
+from scheduler.loader import read_tasks
+from scheduler.logger import configure_logging, get_logger
+from scheduler.models import RunnerConfig, TaskStatus
+from scheduler.protocol import (Message, check_token, read_token, receive,
+                                require_token, send, start_server)
+from scheduler.report import FINAL_STATUSES, Reporter
+from scheduler.resources import ResourcePool
+from scheduler.runner import Dispatcher
+from scheduler.task_tracker import TaskTracker
+from typing import Dict, Optional, Tuple
+
+logger = get_logger(__name__)
+
+# Status messages queued for a client that does not keep up, beyond which
+# they are dropped
+STATUS_BACKLOG = 10000
+
+# The options of the runner configuration a submission may set for its graph
+GRAPH_OPTIONS = ("max_concurrency", "max_exec", "max_eval", "fail_fast",
+                 "default_timeout", "eval_batch_threshold", "eval_batch_time",
+                 "backfill_window")
+
+
+class SchedulerDaemon:
+    """Run the graphs submitted by clients against shared worker pools.
+
+    The daemon keeps one started TaskExecutor, with its warm eval pool and
+    spawner helper, for its whole lifetime. Clients connect over TCP or a
+    Unix socket and submit a graph, as the path of an input file or as the
+    input document itself (`python -m scheduler.submit`). Every graph gets
+    its own TaskTracker and Dispatcher, so several graphs run at once, and
+    the CPU and memory requirements of all graphs are packed into one
+    ResourcePool. The status changes of the tasks of a graph are streamed
+    back to its client until a final message with the counts per status.
+    A client that falls behind by more than `STATUS_BACKLOG` messages misses
+    the status changes that follow, and the final message tells how many.
+    A graph whose client disconnects is stopped.
+
+    Submitted tasks run arbitrary commands and code as the user of the
+    daemon, so the Unix socket is only accessible to that user, and a TCP
+    listener requires a shared token in every submission.
+    """
+
+    def __init__(self, address: str, config: Optional[RunnerConfig] = None,
+                 schema_path: Optional[str] = None,
+                 token: Optional[str] = None):
+        """Create a daemon.
+
+        :param address: The address to listen on, 'HOST:PORT' or
+                        'unix:PATH'.
+        :param config: The configuration of the shared executor, and the
+                       default limits of the graphs.
+        :param schema_path: The JSON schema the submitted graphs are
+                            validated against, none when omitted.
+        :param token: The token submissions must carry. Required to listen
+                      on TCP, optional on a Unix socket.
+        :raises ValueError: If a TCP address is given without a token.
+        """
+
+        require_token(address, token)
+        self.address = address
+        self.config = config or RunnerConfig()
+        self.schema_path = schema_path
+        self.token = token
+        self.executor = TaskExecutor(self.config)
+        self.resources: Optional[ResourcePool] = None
+        self.ids = itertools.count(1)
+        self.graphs: Dict[int, Tuple[Dispatcher, asyncio.Task]] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        """Start the worker pools and listen for submissions."""
+
+        await self.executor.start()
+        self.resources = ResourcePool(self.config.cpu_capacity,
+                                      self.config.memory_capacity_mb)
+        self.server = await start_server(self._serve, self.address)
+        logger.info(f"Accepting graphs on {self.address}")
+
+    async def close(self):
+        """Stop listening, stop the running graphs and the worker pools."""
+
+        if self.server is not None:
+            self.server.close()
+        runs = []
+        for dispatcher, run in list(self.graphs.values()):
+            dispatcher.stop("daemon closed")
+            runs.append(run)
+        await asyncio.gather(*runs, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+            self.server = None
+        await self.executor.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def serve_forever(self):
+        await self.server.serve_forever()
+
+    def _graph_config(self, options: Dict) -> RunnerConfig:
+        unknown = set(options) - set(GRAPH_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown options: {', '.join(sorted(unknown))}")
+        return RunnerConfig(**{**self.config.model_dump(), **options})
+
+    async def _load(self, message: Message) -> TaskTracker:
+        """Build the TaskTracker of a submission, in a thread so the graphs
+        that are already running keep being dispatched."""
+
+        task_tracker = TaskTracker()
+        if "document" in message:
+            f = io.StringIO(json.dumps(message["document"]))
+            source = "the submitted document"
+        else:
+            f = open(message["input"])
+            source = message["input"]
+        with f:
+            settings = await asyncio.to_thread(
+                read_tasks, task_tracker, f, self.schema_path, source)
+        default_timeout = (message.get("options", {}).get("default_timeout")
+                           or settings.default_timeout)
+        if default_timeout is not None:
+            # The executor is shared, so the default is applied per task
+            for task in task_tracker.tasks.values():
+                if task.timeout is None:
+                    task.timeout = default_timeout
+        task_tracker.prepare_topo_sorter()
+        return task_tracker
+
+    async def _serve(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter):
+        try:
+            message = await receive(reader)
+            if message is None:
+                return
+            try:
+                if message.get("type") != "submit":
+                    raise ValueError("Expected a submit message")
+                if not check_token(self.token, message):
+                    raise ValueError("Invalid token")
+                config = self._graph_config(message.get("options", {}))
+                task_tracker = await self._load(message)
+            except Exception as e:
+                logger.error(f"Rejected a submission: {e}")
+                send(writer, {"type": "error", "message": str(e)})
+                await _drain(writer)
+                return
+            await self._run(task_tracker, config, reader, writer)
+        finally:
+            writer.close()
+
+    async def _run(self, task_tracker: TaskTracker, config: RunnerConfig,
+                   reader: asyncio.StreamReader,
+                   writer: asyncio.StreamWriter):
+        graph = next(self.ids)
+        dispatcher = Dispatcher(task_tracker, config, self.executor,
+                                resources=self.resources)
+        reporter = Reporter(len(task_tracker.tasks))
+        task_tracker.status_listeners.append(reporter.record)
+
+        # Messages are sent from a task that waits for the client to read
+        # them. The status messages of a client that falls behind are
+        # dropped, rather than held without limit, and the final message is
+        # always queued.
+        outbox: asyncio.Queue = asyncio.Queue()
+        sender = asyncio.create_task(_forward(outbox, writer))
+        dropped = 0
+
+        def stream(name: str, status: TaskStatus):
+            nonlocal dropped
+            if outbox.qsize() >= STATUS_BACKLOG:
+                dropped += 1
+                return
+            outbox.put_nowait({"type": "status", "task": name,
+                               "status": status.name})
+
+        task_tracker.status_listeners.append(stream)
+        outbox.put_nowait({"type": "accepted", "graph": graph,
+                           "tasks": len(task_tracker.tasks)})
+        logger.info(f"Running graph {graph} with "
+                    f"{len(task_tracker.tasks)} tasks")
+
+        async def watch():
+            # The client only sends a cancel, or disconnects
+            message = await receive(reader)
+            reason = "cancelled" if message is not None else "disconnected"
+            dispatcher.stop(f"client of graph {graph} {reason}")
+
+        run = asyncio.create_task(dispatcher.run())
+        self.graphs[graph] = (dispatcher, run)
+        watcher = asyncio.create_task(watch())
+        try:
+            await run
+        except BaseException:
+            sender.cancel()
+            raise
+        finally:
+            watcher.cancel()
+            del self.graphs[graph]
+
+        counts = {status.name: reporter.counts[status]
+                  for status in FINAL_STATUSES if reporter.counts[status]}
+        ok = reporter.counts[TaskStatus.OK] == len(task_tracker.tasks)
+        summary = reporter.summary()
+        logger.info(f"Finished graph {graph}: {summary}")
+        if dropped:
+            logger.warning(f"Dropped {dropped} status messages of graph "
+                           f"{graph}, its client did not keep up")
+        outbox.put_nowait({"type": "done", "graph": graph, "ok": ok,
+                           "counts": counts, "summary": summary,
+                           "dropped": dropped})
+        outbox.put_nowait(None)
+        await sender
+
+
+async def _drain(writer: asyncio.StreamWriter) -> bool:
+    """Wait until the client read what was sent.
+
+    :return: False if the client went away.
+    """
+
+    if writer.is_closing():
+        return False
+    try:
+        await writer.drain()
+    except ConnectionError:
+        return False
+    return True
+
+
+async def _forward(outbox: asyncio.Queue, writer: asyncio.StreamWriter):
+    """Send the queued messages one at a time until a None, waiting for the
+    client to read every one."""
+
+    while (message := await outbox.get()) is not None:
+        if writer.is_closing():
+            return
+        send(writer, message)
+        if not await _drain(writer):
+            return
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Task Scheduler daemon, runs the graphs submitted with "
+                    "python -m scheduler.submit")
+    parser.add_argument("--listen", default="unix:scheduler.sock",
+                        metavar="ADDRESS",
+                        help="Address to accept submissions on, unix:PATH "
+                             "(default unix:scheduler.sock) or HOST:PORT, "
+                             "which requires --token-file")
+    parser.add_argument("--token-file", metavar="PATH",
+                        help="File with a token the submissions must carry")
+    parser.add_argument("--schema",
+                        help="Path to the JSON schema file to validate the "
+                             "submitted graphs with")
+    parser.add_argument("--max-concurrency", type=int,
+                        help="Default maximum number of tasks of a graph "
+                             "running at once")
+    parser.add_argument("--max-eval", type=int,
+                        help="Size of the shared eval worker pool")
+    parser.add_argument("--cpus", type=float,
+                        help="CPUs to pack the tasks of all graphs into, "
+                             "detected from /proc and cgroups by default")
+    parser.add_argument("--memory-mb", type=float,
+                        help="Memory in MiB to pack the tasks of all graphs "
+                             "into, detected by default")
+    parser.add_argument("--eval-mode", choices=["thread", "process"],
+                        default="thread",
+                        help="Run 'eval' tasks in a thread pool or in a pool "
+                             "of worker processes")
+    parser.add_argument("--eval-preload", action="append", default=[],
+                        metavar="MODULE",
+                        help="Module to import in the eval workers before "
+                             "any task runs, may be repeated")
+    parser.add_argument("--exec-mode", choices=["shell", "direct"],
+                        default="shell",
+                        help="Run every 'exec' task through /bin/sh, or start "
+                             "simple commands directly without a shell")
+    parser.add_argument("--exec-spawner", action="store_true",
+                        help="In direct mode, start commands that need a "
+                             "shell from a small pre-forked helper process")
+    parser.add_argument("--output-dir",
+                        help="Directory to write the full stdout and stderr "
+                             "of every 'exec' task to")
+    parser.add_argument("--log-format", choices=["text", "json"],
+                        default="text",
+                        help="Log human readable lines, or one JSON object "
+                             "per line with task, status and duration fields")
+    args = parser.parse_args()
+    configure_logging(args.log_format)
+
+    try:
+        config = RunnerConfig(max_concurrency=args.max_concurrency,
+                              max_eval=args.max_eval,
+                              eval_mode=args.eval_mode,
+                              eval_preload=args.eval_preload,
+                              exec_mode=args.exec_mode,
+                              exec_spawner=args.exec_spawner,
+                              output_dir=args.output_dir,
+                              cpu_capacity=args.cpus,
+                              memory_capacity_mb=args.memory_mb)
+    except Exception as e:
+        logger.error(f"Invalid runner configuration: {e}")
+        return
+
+    try:
+        token = (read_token(args.token_file)
+                 if args.token_file is not None else None)
+        daemon = SchedulerDaemon(args.listen, config, args.schema, token)
+    except (OSError, ValueError) as e:
+        logger.error(f"Cannot start the daemon: {e}")
+        return
+
+    async with daemon:
+        await daemon.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,98 +1,691 @@
 import asyncio
-import io
-from contextlib import redirect_stdout, redirect_stderr
+import hashlib
+import os
+import re
+import shlex
+import shutil
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import lru_cache
+from importlib import import_module
 from scheduler.logger import get_logger
-from scheduler.models import Task, ExecutionResult
-from typing import Tuple
+from scheduler.models import Task, ExecutionResult, RunnerConfig
+from scheduler.output import OutputBuffer, capture_output
+from scheduler.process_pool import CallTimeoutError, WorkerProcessPool
+from scheduler.spawner import Spawner
+from types import CodeType, ModuleType
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 logger = get_logger(__name__)
 
+# Size of the chunks read from the pipes of 'exec' tasks
+_READ_SIZE = 64 * 1024
 
-async def execute_task(task: Task) -> ExecutionResult:
+# Characters that make a command line depend on shell features such as
+# pipes, redirection, expansion, globbing or control flow
+_SHELL_SYNTAX = re.compile(r"[|&;<>()$`\\*?\[\]{}~#!\n]")
+
+# Builtins that may exist as a program but behave differently in a shell
+_SHELL_BUILTINS = frozenset({
+    ".", "alias", "cd", "eval", "exec", "exit", "export", "read", "return",
+    "set", "shift", "source", "trap", "ulimit", "umask", "unset", "wait",
+})
+
+# Maximum number of distinct compiled 'eval' snippets kept per process
+COMPILE_CACHE_SIZE = 4096
+
+# Maximum number of 'eval' tasks executed in one call to the eval pool
+EVAL_BATCH_SIZE = 512
+
+# Modules made available to every 'eval' task without an import statement
+_preloaded_modules: Dict[str, ModuleType] = {}
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_snippet(code: str) -> CodeType:
+    """Compile an 'eval' snippet, reusing earlier compilations.
+
+    Graphs often repeat the same snippet many times, so compiled code
+    objects are kept in a bounded LRU cache keyed by the source. The cache
+    is per process: eval worker processes fill their own cache.
+
+    :param code: The Python code to compile.
+    :return: The compiled code object.
+    :raises SyntaxError: If the code is not valid Python.
+    """
+
+    return compile(code, "<eval task>", "exec")
+
+
+def compile_cache_info():
+    """Get the hit and miss counters of the snippet compile cache.
+
+    :return: A named tuple with hits, misses, maxsize and currsize fields.
+    """
+
+    return compile_snippet.cache_info()
+
+
+@lru_cache(maxsize=None)
+def _find_program(program: str) -> Optional[str]:
+    return shutil.which(program)
+
+
+def parse_simple_command(command: str) -> Optional[List[str]]:
+    """Split a command line that can be run without a shell.
+
+    Only command lines consisting of a program found on the PATH followed by
+    plain, optionally quoted, arguments qualify. Anything that relies on
+    shell syntax or builtins yields None.
+
+    :param command: The command line of an 'exec' task.
+    :return: The argument vector, or None if the command needs a shell.
+    """
+
+    if _SHELL_SYNTAX.search(command):
+        return None
+    try:
+        args = shlex.split(command)
+    except ValueError:
+        return None
+    if not args or "=" in args[0] or args[0] in _SHELL_BUILTINS:
+        return None
+    if _find_program(args[0]) is None:
+        return None
+    return args
+
+
+def preload_modules(modules: Iterable[str]) -> None:
+    """Import modules once and expose them to all 'eval' tasks.
+
+    This is used as the initializer of eval worker processes, so that the
+    cost of importing heavy modules is paid once per worker instead of once
+    per task.
+
+    :param modules: The dotted names of the modules to import.
+    """
+
+    for module in modules:
+        import_module(module)
+        top_level = module.partition(".")[0]
+        _preloaded_modules[top_level] = sys.modules[top_level]
+
+
+def create_eval_executor(mode: str = "thread",
+                         max_workers: Optional[int] = None,
+                         preload: Iterable[str] = ()) -> Executor:
+    """Create the executor 'eval' tasks of a run are executed in.
+
+    :param mode: "thread" to run the code in a thread pool of this process,
+                 "process" to run it in a pool of warm worker processes.
+    :param max_workers: The size of the pool, the default of the
+                        underlying pool when omitted.
+    :param preload: Modules to import in the workers before any task runs.
+    :return: The executor to pass to `execute_task`.
+    :raises ValueError: If the mode is unknown.
+    """
+
+    preload = tuple(preload)
+    if mode == "thread":
+        preload_modules(preload)
+        return ThreadPoolExecutor(max_workers=max_workers,
+                                  thread_name_prefix="eval")
+    elif mode == "process":
+        return WorkerProcessPool(max_workers=max_workers,
+                                 initializer=preload_modules,
+                                 initargs=(preload,))
+    else:
+        raise ValueError(f"Unknown eval mode: {mode}")
+
+
+async def execute_task(task: Task,
+                       eval_executor: Optional[Executor] = None,
+                       name: Optional[str] = None,
+                       config: Optional[RunnerConfig] = None,
+                       spawner: Optional[Spawner] = None
+                       ) -> ExecutionResult:
     """Execute a task based on its type.
 
     :param task: The task to execute.
+    :param eval_executor: The executor to run 'eval' tasks in. The default
+                          executor of the event loop is used when omitted.
+    :param name: The name of the task. When given, the output of 'exec'
+                 tasks is forwarded to the logger line by line as it
+                 arrives and can be spilled to a file.
+    :param config: The runner configuration with the output and 'exec'
+                   mode options.
+    :param spawner: The spawner helper to start commands that need a shell
+                    in, when running in "direct" exec mode.
     :return: An ExecutionResult containing the output and status of the
              execution.
     :raises ValueError: If the task type is unknown.
     """
 
     logger.debug(f"Executing task with arguments: {task.arguments}")
+    config = config or RunnerConfig()
+    timeout = task.timeout
+    if timeout is None:
+        timeout = config.default_timeout
     if task.type == "exec":
-        return await _execute_exec(task)
+        return await _execute_exec(task, name, config, spawner, timeout)
     elif task.type == "eval":
-        return await _execute_eval(task)
+        return await _execute_eval(task, eval_executor, timeout)
     else:
         logger.error(f"Unknown task type: {task.type}")
         raise ValueError(f"Unknown task type: {task.type}")
 
 
-async def _execute_exec(task: Task) -> ExecutionResult:
+async def _pump_stream(stream: asyncio.StreamReader,
+                       output: OutputBuffer,
+                       on_line: Optional[Callable[[str], None]]):
+    """Read a pipe incrementally into a bounded output buffer.
+
+    :param stream: The pipe to read until EOF.
+    :param output: The buffer keeping the head and the tail of the stream.
+    :param on_line: A callback receiving every complete line as it arrives.
+    """
+
+    pending = b""
+    while True:
+        chunk = await stream.read(_READ_SIZE)
+        if not chunk:
+            break
+        output.write(chunk)
+        if on_line is None:
+            continue
+
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        # Forward overly long lines in pieces instead of buffering them
+        if len(pending) >= _READ_SIZE:
+            lines.append(pending)
+            pending = b""
+        for line in lines:
+            on_line(line.decode(errors="replace").rstrip("\r"))
+
+    if pending and on_line is not None:
+        on_line(pending.decode(errors="replace").rstrip("\r"))
+
+
+def _line_logger(prefix: str, name: str) -> Callable[[str], None]:
+    def log_line(line: str):
+        logger.info(f"{prefix} {name}: {line}", extra={"task": name})
+    return log_line
+
+
+def _spill_path(config: RunnerConfig, name: Optional[str],
+                stream: str) -> Optional[str]:
+    if config.output_dir is None or name is None:
+        return None
+    file_name = name.replace(os.sep, "_")
+    if file_name != name:
+        # Keep tasks such as a/b and a_b from writing to the same file
+        digest = hashlib.sha256(name.encode()).hexdigest()[:12]
+        file_name = f"{file_name}-{digest}"
+    return os.path.join(config.output_dir, f"{file_name}.{stream}")
+
+
+async def _start_process(command: str, config: RunnerConfig,
+                         spawner: Optional[Spawner],
+                         stdin: Optional[int] = None,
+                         stdout: int = asyncio.subprocess.PIPE):
+    """Start the process of an 'exec' task with its output piped.
+
+    In "shell" exec mode every command runs through /bin/sh. In "direct"
+    mode simple commands are started without a shell, and commands that
+    need one are delegated to the spawner helper if there is one, unless
+    the process reads from or writes to another task. Every process leads
+    a new session, so it can be killed with its children.
+    """
+
+    if config.exec_mode == "direct":
+        args = parse_simple_command(command)
+        if args is not None:
+            # Pass the resolved path so the PATH is not searched again
+            return await asyncio.create_subprocess_exec(
+                *args,
+                executable=_find_program(args[0]),
+                stdin=stdin,
+                stdout=stdout,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True)
+        # The processes of the spawner read from /dev/null
+        if (spawner is not None and stdout == asyncio.subprocess.PIPE
+                and stdin in (None, asyncio.subprocess.DEVNULL)):
+            return await spawner.spawn([command], shell=True)
+
+    return await asyncio.create_subprocess_shell(
+        command,
+        stdin=stdin,
+        stdout=stdout,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True)
+
+
+async def _execute_exec(task: Task, name: Optional[str],
+                        config: RunnerConfig,
+                        spawner: Optional[Spawner] = None,
+                        timeout: Optional[float] = None,
+                        stdin: Optional[int] = None,
+                        pipe_to: Optional[int] = None
+                        ) -> ExecutionResult:
     """Executes a command in a subprocess.
 
-    This method takes an 'exec' task and runs its arguments as a shell
-    command in a new subprocess. It captures the stdout, stderr, and
-    return code of the command.
+    This method takes an 'exec' task and runs its arguments as a command
+    in a new subprocess, with or without a shell depending on the exec
+    mode. The stdout and stderr pipes are read
+    incrementally: only the head and the tail of each stream are kept in
+    memory, the full streams can be spilled to files in the output
+    directory, and complete lines are forwarded to the logger when the
+    task name is known. If the task is cancelled or runs out of time, the
+    process is killed with its children.
 
     :param task: The 'exec' task to execute.
+    :param name: The name of the task, or None to disable forwarding and
+                 spilling.
+    :param config: The runner configuration with the output and exec mode
+                   options.
+    :param spawner: The spawner helper for commands that need a shell.
+    :param timeout: The time in seconds the process may run for, or None.
+    :param stdin: The read end of a pipe to connect to the stdin of the
+                  process. A task reading the output of another one reads
+                  from /dev/null without it.
+    :param pipe_to: The write end of a pipe to connect to the stdout of the
+                    process instead of capturing it.
     :return: An ExecutionResult containing the output and status of the
-             execution.
+             execution. Both given pipe ends are closed once the process
+             started.
     """
 
+    if stdin is None and task.stdin_from is not None:
+        stdin = asyncio.subprocess.DEVNULL
+    stdout = OutputBuffer(config.output_limit,
+                          _spill_path(config, name, "stdout"))
+    stderr = OutputBuffer(config.output_limit,
+                          _spill_path(config, name, "stderr"))
+    on_stdout = on_stderr = None
+    if name is not None:
+        on_stdout = _line_logger("Output", name)
+        on_stderr = _line_logger("Stderr", name)
+
+    async def communicate():
+        pumps = [_pump_stream(process.stderr, stderr, on_stderr)]
+        if process.stdout is not None:
+            pumps.append(_pump_stream(process.stdout, stdout, on_stdout))
+        await asyncio.gather(*pumps)
+        await process.wait()
+
+    process = None
     try:
-        process = await asyncio.create_subprocess_shell(
-            task.arguments,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE)
-        stdout, stderr = await process.communicate()
+        try:
+            process = await _start_process(
+                task.arguments, config, spawner, stdin,
+                asyncio.subprocess.PIPE if pipe_to is None else pipe_to)
+        finally:
+            # The process holds its own copies of the pipe ends
+            for fd in (stdin, pipe_to):
+                if fd is not None and fd >= 0:
+                    os.close(fd)
+        started = time.monotonic()
+        timed_out = False
+        try:
+            await asyncio.wait_for(communicate(), timeout)
+        except asyncio.TimeoutError:
+            # Kill the whole process group, so children that keep the
+            # pipes open do not hold the slot either
+            timed_out = True
+            _kill(process)
+            await process.wait()
 
         return ExecutionResult(
-            stdout=stdout.decode().strip(),
-            stderr=stderr.decode().strip(),
-            return_code=process.returncode
+            stdout=stdout.getvalue(),
+            stderr=stderr.getvalue(),
+            return_code=process.returncode,
+            streamed=name is not None,
+            started=started,
+            timed_out=timed_out,
         )
 
+    except asyncio.CancelledError:
+        if process is not None and process.returncode is None:
+            _kill(process)
+            await process.wait()
+        raise
+
     except Exception as e:
         logger.exception("An error occurred during exec task execution.")
         return ExecutionResult(exception=e)
 
+    finally:
+        stdout.close()
+        stderr.close()
+
+
+def _kill(process):
+    """Kill the process group of a process that may have exited in the
+    meantime."""
+
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
 
-def _blocking_eval(code: str) -> Tuple[str, str]:
+def _blocking_eval(code: str) -> Tuple[str, str, float, float]:
     """Execute a Python code snippet and capture stdout and stderr.
 
+    The code is compiled through the snippet cache and runs in a fresh
+    namespace containing the preloaded modules. The output is captured per
+    thread, so snippets running concurrently in a thread pool do not see
+    each other's output.
+
     :param code: The Python code to execute.
-    :return: A tuple containing the captured stdout and stderr as strings.
+    :return: A tuple containing the captured stdout and stderr as strings,
+             the `time.monotonic()` the snippet started at and how long it
+             ran for.
+    """
+
+    started = time.monotonic()
+    namespace = {"__name__": "__main__", **_preloaded_modules}
+    with capture_output() as (f_out, f_err):
+        exec(compile_snippet(code), namespace)
+    duration = time.monotonic() - started
+    stdout, stderr = f_out.getvalue().strip(), f_err.getvalue().strip()
+    return stdout, stderr, started, duration
+
+
+def _blocking_eval_batch(codes: List[str], budget: float
+                         ) -> List[Tuple[str, str, float, float,
+                                         Optional[Exception]]]:
+    """Execute Python code snippets one after the other.
+
+    Every snippet runs like in `_blocking_eval`, but the output is captured
+    once for the whole batch. Execution stops once `budget` seconds have
+    passed, so a snippet that turns out to be slow holds back the rest of
+    the batch for no longer than its own run.
+
+    :param codes: The Python code of the snippets.
+    :param budget: The time after which no further snippet is started.
+    :return: For every executed snippet, in order, its stdout and stderr,
+             start time, duration and the exception it raised, if any.
+    """
+
+    results = []
+    deadline = time.monotonic() + budget
+    with capture_output() as (f_out, f_err):
+        for code in codes:
+            started = time.monotonic()
+            namespace = {"__name__": "__main__", **_preloaded_modules}
+            exception = None
+            try:
+                exec(compile_snippet(code), namespace)
+            except Exception as e:
+                exception = e
+            finished = time.monotonic()
+            results.append((f_out.getvalue().strip(),
+                            f_err.getvalue().strip(), started,
+                            finished - started, exception))
+            for buffer in (f_out, f_err):
+                buffer.seek(0)
+                buffer.truncate()
+            if finished >= deadline:
+                break
+    return results
+
+
+async def _call_in_thread(timeout: float, fn: Callable, *args):
+    """Call a blocking function in a daemon thread of its own.
+
+    Threads cannot be killed safely, so when the timeout runs out the
+    thread is abandoned: the call keeps running in the background and its
+    result is discarded, and being a daemon thread it does not keep the
+    process alive. Only process mode stops a snippet that runs out of time.
+
+    :param timeout: The timeout in seconds.
+    :param fn: The function to call.
+    :return: The return value of the function.
+    :raises CallTimeoutError: If the call did not finish in time.
     """
 
-    f_out = io.StringIO()
-    f_err = io.StringIO()
-    with redirect_stdout(f_out), redirect_stderr(f_err):
-        exec(code)
-    return f_out.getvalue().strip(), f_err.getvalue().strip()
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(outcome: Callable, value):
+        if not future.done():
+            outcome(value)
 
+    def run():
+        try:
+            outcome, value = future.set_result, fn(*args)
+        except BaseException as e:
+            outcome, value = future.set_exception, e
+        try:
+            loop.call_soon_threadsafe(resolve, outcome, value)
+        except RuntimeError:
+            # The event loop was closed in the meantime
+            pass
+
+    thread = threading.Thread(target=run, daemon=True, name="eval-timeout")
+    thread.start()
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Abandoned a call still running after {timeout}s, "
+                       "it finishes in the background")
+        raise CallTimeoutError(
+            f"Call did not finish within {timeout}s") from None
 
-async def _execute_eval(task: Task) -> ExecutionResult:
-    """Execute a Python code snippet in a separate thread.
+
+async def _execute_eval(task: Task,
+                        eval_executor: Optional[Executor] = None,
+                        timeout: Optional[float] = None
+                        ) -> ExecutionResult:
+    """Execute a Python code snippet in a separate thread or process.
 
     This method takes an 'eval' task and executes its Python code
     arguments. To prevent blocking the asyncio event loop, the execution
-    is performed in a separate thread using `run_in_executor`. It captures
+    is performed in the given executor using `run_in_executor`. It captures
     and returns the stdout, stderr, and any exceptions that occur.
 
+    A snippet with a timeout runs in a worker process that is killed and
+    replaced when it runs out of time. In thread mode it runs in a thread
+    of its own, which is abandoned on timeout and keeps running in the
+    background, so the task is marked timed out but is not stopped.
+
     :param task: The 'eval' task to execute.
+    :param eval_executor: The executor to run the code in, or None for the
+                          default executor of the event loop.
+    :param timeout: The time in seconds the snippet may run for, or None.
     :return: An ExecutionResult containing the output and status of the
              execution.
     """
 
     try:
         loop = asyncio.get_running_loop()
-        stdout, stderr = await loop.run_in_executor(
-            None, _blocking_eval, task.arguments
-        )
+        if timeout is None:
+            call = loop.run_in_executor(eval_executor, _blocking_eval,
+                                        task.arguments)
+        elif isinstance(eval_executor, WorkerProcessPool):
+            call = asyncio.wrap_future(eval_executor.submit_with_timeout(
+                timeout, _blocking_eval, task.arguments))
+        else:
+            call = _call_in_thread(timeout, _blocking_eval, task.arguments)
+        stdout, stderr, started, duration = await call
         logger.debug(
             "Eval task completed successfully for arguments: "
             f"{task.arguments}")
-        return ExecutionResult(stdout=stdout, stderr=stderr, return_code=0)
+        return ExecutionResult(stdout=stdout, stderr=stderr, return_code=0,
+                               started=started, duration=duration)
+    except CallTimeoutError:
+        return ExecutionResult(timed_out=True)
     except Exception as e:
         logger.exception("An error occurred during eval task execution.")
         return ExecutionResult(exception=e)
+
+
+class TaskExecutor:
+    """Execute tasks with the worker pools and helpers of a run.
+
+    The executor owns the pool 'eval' tasks run in and, if enabled, the
+    spawner helper process. It is used as an async context manager which
+    starts these resources on entry and shuts them down on exit.
+    """
+
+    def __init__(self, config: Optional[RunnerConfig] = None):
+        self.config = config or RunnerConfig()
+        self.eval_executor: Optional[Executor] = None
+        self.spawner: Optional[Spawner] = None
+
+    async def start(self):
+        """Start the eval worker pool and the spawner helper."""
+
+        eval_workers = self.config.max_eval or self.config.max_concurrency
+        self.eval_executor = create_eval_executor(
+            self.config.eval_mode, eval_workers, self.config.eval_preload)
+        if self.config.exec_spawner:
+            self.spawner = Spawner()
+            await self.spawner.start()
+
+    async def close(self):
+        """Shut down the eval worker pool and the spawner helper."""
+
+        if self.eval_executor is not None:
+            self.eval_executor.shutdown()
+            self.eval_executor = None
+        if self.spawner is not None:
+            await self.spawner.close()
+            self.spawner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def execute(self, task: Task,
+                      name: Optional[str] = None) -> ExecutionResult:
+        """Execute a task with the resources of this executor.
+
+        :param task: The task to execute.
+        :param name: The name of the task, used for logging its output.
+        :return: An ExecutionResult containing the output and status of the
+                 execution.
+        """
+
+        return await execute_task(task, self.eval_executor, name,
+                                  self.config, self.spawner)
+
+    async def execute_pipeline(self, tasks: List[Tuple[str, Task]]
+                               ) -> List[ExecutionResult]:
+        """Execute 'exec' tasks together, with the stdout of every task that
+        another one reads from connected to its stdin by a pipe.
+
+        A task read by several others writes into a `tee` process, which
+        copies the stream into the pipe of every reader. Every task keeps
+        its own timeout. A task whose stdout is piped has none captured.
+
+        :param tasks: The names and the tasks to execute, every task after
+                      the task it reads from.
+        :return: The results of the tasks, in order, with their durations.
+        """
+
+        names = {name: index for index, (name, _) in enumerate(tasks)}
+        readers: Dict[int, List[int]] = {}
+        for index, (_, task) in enumerate(tasks):
+            if task.stdin_from in names:
+                readers.setdefault(names[task.stdin_from], []).append(index)
+
+        stdins: Dict[int, int] = {}
+        stdouts: Dict[int, int] = {}
+        tees = []
+        opened = []
+        try:
+            for source, consumers in readers.items():
+                ends = [os.pipe() for _ in consumers]
+                opened.extend(fd for pipe in ends for fd in pipe)
+                for consumer, (read_end, _) in zip(consumers, ends):
+                    stdins[consumer] = read_end
+                if len(ends) == 1:
+                    stdouts[source] = ends[0][1]
+                    continue
+                read_end, write_end = os.pipe()
+                opened.extend((read_end, write_end))
+                stdouts[source] = write_end
+                files = [write for _, write in ends[1:]]
+                tees.append(await asyncio.create_subprocess_exec(
+                    "tee", *(f"/dev/fd/{fd}" for fd in files),
+                    stdin=read_end, stdout=ends[0][1],
+                    stderr=asyncio.subprocess.DEVNULL,
+                    pass_fds=files, start_new_session=True))
+                for fd in (read_end, ends[0][1], *files):
+                    opened.remove(fd)
+                    os.close(fd)
+        except BaseException:
+            for fd in opened:
+                os.close(fd)
+            for tee in tees:
+                _kill(tee)
+            raise
+
+        async def run(index: int, name: str, task: Task) -> ExecutionResult:
+            timeout = task.timeout
+            if timeout is None:
+                timeout = self.config.default_timeout
+            start = time.monotonic()
+            result = await _execute_exec(
+                task, name, self.config, self.spawner, timeout,
+                stdins.get(index), stdouts.get(index))
+            result.duration = time.monotonic() - start
+            return result
+
+        # Every remaining pipe end is handed to a process and closed by it
+        try:
+            return list(await asyncio.gather(
+                *(run(index, name, task)
+                  for index, (name, task) in enumerate(tasks))))
+        finally:
+            for tee in tees:
+                if tee.returncode is None:
+                    _kill(tee)
+                await tee.wait()
+
+    async def execute_batch(self, tasks: List[Task]
+                            ) -> List[ExecutionResult]:
+        """Execute short 'eval' tasks in a single call to the eval pool.
+
+        The tasks run one after the other, until the `eval_batch_time` of
+        the configuration has passed. If the call itself fails, for example
+        because the worker process died, the tasks are executed one by one
+        instead, so the failure is attributed to the task that caused it.
+
+        :param tasks: The 'eval' tasks to execute, at most EVAL_BATCH_SIZE.
+        :return: The results of the tasks that were executed, in order. The
+                 tasks after them were not executed.
+        """
+
+        loop = asyncio.get_running_loop()
+        try:
+            outcomes = await loop.run_in_executor(
+                self.eval_executor, _blocking_eval_batch,
+                [task.arguments for task in tasks],
+                self.config.eval_batch_time)
+        except Exception:
+            logger.exception("An eval batch failed, executing its tasks one "
+                             "by one.")
+            return list(await asyncio.gather(
+                *(self.execute(task) for task in tasks)))
+
+        results = []
+        for stdout, stderr, started, duration, exception in outcomes:
+            if exception is not None:
+                logger.error("An error occurred during eval task execution.",
+                             exc_info=exception)
+            results.append(ExecutionResult(
+                stdout=stdout, stderr=stderr,
+                return_code=0 if exception is None else None,
+                exception=exception, started=started, duration=duration))
+        return results
@@ -0,0 +1,342 @@
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from graphlib import CycleError
+from scheduler.compact_tracker import (_TYPE_IDS, _TYPES, CompactTaskTracker,
+                                       _dependents, _NameIds, _NameTable)
+from scheduler.logger import get_logger
+from scheduler.models import InputModel, Task
+from scheduler.task_tracker import TaskTracker
+from typing import Any, Dict, Optional, Tuple
+
+logger = get_logger(__name__)
+
+# Changed whenever the layout of the cache files changes
+FORMAT = b"i-scheduler graph cache 3"
+
+# Magic, length of the marshalled part, number of tasks, of edges, of bytes
+# of names and of slots of the name table
+_HEADER = struct.Struct("=8sQQQQQ")
+_MAGIC = b"ISGRAPH2"
+
+# Default size of the cache directory, beyond which the least recently
+# used graphs are removed
+MAX_CACHE_BYTES = 1024 * 1024 * 1024
+
+# Age of a temporary file after which it is left over from a killed run
+_STALE_SECONDS = 3600
+
+
+def cache_key(file_path: str, schema_path: Optional[str] = None) -> str:
+    """Hash the contents of an input file and of its schema.
+
+    :param file_path: The path to the input JSON file.
+    :param schema_path: The path to the JSON schema file, if any.
+    :return: The hex digest that names the cached graph.
+    """
+
+    digest = hashlib.sha256(FORMAT)
+    for path in (file_path, schema_path):
+        digest.update(b"\0")
+        if path is not None:
+            with open(path, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, f"{key}.graph")
+
+
+def prune(cache_dir: str, max_bytes: int = MAX_CACHE_BYTES,
+          keep: Optional[str] = None):
+    """Remove the least recently used graphs until the cache fits.
+
+    A hit touches its file, so the modification times order the graphs by
+    their last use. Temporary files of killed runs are removed as well.
+
+    :param cache_dir: The directory of the cache.
+    :param max_bytes: The size the cached graphs may take up in total.
+    :param keep: The path of a graph that is never removed, such as the
+                 one just written, even when it alone exceeds the size.
+    """
+
+    entries = []
+    now = time.time()
+    with os.scandir(cache_dir) as scan:
+        for entry in scan:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith(".graph"):
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+            elif (entry.name.endswith(".tmp")
+                  and now - stat.st_mtime > _STALE_SECONDS):
+                _remove(entry.path)
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path != keep:
+            _remove(path)
+            total -= size
+
+
+def _remove(path: str):
+    # Another run may have removed or replaced it in the meantime
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    else:
+        logger.debug(f"Removed {path} from the graph cache")
+
+
+def _align(offset: int) -> int:
+    return -offset % 8
+
+
+def _columns(task_tracker: TaskTracker) -> Dict[str, Any]:
+    """Extract the graph of a tracker in the layout of the cache files,
+    with the dependencies resolved to deduplicated ids.
+
+    :raises KeyError: If a task has a dependency on a task that does not
+                      exist.
+    """
+
+    task_tracker.validate_dependencies()
+    if isinstance(task_tracker, CompactTaskTracker):
+        return {
+            "names": task_tracker.names,
+            "types": bytes(task_tracker.types),
+            "arguments": task_tracker.arguments,
+            "durations": task_tracker.declared_durations,
+            "timeouts": task_tracker.declared_timeouts,
+            "requirements": task_tracker.declared_requirements,
+            "stdin_sources": task_tracker.stdin_sources,
+            "offsets": task_tracker.dependency_offsets,
+            "dependencies": task_tracker.dependency_ids,
+        }
+
+    names = _NameTable()
+    for name in task_tracker.tasks:
+        names.add(name)
+    ids = _NameIds(names)
+    columns = {"names": names, "types": bytearray(), "arguments": [],
+               "durations": {}, "timeouts": {}, "requirements": {},
+               "stdin_sources": {}, "offsets": array("q", [0]),
+               "dependencies": array("i")}
+    for task_id, task in enumerate(task_tracker.tasks.values()):
+        columns["types"].append(_TYPE_IDS[task.type])
+        columns["arguments"].append(task.arguments)
+        if task.duration is not None:
+            columns["durations"][task_id] = task.duration
+        if task.timeout is not None:
+            columns["timeouts"][task_id] = task.timeout
+        if task.cpus is not None or task.memory_mb is not None:
+            columns["requirements"][task_id] = (task.cpus, task.memory_mb)
+        if task.stdin_from is not None:
+            columns["stdin_sources"][task_id] = task.stdin_from
+        columns["dependencies"].extend(
+            ids[dep] for dep in dict.fromkeys(task.dependencies))
+        columns["offsets"].append(len(columns["dependencies"]))
+    columns["types"] = bytes(columns["types"])
+    return columns
+
+
+def _check_acyclic(names, offsets, dependencies, dependent_offsets):
+    """Peel the tasks that nothing depends on, like the priorities of the
+    compact tracker are computed, until only cycles are left.
+
+    :raises graphlib.CycleError: If not every task could be peeled.
+    """
+
+    count = len(names)
+    remaining = array("i", (dependent_offsets[task_id + 1]
+                            - dependent_offsets[task_id]
+                            for task_id in range(count)))
+    stack = [task_id for task_id in range(count) if remaining[task_id] == 0]
+    peeled = 0
+    while stack:
+        task_id = stack.pop()
+        peeled += 1
+        for index in range(offsets[task_id], offsets[task_id + 1]):
+            dep = dependencies[index]
+            remaining[dep] -= 1
+            if remaining[dep] == 0:
+                stack.append(dep)
+    if peeled < count:
+        cycle = [names[task_id] for task_id in range(count)
+                 if remaining[task_id]]
+        raise CycleError("nodes are in a cycle", cycle)
+
+
+def store_graph(task_tracker: TaskTracker, settings: InputModel,
+                cache_dir: str, key: str,
+                max_bytes: int = MAX_CACHE_BYTES):
+    """Write the loaded graph of a tracker to the cache.
+
+    The dependencies are checked first, and the graph must be acyclic, so
+    a cached graph can be loaded without any validation. The file is
+    written next to its final name and renamed, so concurrent runs never
+    read a partial file. The least recently used graphs are then removed
+    until the cache fits in `max_bytes`, see `prune()`.
+
+    :param task_tracker: A tracker holding the whole loaded graph.
+    :param settings: The settings at the top level of the input.
+    :param cache_dir: The directory of the cache, created if needed.
+    :param key: The `cache_key()` of the input.
+    :param max_bytes: The size the cached graphs may take up in total.
+    :raises KeyError: If a task has a dependency on a task that does not
+                      exist.
+    :raises graphlib.CycleError: If a circular dependency is detected.
+    """
+
+    columns = _columns(task_tracker)
+    count = len(columns["names"])
+    dependent_offsets, dependent_ids = _dependents(
+        count, columns["offsets"], columns["dependencies"])
+    _check_acyclic(columns["names"], columns["offsets"],
+                   columns["dependencies"], dependent_offsets)
+    meta = marshal.dumps((
+        columns["arguments"], columns["durations"], columns["timeouts"],
+        columns["requirements"], columns["stdin_sources"],
+        settings.default_timeout))
+    edges = len(columns["dependencies"])
+    names = columns["names"]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(meta), count, edges,
+                                 len(names.blob), len(names.slots)))
+            f.write(meta)
+            f.write(bytes(_align(_HEADER.size + len(meta))))
+            # The 8-byte offsets first, so every section is aligned
+            f.write(array("q", columns["offsets"]).tobytes())
+            f.write(dependent_offsets.tobytes())
+            f.write(array("q", names.offsets).tobytes())
+            f.write(array("i", columns["dependencies"]).tobytes())
+            f.write(dependent_ids.tobytes())
+            f.write(array("i", names.slots).tobytes())
+            f.write(columns["types"])
+            f.write(names.blob)
+        os.replace(temp_path, cache_path(cache_dir, key))
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    prune(cache_dir, max_bytes, keep=cache_path(cache_dir, key))
+
+
+def _read(path: str) -> Optional[Tuple[Any, ...]]:
+    """Map a cache file and split it, None if it is missing or damaged.
+
+    :return: The marshalled part, the dependency and dependent offsets,
+             the name offsets, the dependency and dependent ids, the slots
+             of the name table, the task types and the names.
+    """
+
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        (magic, meta_size, count, edges, name_size,
+         slots) = _HEADER.unpack_from(mapped)
+        start = _HEADER.size + meta_size
+        start += _align(start)
+        sections = []
+        for typecode, length in (("q", count + 1), ("q", count + 1),
+                                 ("q", count + 1), ("i", edges),
+                                 ("i", edges), ("i", slots)):
+            end = start + array(typecode).itemsize * length
+            sections.append((typecode, start, end))
+            start = end
+        if (magic != _MAGIC or not slots or slots & (slots - 1)
+                or len(mapped) != start + count + name_size):
+            raise ValueError("truncated")
+        meta = marshal.loads(mapped[_HEADER.size:_HEADER.size + meta_size])
+    except (struct.error, ValueError, EOFError, TypeError) as e:
+        logger.warning(f"Ignoring the damaged graph cache {path}: {e}")
+        return None
+    view = memoryview(mapped)
+    return (meta, *(view[begin:end].cast(typecode)
+                    for typecode, begin, end in sections),
+            mapped[start:start + count], view[start + count:])
+
+
+def load_graph(task_tracker: TaskTracker, cache_dir: str, key: str
+               ) -> Optional[InputModel]:
+    """Populate an empty tracker from the cache, if the graph is cached.
+
+    Nothing is validated. A CompactTaskTracker uses the edge arrays of the
+    memory-mapped file as they are, resolved to ids and in both directions;
+    a TaskTracker gets its Task models constructed from them. The file is
+    touched, so `prune()` removes the least recently used graphs first.
+
+    :param task_tracker: The empty TaskTracker instance to populate.
+    :param cache_dir: The directory of the cache.
+    :param key: The `cache_key()` of the input.
+    :return: The settings at the top level of the input, None on a miss.
+    """
+
+    path = cache_path(cache_dir, key)
+    read = _read(path)
+    if read is None:
+        return None
+    try:
+        os.utime(path)
+    except OSError as e:
+        logger.debug(f"Could not touch {path}: {e}")
+    (meta, offsets, dependent_offsets, name_offsets, dependency_ids,
+     dependent_ids, slots, types, blob) = read
+    (arguments, durations, timeouts, requirements, stdin_sources,
+     default_timeout) = meta
+    names = _NameTable(blob, name_offsets, slots)
+
+    if isinstance(task_tracker, CompactTaskTracker):
+        task_tracker.names = names
+        task_tracker.ids = _NameIds(names)
+        task_tracker.types = bytearray(types)
+        task_tracker.statuses = bytearray(len(names))
+        task_tracker.arguments = arguments
+        task_tracker.declared_durations = durations
+        task_tracker.declared_timeouts = timeouts
+        task_tracker.declared_requirements = requirements
+        task_tracker.stdin_sources = stdin_sources
+        task_tracker.dependency_offsets = offsets
+        task_tracker.dependency_ids = dependency_ids
+        task_tracker.dependency_names = []
+        task_tracker.dependent_offsets = dependent_offsets
+        task_tracker.dependent_ids = dependent_ids
+        task_tracker.prepared = True
+    else:
+        names = [sys.intern(name) for name in names]
+        for task_id, name in enumerate(names):
+            cpus, memory_mb = requirements.get(task_id, (None, None))
+            numbers = {field: float(value) for field, value in (
+                ("duration", durations.get(task_id)),
+                ("timeout", timeouts.get(task_id)),
+                ("cpus", cpus), ("memory_mb", memory_mb))
+                if value is not None}
+            task_tracker.add_task(name, Task.model_construct(
+                type=_TYPES[types[task_id]],
+                arguments=arguments[task_id],
+                dependencies=tuple(
+                    names[dep] for dep in dependency_ids[
+                        offsets[task_id]:offsets[task_id + 1]]),
+                stdin_from=stdin_sources.get(task_id),
+                **numbers,
+            ))
+    logger.info(f"Loaded {len(names)} tasks from the graph cache")
+    return InputModel(tasks=[], default_timeout=default_timeout)
@@ -0,0 +1,49 @@
+import json
+import os
+from scheduler.logger import get_logger
+from typing import Dict
+
+logger = get_logger(__name__)
+
+# Weight of the newest measurement when updating a recorded duration
+SMOOTHING = 0.5
+
+
+def load_history(path: str) -> Dict[str, float]:
+    """Load the recorded task durations of earlier runs.
+
+    :param path: The path to the history file.
+    :return: A mapping of task names to durations in seconds, empty if the
+             file does not exist yet.
+    """
+
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {name: float(duration)
+                for name, duration in json.load(f).items()}
+
+
+def update_history(path: str, durations: Dict[str, float]) -> None:
+    """Merge the durations measured in a run into the history file.
+
+    Durations already in the history are exponentially smoothed with the
+    new measurement, so a single outlier does not replace them.
+
+    :param path: The path to the history file.
+    :param durations: The measured durations in seconds by task name.
+    """
+
+    history = load_history(path)
+    for name, duration in durations.items():
+        previous = history.get(name)
+        if previous is None:
+            history[name] = duration
+        else:
+            history[name] = SMOOTHING * duration + (1 - SMOOTHING) * previous
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(history, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+    logger.debug(f"Recorded {len(durations)} task durations in {path}")
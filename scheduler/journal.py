@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import time
+from scheduler.logger import get_logger
+from scheduler.models import TaskStatus
+from typing import Dict, Optional
+
+logger = get_logger(__name__)
+
+
+class Journal:
+    """An append-only record of every task status change of a run.
+
+    Every change is written as a JSON line straight away, so it survives a
+    crash of the scheduler. To keep the overhead low, the file is only
+    fsynced every `fsync_interval` seconds and when the journal is closed,
+    which bounds what a crash of the whole machine can lose. When changes
+    are recorded from an event loop, a timer of the loop syncs them once
+    the interval expires, even if nothing else is recorded in the meantime.
+    """
+
+    def __init__(self, path: str, fsync_interval: float = 1.0):
+        """Open a journal for appending.
+
+        :param path: The path to the journal file.
+        :param fsync_interval: The maximum time in seconds between fsyncs.
+        """
+
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.file = open(path, "a")
+        self.last_sync = time.monotonic()
+        self.unsynced = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def record(self, name: str, status: TaskStatus):
+        """Append a status change of a task.
+
+        This has the signature of a TaskTracker status listener.
+
+        :param name: The name of the task.
+        :param status: The new status of the task.
+        """
+
+        self.file.write(json.dumps(
+            {"time": time.time(), "task": name, "status": status.name}
+        ) + "\n")
+        self.file.flush()
+        self.unsynced += 1
+
+        now = time.monotonic()
+        if now - self.last_sync >= self.fsync_interval:
+            self.sync()
+        elif self.timer is None:
+            self._schedule_sync(self.last_sync + self.fsync_interval - now)
+
+    def _schedule_sync(self, delay: float):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Without a loop, the next change or closing syncs the journal
+            return
+        self.timer = loop.call_later(delay, self.sync)
+
+    def sync(self):
+        """Force the recorded changes to disk."""
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_journal(path: str) -> Dict[str, TaskStatus]:
+    """Read the last recorded status of every task in a journal.
+
+    A partially written last line, as left behind by a crash, is ignored,
+    and so are entries without a task name or a known status.
+
+    :param path: The path to the journal file.
+    :return: The last status of each task by name.
+    """
+
+    statuses = {}
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            try:
+                entry = json.loads(line)
+                task, status = entry["task"], TaskStatus[entry["status"]]
+                if not isinstance(task, str):
+                    raise TypeError(f"invalid task name: {task!r}")
+            except (json.JSONDecodeError, KeyError, TypeError):
+                logger.warning(
+                    f"Ignoring corrupt journal entry at {path}:{line_number}")
+                continue
+            statuses[task] = status
+    return statuses
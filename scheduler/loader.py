@@ -1,8 +1,22 @@
 import json
-from jsonschema import validate
-from scheduler.models import Task, InputModel, InputTaskModel
+import re
+import sys
+from functools import lru_cache
+from scheduler.executor import compile_snippet
+from scheduler.graph_cache import (MAX_CACHE_BYTES, cache_key, load_graph,
+                                   store_graph)
+from scheduler.logger import get_logger
+from scheduler.models import Task, TaskStatus, InputModel, InputTaskModel
+from scheduler.schema import covers_task_model, split_tasks_schema
 from scheduler.task_tracker import TaskTracker
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+logger = get_logger(__name__)
+
+# Size of the chunks read from the input file by the streaming loader
+_CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = re.compile(r"\s*")
 
 
 def load_and_validate_data(file_path: str, schema_path: str) -> InputModel:
@@ -17,6 +31,8 @@ def load_and_validate_data(file_path: str, schema_path: str) -> InputModel:
                                       Pydantic model.
     """
 
+    from jsonschema import validate
+
     with open(file_path) as f:
         raw_data = json.load(f)
 
@@ -42,10 +58,60 @@ def validate_unique_task_names(tasks_data: List[InputTaskModel]) -> None:
         seen_names.add(task.name)
 
 
+def validate_eval_snippets(tasks_data: List[InputTaskModel]) -> None:
+    """Compile the code of all 'eval' tasks.
+
+    This reports syntax errors when the tasks are loaded instead of when
+    they run, and warms the compile cache so that identical snippets are
+    only compiled once.
+
+    :param tasks_data: A list of validated task data models.
+    :raises SyntaxError: If the code of an 'eval' task is not valid Python.
+    """
+
+    for task in tasks_data:
+        if task.type == "eval":
+            _compile_eval(task.name, task.arguments)
+
+
+def _compile_eval(name: str, code: str):
+    try:
+        compile_snippet(code)
+    except SyntaxError as e:
+        raise SyntaxError(f"Invalid code in eval task {name}: {e}") from e
+
+
+def _construct_task(record: Dict[str, Any]) -> Task:
+    """Build the Task of a record proven valid by a schema that covers the
+    input model, see `covers_task_model`, without validating it again."""
+
+    get = record.get
+    # Every field is given, as the defaults are deep-copied otherwise
+    return Task.model_construct(
+        type=record["type"],
+        arguments=sys.intern(record["arguments"]),
+        dependencies=tuple(get("dependencies", ())),
+        duration=_optional_float(get("duration")),
+        timeout=_optional_float(get("timeout")),
+        cpus=_optional_float(get("cpus")),
+        memory_mb=_optional_float(get("memory_mb")),
+        stdin_from=get("stdin_from"),
+        status=TaskStatus.PENDING,
+    )
+
+
+def _optional_float(value: Any) -> Optional[float]:
+    return None if value is None else float(value)
+
+
 def populate_task_tracker(task_tracker: TaskTracker,
                           tasks_data: List[InputTaskModel]) -> None:
     """Populate a TaskTracker from validated input tasks data.
 
+    Task arguments are interned, so that repeated snippets share a single
+    string. The task data is already validated, so the tasks are
+    constructed without validating them again.
+
     :param task_tracker: The TaskTracker instance to populate.
     :param tasks_data: A list of validated task data models.
     """
@@ -53,28 +119,383 @@ def populate_task_tracker(task_tracker: TaskTracker,
     for task_data in tasks_data:
         task_tracker.add_task(
             task_data.name,
-            Task(
+            Task.model_construct(
                 type=task_data.type,
-                arguments=task_data.arguments,
+                arguments=sys.intern(task_data.arguments),
                 dependencies=task_data.dependencies,
+                duration=task_data.duration,
+                timeout=task_data.timeout,
+                cpus=task_data.cpus,
+                memory_mb=task_data.memory_mb,
+                stdin_from=task_data.stdin_from,
             ),
         )
 
 
+# Numbers of a Task that must be positive, the others may be zero
+_POSITIVE_FIELDS = ("timeout", "cpus")
+
+
+def _check_trusted_record(record: Dict[str, Any]):
+    """Check the fields of a trusted record that `_construct_task` relies
+    on, the few checks that stand in for the Task model.
+
+    :raises ValueError: If a field has the wrong type or is out of bounds.
+    """
+
+    if record.get("type") not in ("eval", "exec"):
+        raise ValueError(f"Invalid task type: {record.get('type')!r}")
+    if not isinstance(record.get("arguments"), str):
+        raise ValueError(
+            f"Invalid task arguments: {record.get('arguments')!r}")
+    dependencies = record.get("dependencies", ())
+    if (not isinstance(dependencies, (list, tuple))
+            or not all(isinstance(dep, str) for dep in dependencies)):
+        raise ValueError(f"Invalid task dependencies: {dependencies!r}")
+    for field in ("duration", "timeout", "cpus", "memory_mb"):
+        value = record.get(field)
+        if value is None:
+            continue
+        # Written so that NaN is rejected as well
+        if (isinstance(value, bool) or not isinstance(value, (int, float))
+                or not value >= 0
+                or (value == 0 and field in _POSITIVE_FIELDS)):
+            raise ValueError(f"Invalid task {field}: {value!r}")
+    stdin_from = record.get("stdin_from")
+    if stdin_from is not None and not isinstance(stdin_from, str):
+        raise ValueError(f"Invalid task stdin_from: {stdin_from!r}")
+
+
+def _add_trusted_task(task_tracker: TaskTracker, record: Dict[str, Any]):
+    """Add an input record to the tracker without the input model.
+
+    :param task_tracker: The TaskTracker instance to populate.
+    :param record: A task record of the input.
+    :raises ValueError: If the name of the task is missing or taken, or a
+                        field has the wrong type.
+    """
+
+    name = record.get("name")
+    if not isinstance(name, str):
+        raise ValueError(f"Invalid task name: {name!r}")
+    if name in task_tracker.tasks:
+        raise ValueError(f"Duplicate task name found: {name}")
+    _check_trusted_record(record)
+    task = _construct_task(record)
+    if task.type == "eval":
+        _compile_eval(name, task.arguments)
+    task_tracker.add_task(name, task)
+
+
+class _JsonStream:
+    """Incremental reader for the structural tokens and values of a JSON
+    document, holding only a bounded window of the file in memory."""
+
+    def __init__(self, f: TextIO):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(_CHUNK_SIZE)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, "" at EOF."""
+
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(
+                f"Expected {char!r} but found {found!r}",
+                self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self._fill():
+                    raise
+                continue
+            # A number at the end of the window may continue in the file
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def stream_tasks(f: TextIO, document: Dict[str, Any]
+                 ) -> Iterator[Any]:
+    """Yield the entries of the "tasks" array of an input file one by one.
+
+    The other top-level keys of the input are collected into `document`,
+    with "tasks" set to an empty list once the array was found.
+
+    :param f: The opened input file.
+    :param document: A dict receiving the other top-level keys.
+    :raises json.JSONDecodeError: If the file is not valid JSON or its top
+                                  level is not an object.
+    """
+
+    stream = _JsonStream(f)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "tasks" and stream.peek() == "[":
+            document["tasks"] = []
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.expect("]")
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.peek() == ",":
+                        stream.expect(",")
+                    else:
+                        stream.expect("]")
+                        break
+        else:
+            document[key] = stream.value()
+
+        if stream.peek() == ",":
+            stream.expect(",")
+        else:
+            stream.expect("}")
+            return
+
+
+@lru_cache(maxsize=None)
+def load_schema(schema_path: str
+                ) -> Tuple[Any, Any, bool, Optional[Dict[str, Any]]]:
+    """Read a JSON schema and prepare the validators of the streaming
+    loader, see `scheduler.schema.split_tasks_schema`.
+
+    The result is cached, so a long-running process only reads each schema
+    once.
+
+    :param schema_path: The path to the JSON schema file.
+    :return: A jsonschema validator for the document with an empty tasks
+             array, one for the task items or None, whether the valid items
+             are valid for the input model as well, and the keywords of the
+             tasks array to check on the records. The keywords are None
+             when the schema needs the whole tasks array, and the validator
+             is then for the whole document.
+    :raises jsonschema.SchemaError: If the schema itself is invalid.
+    """
+
+    # jsonschema is slow to import, so only runs with a schema pay for it
+    from jsonschema.validators import validator_for
+
+    with open(schema_path) as f:
+        schema = json.load(f)
+    validator_class = validator_for(schema)
+    validator_class.check_schema(schema)
+    validator = validator_class(schema)
+    split = split_tasks_schema(schema)
+    if split is None:
+        return validator, None, False, None
+    document_schema, item_schema, keywords = split
+    item_validator = None
+    if item_schema is not None:
+        item_validator = validator.evolve(schema=item_schema)
+    covered = isinstance(item_schema, dict) and covers_task_model(item_schema)
+    # Keywords of later drafts are ignored by earlier ones
+    keywords = {keyword: argument for keyword, argument in keywords.items()
+                if keyword in validator_class.VALIDATORS}
+    return (validator.evolve(schema=document_schema), item_validator, covered,
+            keywords)
+
+
+def _check_tasks_array(keywords: Dict[str, Any], count: int, matched: int):
+    """Check the keywords of the tasks array that `load_schema` removed from
+    the schema of the document, on the streamed records.
+
+    uniqueItems always holds, since the names of the tasks are unique.
+
+    :param keywords: The keywords of the tasks array.
+    :param count: The number of tasks.
+    :param matched: The number of tasks valid against `contains`.
+    :raises jsonschema.ValidationError: If the tasks array is invalid.
+    """
+
+    from jsonschema import ValidationError
+
+    message = None
+    if count < keywords.get("minItems", 0):
+        message = (f"The tasks array has {count} items, fewer than "
+                   f"minItems {keywords['minItems']}")
+    elif "maxItems" in keywords and count > keywords["maxItems"]:
+        message = (f"The tasks array has {count} items, more than "
+                   f"maxItems {keywords['maxItems']}")
+    elif "contains" in keywords:
+        maximum = keywords.get("maxContains")
+        if (matched < keywords.get("minContains", 1)
+                or maximum is not None and matched > maximum):
+            message = (f"{matched} of the {count} tasks are valid against "
+                       f"the contains schema {keywords['contains']!r}")
+    if message is not None:
+        raise ValidationError(message, path=("tasks",))
+
+
 def load_tasks(task_tracker: TaskTracker,
                file_path: str,
-               schema_path: str) -> None:
+               schema_path: Optional[str] = None,
+               trusted: bool = False,
+               cache_dir: Optional[str] = None,
+               cache_max_bytes: int = MAX_CACHE_BYTES) -> InputModel:
     """Load tasks from a JSON file and populate a TaskTracker.
 
-    This function orchestrates the loading and validation of tasks from a
-    JSON file and then populates a given TaskTracker instance with those
-    tasks.
+    See `read_tasks`, which does the work on the opened file. With a cache
+    directory, the graph is looked up by the hash of the input and schema
+    files first, and loaded without any validation when it is found.
+    Otherwise it is loaded and validated as usual, its dependencies are
+    checked and it is written to the cache, so changing either file
+    invalidates it. The least recently used graphs are removed once the
+    cache exceeds `cache_max_bytes`.
 
     :param task_tracker: The TaskTracker instance to populate.
     :param file_path: The path to the input JSON file.
     :param schema_path: The path to the JSON schema file for validation.
+                        Schema validation is skipped when omitted.
+    :param trusted: Whether the input comes from a trusted generator, see
+                    `read_tasks`.
+    :param cache_dir: The directory of the graph cache, if any.
+    :param cache_max_bytes: The size the graph cache may take up.
+    :return: The settings at the top level of the input, such as the
+             default timeout, with an empty list of tasks.
+    :raises KeyError: With a cache directory, if a task has a dependency on
+                      a task that does not exist.
+    :raises graphlib.CycleError: With a cache directory, if a circular
+                                 dependency is detected.
+    """
+
+    if cache_dir is not None:
+        key = cache_key(file_path, schema_path)
+        settings = load_graph(task_tracker, cache_dir, key)
+        if settings is not None:
+            return settings
+
+    with open(file_path) as f:
+        settings = read_tasks(task_tracker, f, schema_path, file_path,
+                              trusted)
+    if cache_dir is not None:
+        try:
+            store_graph(task_tracker, settings, cache_dir, key,
+                        cache_max_bytes)
+        except OSError as e:
+            logger.warning(f"Could not write the graph cache: {e}")
+    return settings
+
+
+def read_tasks(task_tracker: TaskTracker,
+               f: TextIO,
+               schema_path: Optional[str] = None,
+               source: str = "the input",
+               trusted: bool = False) -> InputModel:
+    """Read tasks from an opened JSON document and populate a TaskTracker.
+
+    The tasks are streamed out of the input file and handled in a single
+    pass: each record is validated once, checked for a unique name and a
+    valid 'eval' snippet, and added to the TaskTracker. The input file is
+    never held in memory as a whole. A record is validated against the
+    schema of the task items. When the schema implies the constraints of
+    the Pydantic model, a valid record becomes a Task without validating it
+    again. Otherwise it is validated against the Pydantic model, and
+    without a schema only against the model. The rest of the document is
+    validated at the end, and the keywords of the tasks array that depend
+    on its items are checked by counting the records. A schema that needs
+    the tasks array as a whole, see `scheduler.schema.split_tasks_schema`,
+    keeps the records until the document is validated.
+
+    A trusted input skips the input model: each record is turned into a
+    Task directly, after checking the types and bounds of its fields.
+    Names, 'eval' snippets and the schema, if given, are still checked.
+
+    :param task_tracker: The TaskTracker instance to populate.
+    :param f: The opened input document.
+    :param schema_path: The path to the JSON schema file for validation.
+                        Schema validation is skipped when omitted.
+    :param source: The name of the input, for error messages.
+    :param trusted: Whether the records can be trusted to be well formed.
+    :return: The settings at the top level of the input, such as the
+             default timeout, with an empty list of tasks.
+    :raises jsonschema.ValidationError: If the input data is invalid against
+                                        the schema.
+    :raises pydantic.ValidationError: If the input data is invalid for the
+                                      Pydantic model.
+    :raises ValueError: If the input is not valid JSON, has no tasks array
+                        or contains duplicate task names.
+    :raises SyntaxError: If the code of an 'eval' task is not valid Python.
     """
 
-    validated_data = load_and_validate_data(file_path, schema_path)
-    validate_unique_task_names(validated_data.tasks)
-    populate_task_tracker(task_tracker, validated_data.tasks)
+    validator = item_validator = contains = kept = None
+    covered = False
+    keywords = {}
+    if schema_path is not None:
+        validator, item_validator, covered, keywords = load_schema(
+            schema_path)
+        if keywords is None:
+            kept = []
+        elif "contains" in keywords:
+            contains = validator.evolve(schema=keywords["contains"])
+
+    document = {}
+    count = matched = 0
+    for record in stream_tasks(f, document):
+        count += 1
+        if contains is not None and contains.is_valid(record):
+            matched += 1
+        if kept is not None:
+            kept.append(record)
+        if item_validator is not None:
+            item_validator.validate(record)
+        if covered:
+            name = record["name"]
+            if name in task_tracker.tasks:
+                raise ValueError(f"Duplicate task name found: {name}")
+            task = _construct_task(record)
+            if task.type == "eval":
+                _compile_eval(name, task.arguments)
+            task_tracker.add_task(name, task)
+            continue
+        if trusted:
+            _add_trusted_task(task_tracker, record)
+            continue
+        task_data = InputTaskModel.model_validate(record)
+        if task_data.name in task_tracker.tasks:
+            raise ValueError(
+                f"Duplicate task name found: {task_data.name}")
+        if task_data.type == "eval":
+            validate_eval_snippets([task_data])
+        populate_task_tracker(task_tracker, [task_data])
+
+    # The tasks were validated one by one, check the rest of the document
+    if validator is not None:
+        if kept is not None and "tasks" in document:
+            document["tasks"] = kept
+        validator.validate(document)
+        if keywords:
+            _check_tasks_array(keywords, count, matched)
+    if "tasks" not in document:
+        raise ValueError(f"No tasks array found in {source}")
+    return InputModel.model_validate(document)
@@ -1,18 +1,131 @@
+import atexit
+import copy
+import json
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
+
+TEXT_FORMAT = '%(asctime)s | %(name)25s | %(levelname)6s | %(message)s'
+
+# Structured fields that log calls pass through `extra`
+FIELDS = ("task", "status", "duration")
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as JSON lines with the structured fields of a task."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry)
+
+
+class _QueueHandler(QueueHandler):
+    """Queue records with their message and traceback rendered to text.
+
+    Unlike `QueueHandler.prepare`, the traceback is kept apart from the
+    message in `exc_text`, so the listener's formatter can still put it in
+    a field of its own.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+        # The traceback would keep the frames and their locals alive
+        record.exc_info = None
+        return record
+
+
+_output = logging.StreamHandler(sys.stdout)
+_output.setLevel(logging.INFO)
+_output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_listener: Optional[QueueListener] = None
+_handler: logging.Handler = _QueueHandler(_queue)
+_loggers: List[logging.Logger] = []
+
+
+def _start_listener():
+    """Start the thread that formats and writes the queued records."""
+
+    global _listener
+    if _listener is None:
+        _listener = QueueListener(_queue, _output)
+        _listener.start()
+        atexit.register(_stop_listener)
+
+
+def _stop_listener():
+    """Write out the queued records and stop the listener thread."""
+
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(log_format: str = "text", queued: bool = True):
+    """Configure the output of all scheduler loggers.
+
+    :param log_format: "text" for human readable lines, "json" for one JSON
+                       object per line, with the task name, status and
+                       duration as separate fields where they apply.
+    :param queued: Hand records to a background thread through a queue,
+                   so slow output does not block the event loop. Without
+                   it records are written synchronously.
+    """
+
+    global _handler
+    if log_format == "json":
+        _output.setFormatter(JsonFormatter())
+    else:
+        _output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    if queued:
+        handler = _QueueHandler(_queue)
+        _start_listener()
+    else:
+        # Write out what is still queued before writing synchronously
+        _stop_listener()
+        handler = _output
+    for logger in _loggers:
+        logger.removeHandler(_handler)
+        logger.addHandler(handler)
+    _handler = handler
 
 
 def get_logger(name: str):
-    """Get a logger instance."""
+    """Get a logger instance.
+
+    All scheduler loggers share one handler. By default it queues the
+    records for a background thread, which formats and writes them.
+    """
 
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
     if not logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(logging.INFO)
-        formatter = logging.Formatter(
-            '%(asctime)s | %(name)25s | %(levelname)6s | %(message)s'
-        )
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        logger.addHandler(_handler)
+        _loggers.append(logger)
+        if isinstance(_handler, QueueHandler):
+            _start_listener()
     return logger
@@ -9,12 +9,19 @@ class TaskStatus(Enum):
     OK = 2
     FAILED = 3
     SKIPPED = 4
+    CANCELLED = 5
+    TIMEOUT = 6
 
 
 class Task(BaseModel):
     type: Literal["eval", "exec"]
     arguments: str
     dependencies: Tuple[str, ...] = Field(default_factory=tuple)
+    duration: Optional[float] = Field(default=None, ge=0)
+    timeout: Optional[float] = Field(default=None, gt=0)
+    cpus: Optional[float] = Field(default=None, gt=0)
+    memory_mb: Optional[float] = Field(default=None, ge=0)
+    stdin_from: Optional[str] = None
     status: TaskStatus = TaskStatus.PENDING
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
@@ -24,15 +31,44 @@ class InputTaskModel(BaseModel):
     type: Literal["eval", "exec"]
     arguments: str
     dependencies: Tuple[str, ...] = Field(default_factory=tuple)
+    duration: Optional[float] = Field(default=None, ge=0)
+    timeout: Optional[float] = Field(default=None, gt=0)
+    cpus: Optional[float] = Field(default=None, gt=0)
+    memory_mb: Optional[float] = Field(default=None, ge=0)
+    stdin_from: Optional[str] = None
 
 
 class InputModel(BaseModel):
     tasks: List[InputTaskModel]
+    default_timeout: Optional[float] = Field(default=None, gt=0)
 
 
 class ExecutionResult(BaseModel):
     stdout: str = ""
     stderr: str = ""
-    return_code: int = None
+    return_code: Optional[int] = None
     exception: Optional[Exception] = None
+    streamed: bool = False
+    started: Optional[float] = None
+    duration: Optional[float] = None
+    timed_out: bool = False
     model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+class RunnerConfig(BaseModel):
+    max_concurrency: Optional[int] = Field(default=None, gt=0)
+    max_exec: Optional[int] = Field(default=None, gt=0)
+    max_eval: Optional[int] = Field(default=None, gt=0)
+    eval_mode: Literal["thread", "process"] = "thread"
+    eval_preload: Tuple[str, ...] = Field(default_factory=tuple)
+    output_limit: int = Field(default=64 * 1024, gt=0)
+    output_dir: Optional[str] = None
+    exec_mode: Literal["shell", "direct"] = "shell"
+    exec_spawner: bool = False
+    fail_fast: bool = False
+    default_timeout: Optional[float] = Field(default=None, gt=0)
+    eval_batch_threshold: float = Field(default=0.001, ge=0)
+    eval_batch_time: float = Field(default=0.01, gt=0)
+    cpu_capacity: Optional[float] = Field(default=None, gt=0)
+    memory_capacity_mb: Optional[float] = Field(default=None, gt=0)
+    backfill_window: float = Field(default=10.0, ge=0)
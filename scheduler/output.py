@@ -0,0 +1,151 @@
+import io
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+
+class OutputBuffer:
+    """Keep the head and the tail of a byte stream within a fixed budget.
+
+    The first half of the budget holds the start of the stream, the second
+    half is a ring buffer with the most recent bytes. Everything in between
+    is dropped, so memory use does not depend on how much a task prints.
+    Optionally the full stream is spilled to a file as it arrives.
+    """
+
+    def __init__(self, limit: int, spill_path: Optional[str] = None):
+        """Create an empty buffer.
+
+        :param limit: The maximum number of bytes kept in memory.
+        :param spill_path: A file to write the complete stream to.
+        """
+
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.spill_path = spill_path
+        self.spill_file: Optional[BinaryIO] = None
+        if spill_path is not None:
+            os.makedirs(os.path.dirname(spill_path) or ".", exist_ok=True)
+            self.spill_file = open(spill_path, "wb")
+
+    def write(self, data: bytes):
+        """Append a chunk of the stream."""
+
+        self.total += len(data)
+        if self.spill_file is not None:
+            self.spill_file.write(data)
+
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            overflow = len(self.tail) - self.tail_limit
+            if overflow > 0:
+                del self.tail[:overflow]
+
+    @property
+    def truncated(self) -> int:
+        """The number of bytes that were dropped from memory."""
+
+        return self.total - len(self.head) - len(self.tail)
+
+    def getvalue(self) -> str:
+        """Get the kept output as stripped text.
+
+        :return: The head and the tail of the stream, separated by a marker
+                 when bytes were dropped in between.
+        """
+
+        if self.truncated:
+            marker = f"\n... [{self.truncated} bytes truncated] ...\n"
+            data = bytes(self.head) + marker.encode() + bytes(self.tail)
+        else:
+            data = bytes(self.head + self.tail)
+        return data.decode(errors="replace").strip()
+
+    def close(self):
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+
+
+class _ThreadLocalStream:
+    """A stand-in for a standard stream that routes writes per thread.
+
+    Threads that registered a buffer write to it, all other threads write
+    to the stream that was installed before.
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.local = threading.local()
+
+    def _target(self):
+        buffer = getattr(self.local, "buffer", None)
+        return self.fallback if buffer is None else buffer
+
+    def write(self, data: str) -> int:
+        return self._target().write(data)
+
+    def writelines(self, lines):
+        self._target().writelines(lines)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.fallback, name)
+
+
+_capture_lock = threading.Lock()
+_capture_users = 0
+_stdout_proxy: Optional[_ThreadLocalStream] = None
+_stderr_proxy: Optional[_ThreadLocalStream] = None
+
+
+@contextmanager
+def capture_output() -> Iterator[Tuple[io.StringIO, io.StringIO]]:
+    """Capture what the current thread writes to stdout and stderr.
+
+    Unlike `contextlib.redirect_stdout`, this is safe to use from several
+    threads at once: the standard streams are replaced by thread-aware
+    proxies while at least one thread captures, and every thread only sees
+    its own output.
+
+    :return: The buffers receiving stdout and stderr of the thread.
+    """
+
+    global _capture_users, _stdout_proxy, _stderr_proxy
+
+    with _capture_lock:
+        if _capture_users == 0:
+            _stdout_proxy = _ThreadLocalStream(sys.stdout)
+            _stderr_proxy = _ThreadLocalStream(sys.stderr)
+            sys.stdout = _stdout_proxy
+            sys.stderr = _stderr_proxy
+        _capture_users += 1
+        stdout_proxy, stderr_proxy = _stdout_proxy, _stderr_proxy
+
+    out, err = io.StringIO(), io.StringIO()
+    stdout_proxy.local.buffer = out
+    stderr_proxy.local.buffer = err
+    try:
+        yield out, err
+    finally:
+        stdout_proxy.local.buffer = None
+        stderr_proxy.local.buffer = None
+        with _capture_lock:
+            _capture_users -= 1
+            if _capture_users == 0:
+                if sys.stdout is stdout_proxy:
+                    sys.stdout = stdout_proxy.fallback
+                if sys.stderr is stderr_proxy:
+                    sys.stderr = stderr_proxy.fallback
+                _stdout_proxy = _stderr_proxy = None
@@ -0,0 +1,54 @@
+from typing import Callable, Collection, Dict, List, Optional
+
+
+def check_pipe(name: str, task_type: str, dependencies: Collection[str],
+               source: str, source_type: Optional[str],
+               source_dependencies: Collection[str]):
+    """Check that the stdout of a task can be piped into another task.
+
+    Both tasks must be 'exec' tasks, and the source must be a dependency of
+    the consumer. The two run together, so the other dependencies of the
+    consumer must be dependencies of the source as well: they are then
+    done when the source starts.
+
+    :param name: The name of the consumer.
+    :param task_type: The type of the consumer.
+    :param dependencies: The dependencies of the consumer.
+    :param source: The name of the task whose stdout is read.
+    :param source_type: The type of the source, None if it does not
+                        exist.
+    :param source_dependencies: The dependencies of the source.
+    :raises ValueError: If the tasks cannot be connected with a pipe.
+    """
+
+    if source not in dependencies:
+        raise ValueError(f"Task '{name}' reads the output of '{source}', "
+                         "which is not one of its dependencies")
+    if task_type != "exec" or source_type != "exec":
+        raise ValueError(f"Task '{name}' reads the output of '{source}', "
+                         "but only 'exec' tasks can be piped")
+    missing = set(dependencies) - set(source_dependencies) - {source}
+    if missing:
+        raise ValueError(
+            f"Task '{name}' runs together with '{source}', so its other "
+            f"dependencies must be dependencies of '{source}' too: "
+            f"{', '.join(sorted(missing))}")
+
+
+def pipeline(name: str, consumers: Dict[str, List[str]],
+             is_pending: Callable[[str], bool]) -> List[str]:
+    """Collect the tasks that start together with a task.
+
+    :param name: The first task of the pipeline.
+    :param consumers: The tasks reading the stdout of every task by name.
+    :param is_pending: Tells whether a task still has to run; the tasks
+                       that do not, and the tasks reading from them, are
+                       left out.
+    :return: The tasks of the pipeline, every task after its source.
+    """
+
+    members = [name]
+    for member in members:
+        members.extend(consumer for consumer in consumers.get(member, ())
+                       if is_pending(consumer))
+    return members
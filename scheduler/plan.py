@@ -0,0 +1,211 @@
+import heapq
+import itertools
+from scheduler.models import RunnerConfig, TaskStatus
+from scheduler.task_tracker import TaskTracker
+from typing import Dict, List, Optional, Tuple
+
+
+class Plan:
+    """The static analysis of a prepared task graph.
+
+    Nothing is executed. Every task is weighted with its expected duration,
+    like for the critical path priorities: the declared duration, else the
+    duration in the history, else the mean of the known durations, or 1 if
+    there are none. Tasks that already succeeded, for example when restored
+    from a journal, weigh nothing.
+
+    The level of a task is the length in tasks of the longest chain of
+    dependencies that ends with it, so the depth of the graph is its number
+    of levels. The critical path is the chain with the largest total
+    weight; no number of slots runs the graph faster. When every task
+    starts as soon as its dependencies are done, at most `peak_parallelism`
+    tasks run at the same time, so more slots than that are of no use.
+    """
+
+    def __init__(self, task_tracker: TaskTracker):
+        """Analyze a graph.
+
+        :param task_tracker: A tracker whose topological sorter has been
+                             prepared.
+        """
+
+        self.task_tracker = task_tracker
+        names = list(task_tracker.tasks)
+        known = [duration for duration in map(task_tracker.expected_duration,
+                                              names)
+                 if duration is not None]
+        self.unknown = len(names) - len(known)
+        self.default_weight = sum(known) / len(known) if known else 1.0
+        self.weights: Dict[str, float] = {}
+        for name in names:
+            weight = task_tracker.expected_duration(name)
+            if task_tracker.status(name) == TaskStatus.OK:
+                weight = 0.0
+            self.weights[name] = (self.default_weight if weight is None
+                                  else weight)
+        self.total_work = sum(self.weights.values())
+
+        # Visit the tasks in topological order, each edge once
+        remaining = dict.fromkeys(names, 0)
+        for name in names:
+            for dependent in task_tracker.dependents_of(name):
+                remaining[dependent] += 1
+        self.dependency_counts = dict(remaining)
+        levels = dict.fromkeys(names, 1)
+        starts = dict.fromkeys(names, 0.0)
+        critical_dependency: Dict[str, Optional[str]] = dict.fromkeys(names)
+        stack = [name for name, count in remaining.items() if count == 0]
+        while stack:
+            name = stack.pop()
+            finish = starts[name] + self.weights[name]
+            for dependent in task_tracker.dependents_of(name):
+                levels[dependent] = max(levels[dependent], levels[name] + 1)
+                if (critical_dependency[dependent] is None
+                        or finish > starts[dependent]):
+                    starts[dependent] = finish
+                    critical_dependency[dependent] = name
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    stack.append(dependent)
+
+        self.depth = max(levels.values(), default=0)
+        self.widths = [0] * self.depth
+        for level in levels.values():
+            self.widths[level - 1] += 1
+
+        finishes = {name: starts[name] + self.weights[name] for name in names}
+        last = max(finishes, key=finishes.get, default=None)
+        self.critical_path_length = 0.0 if last is None else finishes[last]
+        self.critical_path: List[str] = []
+        while last is not None:
+            self.critical_path.append(last)
+            last = critical_dependency[last]
+        self.critical_path.reverse()
+
+        # Tasks ending at a time are out before those starting at it
+        events = sorted(itertools.chain(
+            ((start, 1) for start in starts.values()),
+            ((finish, -1) for finish in finishes.values())))
+        running = self.peak_parallelism = 0
+        for _, change in events:
+            running += change
+            self.peak_parallelism = max(self.peak_parallelism, running)
+
+    @property
+    def average_parallelism(self) -> float:
+        """The total work divided by the length of the critical path."""
+
+        if not self.critical_path_length:
+            return float(bool(self.weights))
+        return self.total_work / self.critical_path_length
+
+    def makespan(self, config: RunnerConfig) -> float:
+        """Estimate the duration of a run with the given limits.
+
+        The run is simulated like the dispatcher does it: whenever a slot is
+        free, the ready task with the highest priority among the task types
+        that still have room is started. Only the count limits are applied;
+        resource requirements, batching and the overhead of the scheduler
+        are not taken into account.
+
+        :param config: The concurrency limits of the run.
+        :return: The estimated makespan in seconds.
+        """
+
+        task_tracker = self.task_tracker
+        limits = {"exec": config.max_exec, "eval": config.max_eval}
+        remaining = dict(self.dependency_counts)
+        sequence = itertools.count()
+        ready: Dict[str, List[Tuple[float, int, str]]] = {"exec": [],
+                                                          "eval": []}
+
+        def enqueue(name: str):
+            heapq.heappush(ready[task_tracker.task_type(name)],
+                           (-task_tracker.priority(name), next(sequence),
+                            name))
+
+        for name, count in remaining.items():
+            if count == 0:
+                enqueue(name)
+        running = {"exec": 0, "eval": 0}
+        finishing: List[Tuple[float, int, str]] = []
+        now = 0.0
+        while True:
+            while (config.max_concurrency is None
+                   or sum(running.values()) < config.max_concurrency):
+                heads = [(queue[0], task_type)
+                         for task_type, queue in ready.items()
+                         if queue and (limits[task_type] is None
+                                       or running[task_type]
+                                       < limits[task_type])]
+                if not heads:
+                    break
+                _, task_type = min(heads)
+                _, _, name = heapq.heappop(ready[task_type])
+                running[task_type] += 1
+                heapq.heappush(finishing, (now + self.weights[name],
+                                           next(sequence), name))
+            if not finishing:
+                return now
+            now, _, name = heapq.heappop(finishing)
+            running[task_tracker.task_type(name)] -= 1
+            for dependent in task_tracker.dependents_of(name):
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    enqueue(dependent)
+
+    def summary(self, config: Optional[RunnerConfig] = None,
+                listed: int = 10) -> str:
+        """Describe the graph and estimate its makespan.
+
+        The makespan is estimated for 1, 2, 4... slots up to the peak
+        parallelism, and for the limits of `config` if it sets any.
+
+        :param config: The limits of the run, if any.
+        :param listed: The number of tasks of the critical path to list at
+                       its start and at its end.
+        :return: The summary, in lines of text.
+        """
+
+        lines = [f"{len(self.weights)} tasks, {self.total_work:.3f}s of "
+                 "work"]
+        if self.unknown:
+            lines.append(f"  {self.unknown} tasks without a known duration "
+                         f"are counted as {self.default_weight:.3f}s")
+        widths = []
+        for width, group in itertools.groupby(self.widths):
+            repeat = len(list(group))
+            widths.append(f"{width} x{repeat}" if repeat > 1 else str(width))
+        lines.append(f"Depth: {self.depth} levels")
+        lines.append(f"Width per level: {', '.join(widths)}")
+
+        path = self.critical_path
+        if len(path) > 2 * listed:
+            path = path[:listed] + ["..."] + path[-listed:]
+        lines.append(f"Critical path: {self.critical_path_length:.3f}s, "
+                     f"{len(self.critical_path)} tasks")
+        if path:
+            lines.append(f"  {' -> '.join(path)}")
+        lines.append(f"Parallelism: average {self.average_parallelism:.1f}, "
+                     f"peak {self.peak_parallelism}")
+        if len(self.weights) > 1 and self.average_parallelism < 1.5:
+            lines.append("  The graph is mostly serialized: adding slots "
+                         "will not make it run faster")
+
+        lines.append("Estimated makespan:")
+        slots = 1
+        while slots < self.peak_parallelism:
+            makespan = self.makespan(RunnerConfig(max_concurrency=slots))
+            lines.append(f"  {slots:6} slots  {makespan:10.3f}s")
+            slots *= 2
+        lines.append(f"  {max(self.peak_parallelism, 1):6} slots  "
+                     f"{self.critical_path_length:10.3f}s")
+        if config is not None and (config.max_concurrency or config.max_exec
+                                   or config.max_eval):
+            limits = ", ".join(
+                f"{limit} {value}" for limit, value in (
+                    ("max_concurrency", config.max_concurrency),
+                    ("max_exec", config.max_exec),
+                    ("max_eval", config.max_eval)) if value is not None)
+            lines.append(f"  with {limits}: {self.makespan(config):.3f}s")
+        return "\n".join(lines)
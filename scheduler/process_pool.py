@@ -0,0 +1,219 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Executor, Future
+from scheduler.logger import get_logger
+from typing import Callable, Optional, Tuple
+
+logger = get_logger(__name__)
+
+
+class WorkerLostError(RuntimeError):
+    """Raised for a call whose worker process exited before replying."""
+
+
+class CallTimeoutError(TimeoutError):
+    """Raised for a call that did not finish within its timeout."""
+
+
+def _worker_main(conn, initializer: Optional[Callable], initargs: Tuple):
+    """Serve calls received over a pipe until the pool closes it.
+
+    :param conn: The worker end of the pipe shared with the pool.
+    :param initializer: A callable run once when the worker starts.
+    :param initargs: The arguments passed to the initializer.
+    """
+
+    init_error = None
+    if initializer is not None:
+        try:
+            initializer(*initargs)
+        except BaseException as e:
+            init_error = e
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        fn, args = job
+        if init_error is not None:
+            result = ("error", init_error)
+        else:
+            try:
+                result = ("ok", fn(*args))
+            except BaseException as e:
+                result = ("error", e)
+
+        try:
+            conn.send(result)
+        except Exception as e:
+            # The result or the exception could not be pickled
+            conn.send(("error", RuntimeError(
+                f"Unable to send the result of the call: {e!r}")))
+
+
+class WorkerProcessPool(Executor):
+    """A pool of warm, long-lived worker processes.
+
+    Every worker process is driven by a dedicated thread in the parent which
+    sends it one call at a time over a pipe. Since a worker only ever runs a
+    single call, process-global state such as `sys.stdout` can safely be
+    redirected per call. Workers are started when the pool is created and
+    are reused for all calls; a worker that dies is replaced transparently
+    and only the call it was running fails. A worker that exceeds the
+    timeout of a call is killed and replaced the same way.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 initializer: Optional[Callable] = None,
+                 initargs: Tuple = ()):
+        """Start the worker processes.
+
+        :param max_workers: The number of worker processes, defaults to
+                            the number of CPUs.
+        :param initializer: A callable run once in every worker process.
+        :param initargs: The arguments passed to the initializer.
+        """
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+
+        self._context = multiprocessing.get_context("spawn")
+        self._initializer = initializer
+        self._initargs = initargs
+        self._jobs = queue.SimpleQueue()
+        self._shutdown_lock = threading.Lock()
+        self._is_shutdown = False
+        self._threads = [
+            threading.Thread(target=self._serve, daemon=True,
+                             name=f"process-pool-{i}")
+            for i in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self._initializer, self._initargs),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _serve(self):
+        """Feed queued calls to one worker process until shutdown."""
+
+        process, conn = self._spawn()
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+
+                future, fn, args, timeout = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                try:
+                    conn.send((fn, args))
+                except (OSError, ValueError):
+                    # Broken pipe, the worker is gone
+                    status, value = None, None
+                except Exception as e:
+                    # The call itself could not be pickled
+                    future.set_exception(e)
+                    continue
+                else:
+                    if timeout is not None and not conn.poll(timeout):
+                        process.kill()
+                        process.join()
+                        conn.close()
+                        logger.warning(
+                            f"Killed worker process {process.pid} after "
+                            f"{timeout}s, starting a new one")
+                        future.set_exception(CallTimeoutError(
+                            f"Call did not finish within {timeout}s"))
+                        process, conn = self._spawn()
+                        continue
+                    try:
+                        status, value = conn.recv()
+                    except (EOFError, OSError):
+                        status, value = None, None
+
+                if status == "ok":
+                    future.set_result(value)
+                elif status == "error":
+                    future.set_exception(value)
+                else:
+                    conn.close()
+                    process.join()
+                    logger.warning(
+                        f"Worker process {process.pid} exited with code "
+                        f"{process.exitcode}, starting a new one")
+                    future.set_exception(WorkerLostError(
+                        f"Worker process {process.pid} exited with code "
+                        f"{process.exitcode}"))
+                    process, conn = self._spawn()
+        finally:
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+            conn.close()
+            process.join()
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        if kwargs:
+            raise TypeError("WorkerProcessPool does not support kwargs")
+        return self.submit_with_timeout(None, fn, *args)
+
+    def submit_with_timeout(self, timeout: Optional[float], fn, /,
+                            *args) -> Future:
+        """Schedule a call that may run for at most `timeout` seconds.
+
+        The time starts when a worker process receives the call, so time
+        spent waiting for a free worker does not count. When it runs out,
+        the worker is killed and the call fails with CallTimeoutError.
+
+        :param timeout: The timeout in seconds, or None for no timeout.
+        :param fn: The picklable callable to call in a worker.
+        :return: A future for the result of the call.
+        """
+
+        with self._shutdown_lock:
+            if self._is_shutdown:
+                raise RuntimeError("cannot schedule new calls after shutdown")
+            future = Future()
+            self._jobs.put((future, fn, args, timeout))
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._shutdown_lock:
+            if self._is_shutdown:
+                return
+            self._is_shutdown = True
+
+        if cancel_futures:
+            while True:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    job[0].cancel()
+
+        for _ in self._threads:
+            self._jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
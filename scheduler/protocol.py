@@ -0,0 +1,202 @@
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import stat
+import time
+from typing import (TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional,
+                    Tuple)
+
+if TYPE_CHECKING:
+    # Pydantic is slow to import and the submit client does not need it
+    from scheduler.models import ExecutionResult
+
+# Largest message accepted, a result carries the kept output of a task
+MESSAGE_LIMIT = 16 * 1024 * 1024
+
+Message = Dict[str, Any]
+
+
+class RemoteError(RuntimeError):
+    """An exception raised by a task on a remote worker."""
+
+
+def parse_address(address: str) -> Tuple[Optional[str], Any]:
+    """Parse a coordinator address.
+
+    :param address: Either 'unix:PATH' or 'HOST:PORT'.
+    :return: A tuple of None and the socket path for Unix sockets, or of
+             the host and the port for TCP.
+    :raises ValueError: If the address is not in either form.
+    """
+
+    if address.startswith("unix:"):
+        return None, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Invalid address: {address}, expected "
+                         "'unix:PATH' or 'HOST:PORT'")
+    return host, int(port)
+
+
+def is_loopback(host: str) -> bool:
+    """Tell whether a listening host only accepts local connections."""
+
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def read_token(path: str) -> str:
+    """Read a shared token from a file, without the trailing newline.
+
+    :raises ValueError: If the file is empty.
+    """
+
+    with open(path) as f:
+        token = f.read().strip()
+    if not token:
+        raise ValueError(f"The token file {path} is empty")
+    return token
+
+
+def require_token(address: str, token: Optional[str]):
+    """Refuse to listen on TCP without a token.
+
+    Whoever connects runs commands or receives them, so only a Unix
+    socket, which is private to the user, may go without one.
+
+    :raises ValueError: If a TCP address is given without a token.
+    """
+
+    host, _ = parse_address(address)
+    if host is not None and token is None:
+        where = "any local user" if is_loopback(host) else "the network"
+        raise ValueError(f"Listening on {address} lets {where} connect, a "
+                         "token is required for TCP")
+
+
+def check_token(token: Optional[str], message: Message) -> bool:
+    """Tell whether a message carries the expected token, in constant
+    time. Anything goes without an expected token."""
+
+    if token is None:
+        return True
+    return hmac.compare_digest(str(message.get("token", "")).encode(),
+                               token.encode())
+
+
+async def open_connection(address: str
+                          ) -> Tuple[asyncio.StreamReader,
+                                     asyncio.StreamWriter]:
+    host, port = parse_address(address)
+    if host is None:
+        return await asyncio.open_unix_connection(port, limit=MESSAGE_LIMIT)
+    return await asyncio.open_connection(host, port, limit=MESSAGE_LIMIT)
+
+
+async def start_server(callback: Callable[[asyncio.StreamReader,
+                                           asyncio.StreamWriter],
+                                          Awaitable[None]],
+                       address: str) -> asyncio.AbstractServer:
+    """Listen on an address.
+
+    A Unix socket is only accessible to the user, see `_private_socket()`.
+    """
+
+    host, port = parse_address(address)
+    if host is None:
+        return await asyncio.start_unix_server(
+            callback, sock=_private_socket(port), limit=MESSAGE_LIMIT)
+    return await asyncio.start_server(callback, host, port,
+                                      limit=MESSAGE_LIMIT)
+
+
+def _private_socket(path: str) -> socket.socket:
+    """Bind a Unix socket that only the user can connect to.
+
+    The socket is made private before the server listens on it, so no other
+    user can connect in between: until then connections are refused.
+    """
+
+    # Like asyncio, replace the socket left over by an earlier server
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        os.chmod(path, 0o600)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def send(writer: asyncio.StreamWriter, message: Message):
+    """Queue a message as a single JSON line.
+
+    The line is written in one call, so messages sent by concurrent
+    coroutines never interleave.
+    """
+
+    writer.write(json.dumps(message).encode() + b"\n")
+
+
+async def receive(reader: asyncio.StreamReader) -> Optional[Message]:
+    """Read the next message.
+
+    :return: The message, or None when the connection was closed.
+    """
+
+    try:
+        line = await reader.readline()
+    except ConnectionError:
+        return None
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def encode_result(result: "ExecutionResult") -> Message:
+    """Convert an ExecutionResult to a message.
+
+    Monotonic clocks of different hosts cannot be compared, so the start
+    of the execution is sent as the number of seconds before sending.
+    """
+
+    return {
+        "stdout": result.stdout,
+        "stderr": result.stderr,
+        "return_code": result.return_code,
+        "exception": None if result.exception is None
+        else f"{type(result.exception).__name__}: {result.exception}",
+        "started_ago": None if result.started is None
+        else time.monotonic() - result.started,
+        "timed_out": result.timed_out,
+    }
+
+
+def decode_result(message: Message) -> "ExecutionResult":
+    """Convert a message back to an ExecutionResult."""
+
+    from scheduler.models import ExecutionResult
+
+    exception = message["exception"]
+    started_ago = message["started_ago"]
+    return ExecutionResult(
+        stdout=message["stdout"],
+        stderr=message["stderr"],
+        return_code=message["return_code"],
+        exception=None if exception is None else RemoteError(exception),
+        started=None if started_ago is None
+        else time.monotonic() - started_ago,
+        timed_out=message["timed_out"],
+    )
@@ -0,0 +1,141 @@
+import csv
+import heapq
+import json
+import time
+from collections import Counter
+from scheduler.logger import get_logger
+from scheduler.models import TaskStatus
+from typing import Dict, List, Optional, TextIO, Tuple
+
+logger = get_logger(__name__)
+
+FINAL_STATUSES = (TaskStatus.OK, TaskStatus.FAILED, TaskStatus.TIMEOUT,
+                  TaskStatus.SKIPPED, TaskStatus.CANCELLED)
+
+REPORT_FIELDS = ("task", "status", "duration", "time")
+
+
+class Reporter:
+    """Collect the results of a run as the tasks finish.
+
+    The reporter is a TaskTracker status listener. Every task that reaches
+    a final status is written to the report file straight away, as a JSON
+    line or a CSV row, and folded into an aggregate summary: counts per
+    status, the slowest tasks and the names of the failed, timed out,
+    cancelled and skipped tasks. Nothing is kept per successful task, so
+    producing the summary does not depend on the size of the graph.
+    """
+
+    def __init__(self, total: int, path: Optional[str] = None,
+                 slowest: int = 10, listed: int = 20, restored: int = 0):
+        """Create a reporter.
+
+        :param total: The number of tasks in the graph.
+        :param path: The report file, CSV if it ends in '.csv' and JSON
+                     lines otherwise. No file is written when omitted.
+        :param slowest: The number of slowest tasks to keep.
+        :param listed: The number of skipped tasks to list by name.
+        :param restored: The number of tasks restored as OK from an earlier
+                         run, which are not run again.
+        """
+
+        self.total = total
+        self.restored = restored
+        self.slowest = slowest
+        self.listed = listed
+        self.counts: Counter = Counter()
+        self.started: Dict[str, float] = {}
+        self.durations: List[Tuple[float, str]] = []
+        self.failed: List[str] = []
+        self.timed_out: List[str] = []
+        self.cancelled: List[str] = []
+        self.skipped: List[str] = []
+
+        self.file: Optional[TextIO] = None
+        self.csv_writer = None
+        if path is not None:
+            self.file = open(path, "w", newline="")
+            if path.endswith(".csv"):
+                self.csv_writer = csv.writer(self.file)
+                self.csv_writer.writerow(REPORT_FIELDS)
+
+    def record(self, name: str, status: TaskStatus):
+        """Record a status change of a task.
+
+        This has the signature of a TaskTracker status listener.
+
+        :param name: The name of the task.
+        :param status: The new status of the task.
+        """
+
+        if status == TaskStatus.RUNNING:
+            self.started[name] = time.monotonic()
+            return
+        if status not in FINAL_STATUSES:
+            return
+
+        duration = None
+        started = self.started.pop(name, None)
+        if started is not None:
+            duration = time.monotonic() - started
+            entry = (duration, name)
+            if len(self.durations) < self.slowest:
+                heapq.heappush(self.durations, entry)
+            elif entry > self.durations[0]:
+                heapq.heapreplace(self.durations, entry)
+
+        self.counts[status] += 1
+        if status == TaskStatus.FAILED:
+            self.failed.append(name)
+        elif status == TaskStatus.TIMEOUT:
+            self.timed_out.append(name)
+        elif status == TaskStatus.CANCELLED:
+            self.cancelled.append(name)
+        elif status == TaskStatus.SKIPPED and len(self.skipped) < self.listed:
+            self.skipped.append(name)
+
+        if self.file is not None:
+            row = (name, status.name, duration, time.time())
+            if self.csv_writer is not None:
+                self.csv_writer.writerow(row)
+            else:
+                self.file.write(json.dumps(dict(zip(REPORT_FIELDS, row))))
+                self.file.write("\n")
+
+    def summary(self) -> str:
+        """Build the aggregate summary of the run."""
+
+        finished = sum(self.counts.values()) + self.restored
+        counts = [f"{status.name} {self.counts[status]}"
+                  for status in FINAL_STATUSES if self.counts[status]]
+        if self.restored:
+            counts.append(f"RESTORED {self.restored}")
+        if finished < self.total:
+            counts.append(f"NOT RUN {self.total - finished}")
+        lines = [f"{self.total} tasks: {', '.join(counts) or 'none run'}"]
+
+        if self.durations:
+            lines.append("Slowest tasks:")
+            for duration, name in sorted(self.durations, reverse=True):
+                lines.append(f"  {duration:10.3f}s  {name}")
+        if self.failed:
+            lines.append(f"Failed: {', '.join(self.failed)}")
+        if self.timed_out:
+            lines.append(f"Timed out: {', '.join(self.timed_out)}")
+        if self.cancelled:
+            lines.append(f"Cancelled: {', '.join(self.cancelled)}")
+        if self.skipped:
+            skipped = ", ".join(self.skipped)
+            more = self.counts[TaskStatus.SKIPPED] - len(self.skipped)
+            if more:
+                skipped += f" and {more} more"
+            lines.append(f"Skipped: {skipped}")
+        return "\n".join(lines)
+
+    def log_summary(self):
+        logger.info("Summary of the run\n" + self.summary())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,160 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+
+# cgroup v1 reports "no limit" as a huge page aligned number
+_UNLIMITED = 2 ** 60
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_dirs(proc: str, cgroup_root: str, controller: str
+                 ) -> Tuple[str, ...]:
+    """Return the directories to look for the files of a cgroup controller
+    in: the cgroup of the process first, then the root of the mount, which
+    is where containers usually see their own cgroup."""
+
+    paths: Dict[str, str] = {}
+    cgroups = _read(os.path.join(proc, "self", "cgroup")) or ""
+    for line in cgroups.splitlines():
+        _, _, rest = line.partition(":")
+        controllers, _, path = rest.partition(":")
+        if controllers:
+            for name in controllers.split(","):
+                paths[name] = path
+        else:
+            paths[""] = path
+
+    directories = []
+    if controller in paths:
+        mount = os.path.join(cgroup_root, controller)
+        directories += [mount + paths[controller], mount]
+    if "" in paths:
+        directories += [cgroup_root + paths[""], cgroup_root]
+    return tuple(directories)
+
+
+def _cgroup_cpus(proc: str, cgroup_root: str) -> Optional[float]:
+    for directory in _cgroup_dirs(proc, cgroup_root, "cpu"):
+        # cgroup v2
+        cpu_max = _read(os.path.join(directory, "cpu.max"))
+        if cpu_max is not None:
+            quota, _, period = cpu_max.partition(" ")
+            if quota == "max":
+                return None
+            return int(quota) / int(period or 100000)
+        # cgroup v1
+        quota = _read(os.path.join(directory, "cpu.cfs_quota_us"))
+        period = _read(os.path.join(directory, "cpu.cfs_period_us"))
+        if quota is not None and period is not None:
+            if int(quota) <= 0:
+                return None
+            return int(quota) / int(period)
+    return None
+
+
+def _cgroup_memory(proc: str, cgroup_root: str) -> Optional[int]:
+    """Return the memory left in the cgroup of the process in bytes."""
+
+    for directory in _cgroup_dirs(proc, cgroup_root, "memory"):
+        for limit_file, usage_file in (
+                ("memory.max", "memory.current"),
+                ("memory.limit_in_bytes", "memory.usage_in_bytes")):
+            limit = _read(os.path.join(directory, limit_file))
+            if limit is None:
+                continue
+            if limit == "max" or int(limit) >= _UNLIMITED:
+                return None
+            usage = int(_read(os.path.join(directory, usage_file)) or 0)
+            return max(int(limit) - usage, 0)
+    return None
+
+
+def detect_capacity(proc: str = "/proc",
+                    cgroup_root: str = "/sys/fs/cgroup"
+                    ) -> Tuple[float, float]:
+    """Detect the CPUs and the memory the tasks of a run can use.
+
+    The CPUs are those the process may run on, capped by the CPU quota of
+    its cgroup. The memory is what the kernel reports as available, capped
+    by what is left below the memory limit of the cgroup, so memory that is
+    already in use when the run starts is not handed out to tasks.
+
+    :param proc: The mount point of procfs.
+    :param cgroup_root: The mount point of the cgroup file systems.
+    :return: The number of CPUs and the memory in MiB.
+    """
+
+    try:
+        cpus: float = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpus(proc, cgroup_root)
+    if quota is not None:
+        cpus = min(cpus, quota)
+
+    memory = None
+    for line in (_read(os.path.join(proc, "meminfo")) or "").splitlines():
+        if line.startswith("MemAvailable:"):
+            memory = int(line.split()[1]) * 1024
+    left = _cgroup_memory(proc, cgroup_root)
+    if left is not None:
+        memory = left if memory is None else min(memory, left)
+    if memory is None:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    return cpus, memory / 2 ** 20
+
+
+class ResourcePool:
+    """The CPUs and the memory shared by the tasks of one or more runs.
+
+    Tasks acquire their declared requirements before they start and
+    release them when they finish. The dispatchers that use the pool are
+    woken up whenever resources are released, so a pool can be shared by
+    the graphs of a daemon.
+    """
+
+    def __init__(self, cpus: Optional[float] = None,
+                 memory_mb: Optional[float] = None):
+        """Create a pool.
+
+        :param cpus: The number of CPUs, detected when omitted.
+        :param memory_mb: The memory in MiB, detected when omitted.
+        """
+
+        if cpus is None or memory_mb is None:
+            detected_cpus, detected_memory = detect_capacity()
+            cpus = detected_cpus if cpus is None else cpus
+            memory_mb = detected_memory if memory_mb is None else memory_mb
+        self.cpus = cpus
+        self.memory_mb = memory_mb
+        self.used_cpus = 0.0
+        self.used_memory_mb = 0.0
+        self.listeners: List[asyncio.Event] = []
+
+    def clamp(self, cpus: float, memory_mb: float) -> Tuple[float, float]:
+        """Cap requirements at the capacity, so a task that needs more than
+        the whole machine still runs, alone."""
+
+        return min(cpus, self.cpus), min(memory_mb, self.memory_mb)
+
+    def fits(self, cpus: float, memory_mb: float) -> bool:
+        # The tolerance absorbs the rounding of repeated float additions
+        return (self.used_cpus + cpus <= self.cpus + 1e-9
+                and self.used_memory_mb + memory_mb <= self.memory_mb + 1e-9)
+
+    def acquire(self, cpus: float, memory_mb: float):
+        self.used_cpus += cpus
+        self.used_memory_mb += memory_mb
+
+    def release(self, cpus: float, memory_mb: float):
+        self.used_cpus -= cpus
+        self.used_memory_mb -= memory_mb
+        for listener in self.listeners:
+            listener.set()
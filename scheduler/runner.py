@@ -1,11 +1,24 @@
 import asyncio
 import argparse
-from scheduler.executor import execute_task
+import heapq
+import itertools
+import logging
+import time
+from scheduler.compact_tracker import CompactTaskTracker
+from scheduler.executor import (EVAL_BATCH_SIZE, TaskExecutor,
+                                compile_cache_info)
+from scheduler.graph_cache import MAX_CACHE_BYTES
+from scheduler.history import load_history, update_history
+from scheduler.journal import Journal, read_journal
 from scheduler.loader import load_tasks
-from scheduler.logger import get_logger
-from scheduler.models import TaskStatus
+from scheduler.logger import configure_logging, get_logger
+from scheduler.models import ExecutionResult, RunnerConfig, TaskStatus
+from scheduler.pipes import pipeline
+from scheduler.report import Reporter
+from scheduler.resources import ResourcePool
 from scheduler.task_tracker import TaskTracker
-from tabulate import tabulate
+from scheduler.tracing import Tracer
+from typing import Dict, List, Optional, Set, Tuple
 
 logger = get_logger(__name__)
 
@@ -16,6 +29,8 @@ def print_summary(task_tracker: TaskTracker):
     :param task_tracker: The TaskTracker instance containing the tasks.
     """
 
+    from tabulate import tabulate
+
     headers = ["Name", "Status", "Type", "Arguments", "Dependencies"]
     rows = []
     for name, task in task_tracker.tasks.items():
@@ -28,44 +43,653 @@ def print_summary(task_tracker: TaskTracker):
     )
 
 
-async def runner(task_name: str, task_tracker: TaskTracker):
+def _record_result(task_name: str, task_tracker: TaskTracker,
+                   result: ExecutionResult, duration: float,
+                   tracer: Optional[Tracer] = None,
+                   level: int = logging.INFO, mark_done: bool = True):
+    """Update the status of an executed task and log its output.
+
+    :param task_name: The name of the executed task.
+    :param task_tracker: The TaskTracker instance managing the tasks.
+    :param result: The result of the execution.
+    :param duration: How long the task took, in seconds.
+    :param tracer: The Tracer recording the timeline of the run, if any.
+    :param level: The log level of the line announcing the end of the task.
+    :param mark_done: Mark the task done in the tracker, which is only
+                      allowed once the tracker returned it as ready.
+    """
+
+    if tracer is not None:
+        tracer.started(task_name, result.started)
+
+    # If execution was successful, mark the task as completed and print
+    # output if available
+    if result.timed_out:
+        task_tracker.set_status(task_name, TaskStatus.TIMEOUT)
+        logger.error(f"Timeout {task_name}: stopped after {duration:.3f}s",
+                     extra={"task": task_name})
+    elif result.return_code == 0 and result.exception is None:
+        task_tracker.set_status(task_name, TaskStatus.OK)
+        task_tracker.durations[task_name] = duration
+        if result.stdout and not result.streamed:
+            logger.info(f"Output {task_name}: {result.stdout}",
+                        extra={"task": task_name})
+
+    # else mark as failed and inform the user
+    else:
+        task_tracker.set_status(task_name, TaskStatus.FAILED)
+        if result.streamed:
+            logger.error(
+                f"Error {task_name}: exited with code {result.return_code}",
+                extra={"task": task_name})
+        elif result.stderr:
+            logger.error(f"Error {task_name}: {result.stderr}",
+                         extra={"task": task_name})
+        if result.exception:
+            logger.error(f"Exception {task_name}: {result.exception}",
+                         extra={"task": task_name})
+
+    if tracer is not None:
+        tracer.finished(task_name, task_tracker.status(task_name))
+    logger.log(level, f"Ended:   {task_name}",
+               extra={"task": task_name,
+                      "status": task_tracker.status(task_name).name,
+                      "duration": duration})
+    if mark_done:
+        task_tracker.done(task_name)
+
+
+def _record_cancelled(task_name: str, task_tracker: TaskTracker,
+                      tracer: Optional[Tracer] = None):
+    task_tracker.set_status(task_name, TaskStatus.CANCELLED)
+    if tracer is not None:
+        tracer.finished(task_name, TaskStatus.CANCELLED)
+    logger.info(f"Cancelled: {task_name}",
+                extra={"task": task_name,
+                       "status": TaskStatus.CANCELLED.name})
+
+
+async def runner(task_name: str, task_tracker: TaskTracker,
+                 executor: TaskExecutor, tracer: Optional[Tracer] = None
+                 ) -> ExecutionResult:
     """Runs a single task and update its status in the task tracker.
 
     This coroutine is responsible for executing a single task. It first marks
     the task as RUNNING. It then calls the executor to run the task and waits
     for the result.
 
-    Based on the execution result, it updates the task's status to OK
-    or FAILED. It also logs any stdout, stderr, or exceptions that occur.
-    Finally, it marks the task as done in the topological sorter to allow
-    dependent tasks to run.
+    Based on the execution result, it updates the task's status to OK,
+    FAILED or TIMEOUT and records the duration of successful tasks. It also
+    logs any stdout, stderr, or exceptions that occur, unless the output was
+    already forwarded while the task was running.
+    Finally, it marks the task as done in the task tracker to allow
+    dependent tasks to run. If the run is cancelled, the task is marked
+    CANCELLED and the cancellation is propagated.
 
     :param task_name: The name of the task to run.
     :param task_tracker: The TaskTracker instance managing the tasks.
+    :param executor: The TaskExecutor to run the task with.
+    :param tracer: The Tracer recording the timeline of the run, if any.
+    :return: The result of the execution.
     """
 
     # Mark the task as running and run it
-    logger.info(f"Started: {task_name}")
-    task_tracker.tasks[task_name].status = TaskStatus.RUNNING
-    result = await execute_task(task_tracker.tasks[task_name])
+    logger.info(f"Started: {task_name}",
+                extra={"task": task_name, "status": TaskStatus.RUNNING.name})
+    task_tracker.set_status(task_name, TaskStatus.RUNNING)
+    start = time.monotonic()
+    try:
+        result = await executor.execute(task_tracker.tasks[task_name],
+                                        task_name)
+    except asyncio.CancelledError:
+        _record_cancelled(task_name, task_tracker, tracer)
+        raise
+    duration = time.monotonic() - start
+    _record_result(task_name, task_tracker, result, duration, tracer)
+    return result
 
-    # If execution was successful, mark the task as completed and print
-    # output if available
-    if result.return_code == 0 and result.exception is None:
-        task_tracker.tasks[task_name].status = TaskStatus.OK
-        if result.stdout:
-            logger.info(f"Output {task_name}: {result.stdout}")
 
-    # else mark as failed and inform the user
-    else:
-        task_tracker.tasks[task_name].status = TaskStatus.FAILED
-        if result.stderr:
-            logger.error(f"Error {task_name}: {result.stderr}")
-        if result.exception:
-            logger.error(f"Exception {task_name}: {result.exception}")
+async def batch_runner(task_names: List[str], task_tracker: TaskTracker,
+                       executor: TaskExecutor,
+                       tracer: Optional[Tracer] = None
+                       ) -> List[ExecutionResult]:
+    """Run a batch of short 'eval' tasks in a single call to the eval pool.
+
+    All tasks of the batch are marked RUNNING. When the batch returns, the
+    status, duration and output of every executed task are recorded one by
+    one, like `runner` does, but the start and end of the batch are logged
+    instead of those of every task. Tasks the executor did not get to within
+    the time budget of the batch are set back to PENDING.
+
+    :param task_names: The names of the 'eval' tasks to run.
+    :param task_tracker: The TaskTracker instance managing the tasks.
+    :param executor: The TaskExecutor to run the tasks with.
+    :param tracer: The Tracer recording the timeline of the run, if any.
+    :return: The results of the executed tasks, in the order of
+             `task_names`. The remaining tasks were not executed.
+    """
+
+    logger.info(f"Started batch of {len(task_names)} eval tasks: "
+                f"{task_names[0]} .. {task_names[-1]}")
+    for task_name in task_names:
+        task_tracker.set_status(task_name, TaskStatus.RUNNING)
+    try:
+        results = await executor.execute_batch(
+            [task_tracker.tasks[task_name] for task_name in task_names])
+    except asyncio.CancelledError:
+        for task_name in task_names:
+            _record_cancelled(task_name, task_tracker, tracer)
+        raise
+
+    failed = 0
+    for task_name, result in zip(task_names, results):
+        _record_result(task_name, task_tracker, result, result.duration,
+                       tracer, logging.DEBUG)
+        if task_tracker.status(task_name) == TaskStatus.FAILED:
+            failed += 1
+    for task_name in task_names[len(results):]:
+        task_tracker.set_status(task_name, TaskStatus.PENDING)
+    logger.info(f"Ended batch of {len(results)} eval tasks, {failed} failed"
+                + (f", {len(task_names) - len(results)} postponed"
+                   if len(results) < len(task_names) else ""))
+    return results
+
+
+def _succeeded(result: ExecutionResult) -> bool:
+    return (not result.timed_out and result.return_code == 0
+            and result.exception is None)
+
+
+async def pipeline_runner(task_names: List[str], task_tracker: TaskTracker,
+                          executor: TaskExecutor,
+                          piped: Dict[str, ExecutionResult],
+                          tracer: Optional[Tracer] = None
+                          ) -> List[ExecutionResult]:
+    """Run 'exec' tasks that read the output of each other together.
+
+    All tasks of the pipeline are marked RUNNING and started at once. When
+    they all exited, the first task is recorded like `runner` does. The
+    others cannot be marked done before the tracker returns them as ready,
+    so their results are put in `piped` for the dispatcher to record then.
+    A task whose input comes from a task that did not succeed fails, like
+    a shell pipeline with the pipefail option.
+
+    :param task_names: The names of the tasks, every task after the task it
+                       reads from.
+    :param task_tracker: The TaskTracker instance managing the tasks.
+    :param executor: The TaskExecutor to run the tasks with.
+    :param piped: The results of the tasks still to be recorded, by name.
+    :param tracer: The Tracer recording the timeline of the run, if any.
+    :return: The results of the tasks, in the order of `task_names`.
+    """
+
+    for task_name in task_names:
+        logger.info(f"Started: {task_name}",
+                    extra={"task": task_name,
+                           "status": TaskStatus.RUNNING.name})
+        task_tracker.set_status(task_name, TaskStatus.RUNNING)
+    try:
+        results = await executor.execute_pipeline(
+            [(task_name, task_tracker.tasks[task_name])
+             for task_name in task_names])
+    except asyncio.CancelledError:
+        for task_name in task_names:
+            _record_cancelled(task_name, task_tracker, tracer)
+        raise
+
+    outcomes = dict(zip(task_names, results))
+    for task_name in task_names[1:]:
+        source = task_tracker.tasks[task_name].stdin_from
+        result = outcomes[task_name]
+        if not _succeeded(outcomes[source]) and _succeeded(result):
+            result.exception = RuntimeError(
+                f"its input from {source} is incomplete")
+    piped.update(zip(task_names[1:], results[1:]))
+    _record_result(task_names[0], task_tracker, results[0],
+                   results[0].duration, tracer)
+    return results
+
+
+class Dispatcher:
+    """Start ready tasks while respecting the configured concurrency limits.
+
+    Ready tasks that cannot start yet wait in per-type ready queues owned by
+    the dispatcher, so a wide layer of the graph does not turn into
+    thousands of coroutines, subprocesses or threads at once. The queues are
+    priority queues ordered by the critical path priority of the tasks, so
+    long chains are not starved by wide layers of short tasks. Dispatching is
+    completion driven: every finished task wakes the dispatcher through an
+    event, so newly unblocked tasks are started right away.
+
+    In fail-fast mode, the first failure or timeout stops the dispatching
+    and cancels the tasks in flight. Tasks that were never started stay
+    PENDING.
+
+    Ready 'eval' tasks that are expected to take less than the
+    `eval_batch_threshold` of the configuration are coalesced into batches,
+    which run in a single call to the eval pool and take a single slot of
+    the concurrency limits. A task is expected to take its declared or
+    historic duration, or else the moving average of the 'eval' tasks
+    executed so far, and is not batched before one of them finished. Tasks
+    with a timeout and snippets that were observed to be slow are never
+    batched, and a batch stops starting tasks once it has run for
+    `eval_batch_time`, so long tasks do not hold back the rest of a batch.
+
+    Tasks that declare CPU or memory requirements are packed against the
+    capacity of a ResourcePool, detected from /proc and the cgroup limits
+    unless the configuration sets it. When the next task does not fit,
+    lower priority tasks that fit are started around it. Once it has been
+    waiting for `backfill_window` seconds, it reserves the capacity: no
+    other task starts until it could.
+
+    An 'exec' task whose output is read by other tasks starts together with
+    them as a pipeline, which takes a single 'exec' slot and the sum of the
+    requirements of its tasks. The executor must support pipelines.
+    """
+
+    def __init__(self, task_tracker: TaskTracker,
+                 config: Optional[RunnerConfig] = None,
+                 executor: Optional[TaskExecutor] = None,
+                 tracer: Optional[Tracer] = None,
+                 resources: Optional[ResourcePool] = None):
+        """Create a dispatcher for a prepared TaskTracker.
+
+        :param task_tracker: The TaskTracker with a prepared topological
+                             sorter.
+        :param config: The limits and options of the run.
+        :param executor: A started TaskExecutor to share with other runs.
+                         A private one is created for the run when omitted.
+        :param tracer: A Tracer to record the timeline of the run in.
+        :param resources: A ResourcePool to share with other runs. A private
+                          one is created when a task declares requirements.
+        """
+
+        self.task_tracker = task_tracker
+        self.config = config or RunnerConfig()
+        self.executor = executor
+        self.tracer = tracer
+        self.ready = {"exec": [], "eval": []}
+        self.sequence = itertools.count()
+        self.running = {"exec": 0, "eval": 0}
+        self.in_flight = set()
+        self.wakeup = asyncio.Event()
+        self.stopped = False
+        self.batching = False
+        self.eval_estimate: Optional[float] = None
+        self.slow_snippets: Set[str] = set()
+        self.resources = resources
+        self.blocked_since: Dict[str, float] = {}
+        self.oversized: Set[str] = set()
+        self.pipes: Dict[str, List[str]] = {}
+        self.piped: Dict[str, ExecutionResult] = {}
+
+    def _type_limit(self, task_type: str) -> Optional[int]:
+        if task_type == "exec":
+            return self.config.max_exec
+        return self.config.max_eval
+
+    def _can_start(self, task_type: str) -> bool:
+        """Check whether one more task of the given type fits the limits."""
+
+        max_concurrency = self.config.max_concurrency
+        if (max_concurrency is not None
+                and sum(self.running.values()) >= max_concurrency):
+            return False
+        limit = self._type_limit(task_type)
+        return limit is None or self.running[task_type] < limit
 
-    logger.info(f"Ended:   {task_name}")
-    task_tracker.topo_sorter.done(task_name)
+    def _requirements(self, task_name: str) -> Tuple[float, float]:
+        """Get the CPUs and memory a task needs, capped at the capacity."""
+
+        cpus, memory_mb = self.task_tracker.requirements(task_name)
+        if not cpus and not memory_mb:
+            return cpus, memory_mb
+        if self.resources is None:
+            self.resources = ResourcePool(self.config.cpu_capacity,
+                                          self.config.memory_capacity_mb)
+            self.resources.listeners.append(self.wakeup)
+        clamped = self.resources.clamp(cpus, memory_mb)
+        if clamped != (cpus, memory_mb) and task_name not in self.oversized:
+            self.oversized.add(task_name)
+            logger.warning(
+                f"{task_name} needs more than the capacity of "
+                f"{self.resources.cpus:g} CPUs and "
+                f"{self.resources.memory_mb:.0f} MiB, it will run alone")
+        return clamped
+
+    def _start(self, task_name: str, task_type: str,
+               requirements: Tuple[float, float] = (0.0, 0.0)):
+        if self.tracer is not None:
+            self.tracer.dispatched(task_name)
+        self._track(runner(task_name, self.task_tracker, self.executor,
+                           self.tracer), [task_name], task_type,
+                    requirements)
+
+    def _pipeline(self, task_name: str) -> List[str]:
+        """Get the tasks that start together with an 'exec' task."""
+
+        if task_name not in self.pipes:
+            return [task_name]
+        return pipeline(task_name, self.pipes,
+                        lambda consumer: self.task_tracker.status(consumer)
+                        == TaskStatus.PENDING)
+
+    def _pipeline_requirements(self, task_names: List[str]
+                               ) -> Tuple[float, float]:
+        cpus = memory_mb = 0.0
+        for task_name in task_names:
+            task_cpus, task_memory_mb = self._requirements(task_name)
+            cpus += task_cpus
+            memory_mb += task_memory_mb
+        if not cpus and not memory_mb:
+            return cpus, memory_mb
+        return self.resources.clamp(cpus, memory_mb)
+
+    def _start_pipeline(self, task_names: List[str],
+                        requirements: Tuple[float, float]):
+        if self.tracer is not None:
+            self.tracer.dispatched(task_names[0])
+            for task_name in task_names[1:]:
+                self.tracer.ready(task_name, "exec")
+                self.tracer.dispatched(task_name)
+        self._track(pipeline_runner(task_names, self.task_tracker,
+                                    self.executor, self.piped, self.tracer),
+                    task_names, "exec", requirements, pipelined=True)
+
+    def _record_piped(self, task_name: str):
+        """Record the result of a task that ran in a pipeline, once the
+        tracker returned it as ready."""
+
+        result = self.piped.pop(task_name)
+        _record_result(task_name, self.task_tracker, result, result.duration,
+                       self.tracer)
+        if (self.config.fail_fast and not self.stopped
+                and self.task_tracker.status(task_name)
+                in (TaskStatus.FAILED, TaskStatus.TIMEOUT)):
+            self.stop(f"{task_name} failed")
+        # Look for the tasks it unblocked without waiting for another one
+        self.wakeup.set()
+
+    def _start_batch(self, task_names: List[str]):
+        if self.tracer is not None:
+            for task_name in task_names:
+                self.tracer.dispatched(task_name)
+        self._track(batch_runner(task_names, self.task_tracker,
+                                 self.executor, self.tracer),
+                    task_names, "eval")
+
+    def _track(self, coroutine, task_names: List[str], task_type: str,
+               requirements: Tuple[float, float] = (0.0, 0.0),
+               pipelined: bool = False):
+        """Run a runner coroutine in a slot of the given task type, holding
+        the given CPUs and memory.
+
+        If the coroutine raises, its tasks that did not get a result are
+        recorded as FAILED, and the dispatcher is woken up either way.
+        """
+
+        self.running[task_type] += 1
+        if any(requirements):
+            self.resources.acquire(*requirements)
+        task = asyncio.create_task(coroutine)
+
+        def on_done(task: asyncio.Task):
+            try:
+                self.running[task_type] -= 1
+                if any(requirements):
+                    self.resources.release(*requirements)
+                self.in_flight.discard(task)
+                if task.cancelled():
+                    pass
+                elif task.exception() is not None:
+                    self._record_crash(task_names, task.exception(),
+                                       pipelined)
+                elif task_type == "eval":
+                    self._observe(task_names, task.result())
+                if (self.config.fail_fast and not self.stopped
+                        and any(self.task_tracker.status(task_name)
+                                in (TaskStatus.FAILED, TaskStatus.TIMEOUT)
+                                for task_name in task_names)):
+                    self.stop(f"{task_names[0]} failed")
+            finally:
+                self.wakeup.set()
+
+        self.in_flight.add(task)
+        task.add_done_callback(on_done)
+
+    def _record_crash(self, task_names: List[str], exception: BaseException,
+                      pipelined: bool):
+        """Fail the tasks left RUNNING by a runner coroutine that raised.
+
+        The readers of a pipeline are not ready in the tracker yet, so they
+        are recorded once they are, like their results.
+        """
+
+        logger.error(f"The runner of {task_names[0]} raised an exception",
+                     exc_info=exception)
+        result = ExecutionResult(exception=exception)
+        for index, task_name in enumerate(task_names):
+            if self.task_tracker.status(task_name) != TaskStatus.RUNNING:
+                continue
+            if pipelined and index:
+                self.piped[task_name] = result
+            else:
+                _record_result(task_name, self.task_tracker, result, 0.0,
+                               self.tracer)
+
+    def _observe(self, task_names: List[str], results):
+        """Learn how long 'eval' tasks take from their results, and put the
+        tasks a batch did not get to back into the ready queue."""
+
+        if isinstance(results, ExecutionResult):
+            results = [results]
+        threshold = self.config.eval_batch_threshold
+        for task_name, result in zip(task_names, results):
+            if result.duration is None:
+                continue
+            if self.eval_estimate is None:
+                self.eval_estimate = result.duration
+            else:
+                self.eval_estimate += 0.2 * (result.duration
+                                             - self.eval_estimate)
+            if result.duration >= threshold:
+                self.slow_snippets.add(
+                    self.task_tracker.tasks[task_name].arguments)
+        for task_name in task_names[len(results):]:
+            heapq.heappush(self.ready["eval"], (
+                -self.task_tracker.priority(task_name),
+                next(self.sequence), task_name))
+
+    def _expected_eval_duration(self, task_name: str) -> float:
+        # A timeout is enforced per worker and requirements are held per
+        # task, so such tasks run on their own
+        if (self.task_tracker.timeout(task_name) is not None
+                or any(self.task_tracker.requirements(task_name))):
+            return float("inf")
+        expected = self.task_tracker.expected_duration(task_name)
+        if expected is not None:
+            return expected
+        if (self.slow_snippets and self.task_tracker.tasks[task_name]
+                .arguments in self.slow_snippets):
+            return float("inf")
+        # Nothing is batched on a guess, only once tasks were measured
+        if self.eval_estimate is None:
+            return float("inf")
+        return self.eval_estimate
+
+    def _take_batch(self) -> List[str]:
+        """Pop the short 'eval' tasks at the head of the ready queue.
+
+        :return: The names of the tasks, which may be empty if the head of
+                 the queue is not expected to be short.
+        """
+
+        queue = self.ready["eval"]
+        threshold = self.config.eval_batch_threshold
+        batch = []
+        total = 0.0
+        while (queue and len(batch) < EVAL_BATCH_SIZE
+               and total < self.config.eval_batch_time):
+            expected = self._expected_eval_duration(queue[0][2])
+            if expected >= threshold:
+                break
+            batch.append(heapq.heappop(queue)[2])
+            total += expected
+        return batch
+
+    def _enqueue(self, task_name: str):
+        task_type = self.task_tracker.task_type(task_name)
+        priority = self.task_tracker.priority(task_name)
+        if self.tracer is not None:
+            self.tracer.ready(task_name, task_type)
+        heapq.heappush(self.ready[task_type],
+                       (-priority, next(self.sequence), task_name))
+
+    def _start_ready(self):
+        """Start queued tasks until the limits are reached.
+
+        The task with the highest priority among the task types that still
+        have room is started first, so a saturated task type does not hold
+        back tasks of the other type. Tasks whose requirements do not fit
+        the free resources are set aside while the rest of the queues is
+        backfilled, unless they have been waiting for the backfill window.
+        """
+
+        blocked = []
+        try:
+            while True:
+                heads = [(queue[0], task_type)
+                         for task_type, queue in self.ready.items()
+                         if queue and self._can_start(task_type)]
+                if not heads:
+                    return
+                entry, task_type = min(heads)
+                task_name = entry[2]
+                members = (self._pipeline(task_name) if task_type == "exec"
+                           else [task_name])
+                if len(members) > 1:
+                    requirements = self._pipeline_requirements(members)
+                else:
+                    requirements = self._requirements(task_name)
+                if (any(requirements)
+                        and not self.resources.fits(*requirements)):
+                    blocked.append((task_type,
+                                    heapq.heappop(self.ready[task_type])))
+                    now = time.monotonic()
+                    since = self.blocked_since.setdefault(task_name, now)
+                    if now - since >= self.config.backfill_window:
+                        return
+                    continue
+                if task_type == "eval" and self.batching:
+                    batch = self._take_batch()
+                    if len(batch) > 1:
+                        self._start_batch(batch)
+                        continue
+                    if batch:
+                        self._start(batch[0], task_type)
+                        continue
+                heapq.heappop(self.ready[task_type])
+                if any(requirements):
+                    self.blocked_since.pop(task_name, None)
+                if len(members) > 1:
+                    self._start_pipeline(members, requirements)
+                else:
+                    self._start(task_name, task_type, requirements)
+        finally:
+            for task_type, entry in blocked:
+                heapq.heappush(self.ready[task_type], entry)
+
+    def stop(self, reason: str):
+        """Stop dispatching and cancel the tasks in flight.
+
+        :param reason: Why the run is stopped, for the log.
+        """
+
+        logger.error(f"Stopping the run: {reason}")
+        self.stopped = True
+        for task in self.in_flight:
+            task.cancel()
+        self.wakeup.set()
+
+    async def run(self):
+        """Run all tasks of the prepared TaskTracker until it is drained."""
+
+        if self.tracer is not None:
+            self.task_tracker.status_listeners.append(
+                self.tracer.status_changed)
+        if self.resources is not None:
+            self.resources.listeners.append(self.wakeup)
+        try:
+            await self._run()
+        finally:
+            if self.resources is not None:
+                self.resources.listeners.remove(self.wakeup)
+            if self.tracer is not None:
+                self.task_tracker.status_listeners.remove(
+                    self.tracer.status_changed)
+                self.tracer.close()
+
+    async def _run(self):
+        if self.executor is None:
+            async with TaskExecutor(self.config) as executor:
+                self.executor = executor
+                try:
+                    await self._dispatch()
+                finally:
+                    self.executor = None
+        else:
+            await self._dispatch()
+
+    async def _dispatch(self):
+        self.batching = (self.config.eval_batch_threshold > 0
+                         and self.config.default_timeout is None
+                         and hasattr(self.executor, "execute_batch"))
+        self.pipes = self.task_tracker.pipes()
+        if self.pipes and not hasattr(self.executor, "execute_pipeline"):
+            logger.warning("The executor cannot pipe the output of tasks, "
+                           "the tasks reading it read nothing")
+            self.pipes = {}
+        while self.task_tracker.is_active() and not self.stopped:
+            self.wakeup.clear()
+            start = time.monotonic()
+            for node in self.task_tracker.get_ready():
+                if node in self.piped:
+                    self._record_piped(node)
+                else:
+                    self._enqueue(node)
+            self._start_ready()
+            if self.tracer is not None:
+                self.tracer.loop(start, time.monotonic())
+
+            # Queued tasks may be waiting for resources held by another
+            # dispatcher sharing the pool, which wakes this one on release
+            if self.in_flight or any(self.ready.values()):
+                await self.wakeup.wait()
+
+        # Let the cancelled tasks record their status before returning
+        if self.in_flight:
+            await asyncio.gather(*self.in_flight, return_exceptions=True)
+        for task_name, result in self.piped.items():
+            _record_result(task_name, self.task_tracker, result,
+                           result.duration, self.tracer, mark_done=False)
+        self.piped.clear()
+
+
+async def run_tasks(task_tracker: TaskTracker,
+                    config: Optional[RunnerConfig] = None,
+                    tracer: Optional[Tracer] = None,
+                    executor: Optional[TaskExecutor] = None):
+    """Run all tasks of a prepared TaskTracker until the graph is drained.
+
+    :param task_tracker: The TaskTracker instance with a prepared
+                         topological sorter.
+    :param config: The limits to apply, unlimited when omitted.
+    :param tracer: A Tracer to record the timeline of the run in.
+    :param executor: A started executor to run the tasks with, such as a
+                     RemoteExecutor. A local one is created when omitted.
+    """
+
+    await Dispatcher(task_tracker, config, executor, tracer).run()
 
 
 async def main():
@@ -74,32 +698,240 @@ async def main():
                         help="Path to the input JSON file")
     parser.add_argument("--schema",
                         help="Path to the JSON schema file for validation")
+    parser.add_argument("--trusted", action="store_true",
+                        help="Skip the input model for inputs written by a "
+                             "trusted generator, names, snippets and the "
+                             "schema are still checked")
+    parser.add_argument("--graph-cache", metavar="DIR",
+                        help="Cache the validated graph in this directory, "
+                             "keyed by the contents of the input and schema "
+                             "files, and load it from there when they did "
+                             "not change")
+    parser.add_argument("--graph-cache-mb", type=float,
+                        default=MAX_CACHE_BYTES / (1024 * 1024),
+                        help="Remove the least recently used graphs once "
+                             "the graph cache is larger than this")
+    parser.add_argument("--max-concurrency", type=int,
+                        help="Maximum number of tasks running at once")
+    parser.add_argument("--max-exec", type=int,
+                        help="Maximum number of 'exec' tasks running at once")
+    parser.add_argument("--max-eval", type=int,
+                        help="Maximum number of 'eval' tasks running at once "
+                             "and size of the eval worker pool")
+    parser.add_argument("--cpus", type=float,
+                        help="CPUs to pack the tasks that declare "
+                             "requirements into, detected from /proc and "
+                             "cgroups by default")
+    parser.add_argument("--memory-mb", type=float,
+                        help="Memory in MiB to pack the tasks that declare "
+                             "requirements into, detected by default")
+    parser.add_argument("--backfill-window", type=float, default=10.0,
+                        metavar="SECONDS",
+                        help="Time a task that does not fit may be overtaken "
+                             "by smaller tasks before it reserves the "
+                             "resources it needs, 0 to never overtake")
+    parser.add_argument("--eval-mode", choices=["thread", "process"],
+                        default="thread",
+                        help="Run 'eval' tasks in a thread pool or in a pool "
+                             "of worker processes")
+    parser.add_argument("--eval-preload", action="append", default=[],
+                        metavar="MODULE",
+                        help="Module to import in the eval workers before "
+                             "any task runs, may be repeated")
+    parser.add_argument("--eval-batch-threshold", type=float, default=0.001,
+                        metavar="SECONDS",
+                        help="Run 'eval' tasks expected to take less than "
+                             "this in batches, 0 to disable batching")
+    parser.add_argument("--eval-batch-time", type=float, default=0.01,
+                        metavar="SECONDS",
+                        help="Time after which a batch of 'eval' tasks "
+                             "stops starting tasks")
+    parser.add_argument("--output-limit", type=int, default=64 * 1024,
+                        help="Bytes of stdout and stderr kept in memory per "
+                             "'exec' task, split between head and tail")
+    parser.add_argument("--output-dir",
+                        help="Directory to write the full stdout and stderr "
+                             "of every 'exec' task to")
+    parser.add_argument("--exec-mode", choices=["shell", "direct"],
+                        default="shell",
+                        help="Run every 'exec' task through /bin/sh, or start "
+                             "simple commands directly without a shell")
+    parser.add_argument("--exec-spawner", action="store_true",
+                        help="In direct mode, start commands that need a "
+                             "shell from a small pre-forked helper process")
+    parser.add_argument("--history",
+                        help="Path to a file with the task durations of "
+                             "earlier runs, used to prioritize the critical "
+                             "path and updated after the run")
+    parser.add_argument("--journal",
+                        help="Path to a journal file recording every task "
+                             "status change of the run")
+    parser.add_argument("--resume", metavar="JOURNAL",
+                        help="Resume an interrupted run from its journal, "
+                             "skipping the tasks that already succeeded, "
+                             "and keep recording to it")
+    parser.add_argument("--trace",
+                        help="Write the timeline of the run to this file in "
+                             "Chrome trace event format")
+    parser.add_argument("--metrics",
+                        help="Write aggregate metrics of the run to this "
+                             "file for the Prometheus textfile collector")
+    parser.add_argument("--report",
+                        help="Write the result of every task to this file "
+                             "as it finishes, as CSV if the name ends in "
+                             "'.csv' and as JSON lines otherwise")
+    parser.add_argument("--summary", choices=["aggregate", "grid", "none"],
+                        default="aggregate",
+                        help="Print counts per status, the slowest and the "
+                             "failed tasks, a table of all tasks, or nothing")
+    parser.add_argument("--log-format", choices=["text", "json"],
+                        default="text",
+                        help="Log human readable lines, or one JSON object "
+                             "per line with task, status and duration fields")
+    parser.add_argument("--default-timeout", type=float, metavar="SECONDS",
+                        help="Stop tasks that do not declare a timeout after "
+                             "this long, overriding the default_timeout of "
+                             "the input. 'eval' tasks are only stopped in "
+                             "process mode")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="Stop the run and cancel the running tasks as "
+                             "soon as a task fails")
+    parser.add_argument("--target", action="append", default=[],
+                        metavar="NAME",
+                        help="Only run this task and its dependencies, can "
+                             "be repeated")
+    parser.add_argument("--exclude", action="append", default=[],
+                        metavar="NAME",
+                        help="Do not run this task, as if it were up to "
+                             "date, can be repeated")
+    parser.add_argument("--only-downstream-of", action="append", default=[],
+                        metavar="NAME",
+                        help="Only run this task and the tasks that depend "
+                             "on it, can be repeated")
+    parser.add_argument("--plan", action="store_true",
+                        help="Print the depth, the widths, the critical path "
+                             "and makespan estimates of the graph instead "
+                             "of running it")
+    parser.add_argument("--compact", action="store_true",
+                        help="Track the task graph in compact arrays, for "
+                             "inputs with millions of tasks")
+    parser.add_argument("--listen", metavar="ADDRESS",
+                        help="Run the tasks on workers that connect to this "
+                             "address, HOST:PORT or unix:PATH, instead of "
+                             "locally")
+    parser.add_argument("--token-file", metavar="PATH",
+                        help="File with a token the workers must carry, "
+                             "required to listen on HOST:PORT")
+    parser.add_argument("--heartbeat-timeout", type=float, default=5.0,
+                        help="Seconds without a heartbeat after which a "
+                             "worker is considered lost and its tasks are "
+                             "reassigned")
     args = parser.parse_args()
+    configure_logging(args.log_format)
 
-    task_tracker = TaskTracker()
+    try:
+        config = RunnerConfig(max_concurrency=args.max_concurrency,
+                              max_exec=args.max_exec,
+                              max_eval=args.max_eval,
+                              eval_mode=args.eval_mode,
+                              eval_preload=args.eval_preload,
+                              eval_batch_threshold=args.eval_batch_threshold,
+                              eval_batch_time=args.eval_batch_time,
+                              output_limit=args.output_limit,
+                              output_dir=args.output_dir,
+                              exec_mode=args.exec_mode,
+                              exec_spawner=args.exec_spawner,
+                              fail_fast=args.fail_fast,
+                              default_timeout=args.default_timeout,
+                              cpu_capacity=args.cpus,
+                              memory_capacity_mb=args.memory_mb,
+                              backfill_window=args.backfill_window)
+    except Exception as e:
+        logger.error(f"Invalid runner configuration: {e}")
+        return
 
+    task_tracker = CompactTaskTracker() if args.compact else TaskTracker()
+
+    restored = 0
     try:
-        load_tasks(task_tracker, args.input, args.schema)
+        settings = load_tasks(task_tracker, args.input, args.schema,
+                              args.trusted, args.graph_cache,
+                              int(args.graph_cache_mb * 1024 * 1024))
+        if config.default_timeout is None:
+            config.default_timeout = settings.default_timeout
+        if args.target or args.exclude or args.only_downstream_of:
+            task_tracker.select(args.target, args.exclude,
+                                args.only_downstream_of)
+        if args.history:
+            task_tracker.history = load_history(args.history)
+        if args.resume:
+            restored = task_tracker.restore(read_journal(args.resume))
     except Exception as e:
         logger.error(f"Failed to load tasks: {e}")
         return
 
     task_tracker.prepare_topo_sorter()
 
-    # Loop over all tasks until they are all finished
-    while task_tracker.topo_sorter.is_active():
-        node_group = task_tracker.get_ready()
+    if args.plan:
+        from scheduler.plan import Plan
+
+        print(Plan(task_tracker).summary(config))
+        return
 
-        if not node_group:
-            await asyncio.sleep(0.25)
+    remote = None
+    if args.listen:
+        from scheduler.coordinator import RemoteExecutor
+        from scheduler.protocol import read_token
+
+        try:
+            token = (read_token(args.token_file)
+                     if args.token_file is not None else None)
+            remote = RemoteExecutor(args.listen, config,
+                                    args.heartbeat_timeout, token)
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot listen for workers: {e}")
+            return
+
+    journal = None
+    journal_path = args.resume or args.journal
+    if journal_path:
+        journal = Journal(journal_path)
+        task_tracker.status_listeners.append(journal.record)
+    reporter = Reporter(len(task_tracker.tasks), args.report,
+                        restored=restored)
+    task_tracker.status_listeners.append(reporter.record)
+    tracer = Tracer() if args.trace or args.metrics else None
+    try:
+        if remote is not None:
+            async with remote as executor:
+                await run_tasks(task_tracker, config, tracer, executor)
         else:
-            tasks = set()
-            for node in node_group:
-                task = asyncio.create_task(runner(node, task_tracker))
-                tasks.add(task)
-                task.add_done_callback(tasks.discard)
+            await run_tasks(task_tracker, config, tracer)
+    finally:
+        reporter.close()
+        if journal is not None:
+            journal.close()
+
+    if args.trace:
+        tracer.write_trace(args.trace, {
+            name: task_tracker.tasks[name].dependencies
+            for name in tracer.tasks})
+    if args.metrics:
+        tracer.write_metrics(args.metrics)
+
+    if args.history:
+        update_history(args.history, task_tracker.durations)
+
+    # Worker processes and remote workers keep caches of their own
+    if args.eval_mode == "thread" and not args.listen:
+        cache_info = compile_cache_info()
+        logger.info(f"Eval compile cache: {cache_info.hits} hits, "
+                    f"{cache_info.misses} misses")
 
-    print_summary(task_tracker)
+    if args.summary == "aggregate":
+        reporter.log_summary()
+    elif args.summary == "grid":
+        print_summary(task_tracker)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Check = Callable[[Any], bool]
+
+# Keywords that do not constrain the instance
+_ANNOTATIONS = frozenset({
+    "$id", "$schema", "$comment", "title", "description", "default",
+    "examples", "definitions", "$defs",
+})
+
+# Keywords of the top level of the input that cannot constrain the tasks
+_DOCUMENT_KEYWORDS = _ANNOTATIONS | {
+    "id", "type", "required", "properties", "additionalProperties",
+    "minProperties", "maxProperties", "propertyNames",
+}
+
+# Keywords of the tasks array that the loader checks on the streamed
+# records, either one by one or by counting them
+_STREAMED_KEYWORDS = frozenset({"type", "items"})
+ARRAY_KEYWORDS = frozenset({
+    "minItems", "maxItems", "uniqueItems", "contains", "minContains",
+    "maxContains",
+})
+
+
+def split_tasks_schema(schema: Any
+                       ) -> Optional[Tuple[Any, Optional[Any], Dict]]:
+    """Split the schema of an input document for the streaming loader.
+
+    The tasks are streamed out of the document, which is then validated
+    with an empty tasks array. This only works when the schema constrains
+    the tasks array with an item schema and the keywords of
+    `ARRAY_KEYWORDS`, which the loader checks on the records instead, and
+    nothing else refers to the tasks.
+
+    :param schema: The JSON schema of the input document.
+    :return: The schema of the document without the keywords of
+             `ARRAY_KEYWORDS` on the tasks array, the schema of the task
+             items, if any, and the removed keywords, or None if the tasks
+             array must be validated as a whole.
+    """
+
+    if not isinstance(schema, dict):
+        return schema, None, {}
+    if not set(schema) <= _DOCUMENT_KEYWORDS:
+        return None
+    properties = schema.get("properties", {})
+    tasks = properties.get("tasks", True) if isinstance(properties,
+                                                        dict) else True
+    if not isinstance(tasks, dict):
+        return schema, None, {}
+    if not set(tasks) <= _ANNOTATIONS | _STREAMED_KEYWORDS | ARRAY_KEYWORDS:
+        return None
+    items = tasks.get("items")
+    if items is not None and not isinstance(items, (dict, bool)):
+        return None
+    keywords = {keyword: argument for keyword, argument in tasks.items()
+                if keyword in ARRAY_KEYWORDS}
+    tasks = {keyword: argument for keyword, argument in tasks.items()
+             if keyword not in ARRAY_KEYWORDS}
+    return (dict(schema, properties=dict(properties, tasks=tasks)), items,
+            keywords)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_string(schema: Dict) -> bool:
+    return schema.get("type") == "string"
+
+
+def _is_bounded_number(schema: Dict, positive: bool) -> bool:
+    """Tell whether a schema only accepts non-negative or positive numbers,
+    with the numeric exclusiveMinimum of draft 6 or the boolean one of
+    draft 4."""
+
+    if schema.get("type") not in ("number", "integer"):
+        return False
+    minimum = schema.get("minimum")
+    exclusive = schema.get("exclusiveMinimum")
+    if _is_number(exclusive) and exclusive >= 0:
+        return True
+    if not _is_number(minimum):
+        return False
+    return minimum > 0 or (minimum == 0
+                           and (exclusive is True or not positive))
+
+
+# What the schema of every field of InputTaskModel must require at least
+_MODEL_FIELDS: Dict[str, Check] = {
+    "name": _is_string,
+    "type": lambda schema: (_is_string(schema) and "enum" in schema
+                            and set(schema["enum"]) <= {"exec", "eval"}),
+    "arguments": _is_string,
+    "dependencies": lambda schema: (
+        schema.get("type") == "array"
+        and isinstance(schema.get("items"), dict)
+        and _is_string(schema["items"])),
+    "duration": lambda schema: _is_bounded_number(schema, False),
+    "timeout": lambda schema: _is_bounded_number(schema, True),
+    "cpus": lambda schema: _is_bounded_number(schema, True),
+    "memory_mb": lambda schema: _is_bounded_number(schema, False),
+    "stdin_from": _is_string,
+}
+
+
+def covers_task_model(schema: Any) -> bool:
+    """Tell whether every task item valid against a schema is also a valid
+    InputTaskModel, so the model can be built without validating again.
+
+    Only the plain form of the task input schema is recognized: an object
+    with required name, type and arguments, and a property for every field
+    of the model constraining it as much as the model does, unless
+    additional properties are forbidden.
+
+    :param schema: The JSON schema of the task items.
+    :return: True if the schema implies the constraints of the model.
+    """
+
+    if not isinstance(schema, dict) or schema.get("type") != "object":
+        return False
+    if not {"name", "type", "arguments"} <= set(schema.get("required", ())):
+        return False
+    properties = schema.get("properties", {})
+    for field, covered in _MODEL_FIELDS.items():
+        field_schema = properties.get(field)
+        if field_schema is None:
+            if schema.get("additionalProperties") is False:
+                continue
+            return False
+        if not isinstance(field_schema, dict) or not covered(field_schema):
+            return False
+    return True
@@ -0,0 +1,64 @@
+from typing import Callable, Collection, Dict, Iterable, List, Set
+
+
+def select_tasks(names: Collection[str],
+                 dependencies_of: Callable[[str], Iterable[str]],
+                 targets: Iterable[str] = (),
+                 exclude: Iterable[str] = (),
+                 downstream_of: Iterable[str] = ()) -> Set[str]:
+    """Select the part of a task graph that needs to run.
+
+    With targets, only the targets and their transitive dependencies are
+    selected, with a walk that only visits the selected tasks. With
+    `downstream_of`, only the given tasks and the tasks that transitively
+    depend on them are selected, which needs one pass over the edges of the
+    graph to build the reverse index. Excluded tasks are considered up to
+    date: they are not selected and neither walk goes through them.
+
+    :param names: The names of all tasks.
+    :param dependencies_of: Returns the dependencies of a task by name.
+    :param targets: The tasks to run with their dependencies, all tasks
+                    when empty.
+    :param exclude: The tasks not to run.
+    :param downstream_of: The changed tasks whose dependents should run.
+    :return: The names of the selected tasks.
+    :raises KeyError: If one of the given names is not a task.
+    """
+
+    targets, exclude = list(targets), set(exclude)
+    downstream_of = list(downstream_of)
+    for name in (*targets, *exclude, *downstream_of):
+        if name not in names:
+            raise KeyError(f"Unknown task: {name}")
+
+    if targets:
+        selected = set()
+        stack = [name for name in targets if name not in exclude]
+        while stack:
+            name = stack.pop()
+            if name in selected:
+                continue
+            selected.add(name)
+            stack.extend(dep for dep in dependencies_of(name)
+                         if dep in names and dep not in selected
+                         and dep not in exclude)
+    else:
+        selected = set(names) - exclude
+
+    if downstream_of:
+        dependents: Dict[str, List[str]] = {}
+        for name in selected:
+            for dep in dependencies_of(name):
+                dependents.setdefault(dep, []).append(name)
+        downstream = set()
+        stack = [name for name in downstream_of if name in selected]
+        while stack:
+            name = stack.pop()
+            if name in downstream:
+                continue
+            downstream.add(name)
+            stack.extend(dependent for dependent in dependents.get(name, ())
+                         if dependent not in downstream)
+        selected = downstream
+
+    return selected
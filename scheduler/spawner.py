@@ -0,0 +1,243 @@
+"""A small helper process that forks commands on behalf of the scheduler.
+
+Forking a process that has a large resident set is expensive, so commands
+that need a shell can be delegated to this helper instead. It is started
+once, stays small, and receives the pipes of every command over a Unix
+socket. The scheduler reads those pipes directly, so no output passes
+through the helper.
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+from typing import Dict, List, Optional
+
+# Maximum size of a single spawn request
+_MAX_REQUEST = 1024 * 1024
+
+
+class SpawnedProcess:
+    """A process started by the spawner helper.
+
+    It provides the parts of `asyncio.subprocess.Process` the executor
+    uses: the stdout and stderr streams, `wait()` and `returncode`.
+    """
+
+    def __init__(self, pid: int, stdout: asyncio.StreamReader,
+                 stderr: asyncio.StreamReader, exited: asyncio.Future):
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self._exited = exited
+
+    @property
+    def returncode(self) -> Optional[int]:
+        if not self._exited.done():
+            return None
+        return self._exited.result()
+
+    async def wait(self) -> int:
+        return await asyncio.shield(self._exited)
+
+    def kill(self):
+        try:
+            os.kill(self.pid, 9)
+        except ProcessLookupError:
+            pass
+
+
+class Spawner:
+    """Client side of the spawner helper process."""
+
+    def __init__(self):
+        self._process: Optional[subprocess.Popen] = None
+        self._control: Optional[socket.socket] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._devnull: Optional[int] = None
+        self._started: Dict[int, asyncio.Future] = {}
+        self._exited: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+
+    async def start(self):
+        """Start the helper process and the task reading its replies."""
+
+        control, helper_control = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        reply_read, reply_write = os.pipe()
+        try:
+            self._process = subprocess.Popen(
+                [sys.executable, "-m", "scheduler.spawner",
+                 str(helper_control.fileno()), str(reply_write)],
+                pass_fds=(helper_control.fileno(), reply_write),
+            )
+        finally:
+            helper_control.close()
+            os.close(reply_write)
+        self._control = control
+        self._devnull = os.open(os.devnull, os.O_RDONLY)
+
+        replies = await _open_reader(reply_read)
+        self._reader_task = asyncio.create_task(self._read_replies(replies))
+
+    async def _read_replies(self, replies: asyncio.StreamReader):
+        async for line in replies:
+            reply = json.loads(line)
+            request_id = reply["id"]
+            if "returncode" in reply:
+                self._exited.pop(request_id).set_result(reply["returncode"])
+            elif "error" in reply:
+                self._exited.pop(request_id).cancel()
+                self._started.pop(request_id).set_exception(
+                    OSError(reply["error"]))
+            else:
+                self._started.pop(request_id).set_result(reply["pid"])
+
+        # The helper is gone, fail everything that is still waiting
+        for future in (*self._started.values(), *self._exited.values()):
+            if not future.done():
+                future.set_exception(
+                    RuntimeError("The spawner process exited"))
+
+    async def spawn(self, args: List[str],
+                    shell: bool = False) -> SpawnedProcess:
+        """Start a command through the helper process.
+
+        :param args: The program and its arguments, or a single command
+                     line when `shell` is True.
+        :param shell: Run the command line with /bin/sh.
+        :return: The started process with its stdout and stderr streams.
+                 Its stdin is /dev/null.
+        :raises OSError: If the command could not be started.
+        """
+
+        loop = asyncio.get_running_loop()
+        request_id = self._next_id
+        self._next_id += 1
+        started = self._started[request_id] = loop.create_future()
+        exited = self._exited[request_id] = loop.create_future()
+
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        try:
+            request = json.dumps(
+                {"id": request_id, "args": args, "shell": shell})
+            socket.send_fds(self._control, [request.encode()],
+                            [self._devnull, stdout_write, stderr_write])
+        except BaseException:
+            os.close(stdout_read)
+            os.close(stderr_read)
+            del self._started[request_id]
+            del self._exited[request_id]
+            raise
+        finally:
+            os.close(stdout_write)
+            os.close(stderr_write)
+
+        try:
+            pid = await started
+        except BaseException:
+            os.close(stdout_read)
+            os.close(stderr_read)
+            raise
+
+        return SpawnedProcess(pid, await _open_reader(stdout_read),
+                              await _open_reader(stderr_read), exited)
+
+    async def close(self):
+        """Stop the helper process. Running commands are not affected."""
+
+        if self._control is not None:
+            self._control.close()
+            self._control = None
+        if self._devnull is not None:
+            os.close(self._devnull)
+            self._devnull = None
+        if self._process is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._process.wait)
+            self._process = None
+        if self._reader_task is not None:
+            await self._reader_task
+            self._reader_task = None
+
+
+async def _open_reader(fd: int) -> asyncio.StreamReader:
+    """Wrap the read end of a pipe in an asyncio StreamReader."""
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader),
+        os.fdopen(fd, "rb", buffering=0))
+    return reader
+
+
+def _serve(control: socket.socket, replies):
+    """Start the requested commands until the control socket is closed."""
+
+    lock = threading.Lock()
+    children: Dict[int, int] = {}
+    child_started = threading.Event()
+
+    def reply(message):
+        with lock:
+            replies.write(json.dumps(message) + "\n")
+            replies.flush()
+
+    def reap():
+        while True:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                child_started.wait()
+                child_started.clear()
+                continue
+            with lock:
+                request_id = children.pop(pid, None)
+            if request_id is not None:
+                reply({"id": request_id,
+                       "returncode": os.waitstatus_to_exitcode(status)})
+
+    threading.Thread(target=reap, daemon=True).start()
+
+    while True:
+        message, fds, _, _ = socket.recv_fds(control, _MAX_REQUEST, 3)
+        if not message:
+            return
+
+        request = json.loads(message)
+        args = request["args"]
+        spawn = os.posix_spawnp
+        if request["shell"]:
+            args = ["/bin/sh", "-c", args[0]]
+            spawn = os.posix_spawn
+        try:
+            file_actions = [(os.POSIX_SPAWN_DUP2, fd, target)
+                            for target, fd in enumerate(fds)]
+            # Hold the lock so the reaper cannot see the pid before it is
+            # registered
+            with lock:
+                pid = spawn(args[0], args, os.environ,
+                            file_actions=file_actions, setsid=True)
+                children[pid] = request["id"]
+        except OSError as e:
+            reply({"id": request["id"], "error": str(e)})
+        else:
+            reply({"id": request["id"], "pid": pid})
+            child_started.set()
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+
+def main():
+    control = socket.socket(fileno=int(sys.argv[1]))
+    with os.fdopen(int(sys.argv[2]), "w") as replies:
+        _serve(control, replies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import os
+import sys
+from scheduler.protocol import (Message, open_connection, read_token,
+                                receive, send)
+from typing import Any, Callable, Dict, Optional
+
+
+class SubmissionError(RuntimeError):
+    """Raised when the daemon rejects a graph or disconnects."""
+
+
+async def submit(address: str, input_path: Optional[str] = None,
+                 document: Optional[Dict[str, Any]] = None,
+                 options: Optional[Dict[str, Any]] = None,
+                 on_status: Optional[Callable[[str, str], None]] = None,
+                 token: Optional[str] = None) -> Message:
+    """Submit a graph to a daemon and wait until it has run.
+
+    :param address: The address of the daemon, 'HOST:PORT' or 'unix:PATH'.
+    :param input_path: The path of an input file, read by the daemon.
+    :param document: The input document itself, instead of a path.
+    :param options: Limits and options of the runner configuration for
+                    this graph, such as 'max_concurrency' or 'fail_fast'.
+    :param on_status: Called with the name and the new status of a task for
+                      every status change the daemon streams back.
+    :param token: The token the daemon was started with, if any.
+    :return: The final message, with whether all tasks succeeded ('ok'),
+             the counts per status, the summary of the run and the number
+             of status changes dropped because the client fell behind
+             ('dropped').
+    :raises SubmissionError: If the graph was rejected or the daemon went
+                             away before the graph finished.
+    """
+
+    message: Message = {"type": "submit", "options": options or {}}
+    if token is not None:
+        message["token"] = token
+    if document is not None:
+        message["document"] = document
+    else:
+        # The daemon may run in another working directory
+        message["input"] = os.path.abspath(input_path)
+
+    reader, writer = await open_connection(address)
+    try:
+        send(writer, message)
+        while True:
+            reply = await receive(reader)
+            if reply is None:
+                raise SubmissionError("The daemon closed the connection")
+            if reply["type"] == "error":
+                raise SubmissionError(reply["message"])
+            if reply["type"] == "status" and on_status is not None:
+                on_status(reply["task"], reply["status"])
+            elif reply["type"] == "done":
+                return reply
+    finally:
+        writer.close()
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Submit a graph to a Task Scheduler daemon started with "
+                    "python -m scheduler.daemon")
+    parser.add_argument("input", help="Path to the input JSON file")
+    parser.add_argument("--connect", required=True, metavar="ADDRESS",
+                        help="Address of the daemon, HOST:PORT or unix:PATH")
+    parser.add_argument("--token-file", metavar="PATH",
+                        help="File with the token the daemon was started "
+                             "with")
+    parser.add_argument("--max-concurrency", type=int,
+                        help="Maximum number of tasks running at once")
+    parser.add_argument("--max-exec", type=int,
+                        help="Maximum number of 'exec' tasks running at once")
+    parser.add_argument("--max-eval", type=int,
+                        help="Maximum number of 'eval' tasks running at once")
+    parser.add_argument("--default-timeout", type=float, metavar="SECONDS",
+                        help="Stop tasks that do not declare a timeout after "
+                             "this long")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="Stop the graph as soon as a task fails")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Only print the summary, not every status "
+                             "change")
+    args = parser.parse_args()
+
+    options = {key: value for key, value in (
+        ("max_concurrency", args.max_concurrency),
+        ("max_exec", args.max_exec),
+        ("max_eval", args.max_eval),
+        ("default_timeout", args.default_timeout),
+        ("fail_fast", args.fail_fast or None),
+    ) if value is not None}
+
+    def print_status(name: str, status: str):
+        print(f"{status:9} {name}", flush=True)
+
+    try:
+        token = (read_token(args.token_file)
+                 if args.token_file is not None else None)
+        done = await submit(args.connect, args.input, options=options,
+                            on_status=None if args.quiet else print_status,
+                            token=token)
+    except (OSError, ValueError, SubmissionError) as e:
+        print(f"Submission failed: {e}", file=sys.stderr)
+        return 2
+    if done.get("dropped"):
+        print(f"{done['dropped']} status changes were not received",
+              file=sys.stderr)
+    print(done["summary"])
+    return 0 if done["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
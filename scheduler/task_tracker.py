@@ -1,7 +1,9 @@
 from graphlib import TopologicalSorter
-from typing import Dict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from scheduler.logger import get_logger
 from scheduler.models import Task, TaskStatus
+from scheduler.pipes import check_pipe
+from scheduler.selection import select_tasks
 
 logger = get_logger(__name__)
 
@@ -9,10 +11,20 @@ logger = get_logger(__name__)
 class TaskTracker:
     tasks: Dict[str, Task]
     topo_sorter: TopologicalSorter
+    dependents: Dict[str, List[str]]
+    priorities: Dict[str, float]
+    history: Dict[str, float]
+    durations: Dict[str, float]
+    status_listeners: List[Callable[[str, TaskStatus], None]]
 
     def __init__(self):
         self.tasks = {}
         self.topo_sorter = TopologicalSorter()
+        self.dependents = {}
+        self.priorities = {}
+        self.history = {}
+        self.durations = {}
+        self.status_listeners = []
 
     def add_task(self, name: str, task: Task):
         """Adds a task to the tracker.
@@ -23,11 +35,129 @@ class TaskTracker:
 
         self.tasks[name] = task
 
+    def status(self, name: str) -> TaskStatus:
+        """Get the status of a task.
+
+        :param name: The name of the task.
+        :return: The current status of the task.
+        """
+
+        return self.tasks[name].status
+
+    def set_status(self, name: str, status: TaskStatus):
+        """Change the status of a task and notify the status listeners.
+
+        When a task fails or times out, all tasks downstream of it are
+        skipped right away.
+
+        :param name: The name of the task.
+        :param status: The new status of the task.
+        """
+
+        self.tasks[name].status = status
+        for listener in self.status_listeners:
+            listener(name, status)
+        if status in (TaskStatus.FAILED, TaskStatus.TIMEOUT):
+            self._skip_downstream(name)
+
+    def _skip_downstream(self, name: str):
+        """Mark the pending tasks downstream of a failed task as SKIPPED.
+
+        The reverse dependency index is walked once, every skipped task is
+        visited a single time. Tasks that already succeeded, for example
+        when restored from a journal, are left alone and not walked through.
+
+        :param name: The name of the failed task.
+        """
+
+        stack = [name]
+        while stack:
+            for dependent in self.dependents_of(stack.pop()):
+                if self.status(dependent) == TaskStatus.PENDING:
+                    logger.info(f"Skipped: {dependent}",
+                                extra={"task": dependent,
+                                       "status": TaskStatus.SKIPPED.name})
+                    self.set_status(dependent, TaskStatus.SKIPPED)
+                    stack.append(dependent)
+
+    def restore(self, statuses: Dict[str, TaskStatus]) -> int:
+        """Restore the outcome of an earlier, interrupted run.
+
+        Tasks that succeeded are marked OK, so that they are not run again.
+        Tasks with any other status are left PENDING and run as usual. A
+        task whose output is read by a task that runs again is left PENDING
+        as well, and so is its own source, so the reader gets its input.
+
+        :param statuses: The last known status of tasks by name.
+        :return: The number of tasks restored as OK.
+        """
+
+        for name, status in statuses.items():
+            if status == TaskStatus.OK and name in self.tasks:
+                self.tasks[name].status = TaskStatus.OK
+        for name, task in self.tasks.items():
+            if task.stdin_from is None or task.status == TaskStatus.OK:
+                continue
+            source = self.tasks.get(task.stdin_from)
+            while source is not None and source.status == TaskStatus.OK:
+                source.status = TaskStatus.PENDING
+                source = self.tasks.get(source.stdin_from)
+        return sum(task.status == TaskStatus.OK
+                   for task in self.tasks.values())
+
+    def select(self, targets: Iterable[str] = (),
+               exclude: Iterable[str] = (),
+               downstream_of: Iterable[str] = ()):
+        """Keep only the tasks that need to run, see `select_tasks()`.
+
+        The other tasks are removed, and the dependencies of the kept tasks
+        on them are dropped, as if they were done already. This must be
+        called before `prepare_topo_sorter()`.
+
+        :param targets: The tasks to run with their dependencies, all tasks
+                        when empty.
+        :param exclude: The tasks not to run.
+        :param downstream_of: The changed tasks whose dependents should run.
+        :raises KeyError: If one of the given names is not a task, or a
+                          selected task has a dependency on a task that
+                          does not exist.
+        """
+
+        selected = select_tasks(
+            self.tasks, lambda name: self.tasks[name].dependencies,
+            targets, exclude, downstream_of)
+        tasks = {}
+        for name, task in self.tasks.items():
+            if name not in selected:
+                continue
+            missing_deps = {dep for dep in task.dependencies
+                            if dep not in self.tasks}
+            if missing_deps:
+                raise KeyError(
+                    f"Task '{name}' has unknown dependencies: "
+                    f"{', '.join(missing_deps)}"
+                )
+            dependencies = tuple(dep for dep in task.dependencies
+                                 if dep in selected)
+            if len(dependencies) < len(task.dependencies):
+                stdin_from = task.stdin_from
+                if stdin_from not in selected:
+                    stdin_from = None
+                task = task.model_copy(
+                    update={"dependencies": dependencies,
+                            "stdin_from": stdin_from})
+            tasks[name] = task
+        logger.info(f"Selected {len(tasks)} of {len(self.tasks)} tasks")
+        self.tasks = tasks
+
     def validate_dependencies(self):
-        """Check if all task dependencies refer to existing tasks.
+        """Check if all task dependencies refer to existing tasks, and that
+        the tasks reading the output of another one can be piped, see
+        `check_pipe()`.
 
         :raises KeyError: If a task has a dependency on a task that
                           does not exist.
+        :raises ValueError: If a task cannot read the output of its source.
         """
 
         all_task_names = set(self.tasks.keys())
@@ -38,6 +168,11 @@ class TaskTracker:
                     f"Task '{task_name}' has unknown dependencies: "
                     f"{', '.join(missing_deps)}"
                 )
+            source = self.tasks.get(task.stdin_from)
+            if task.stdin_from is not None:
+                check_pipe(task_name, task.type, task.dependencies,
+                           task.stdin_from, source and source.type,
+                           source.dependencies if source else ())
 
     def prepare_topo_sorter(self):
         """Prepare the topological sorter with the current task graph.
@@ -61,43 +196,153 @@ class TaskTracker:
         self.topo_sorter = TopologicalSorter(graph)
         self.topo_sorter.prepare()
 
-    def _check_failed_dependencies(self, task: Task) -> bool:
-        """Check if any of a task's dependencies have failed or been skipped.
+        self.dependents = {name: [] for name in self.tasks}
+        for name, task in self.tasks.items():
+            for dep in set(task.dependencies):
+                self.dependents[dep].append(name)
+        self._compute_priorities()
+
+    def task_type(self, name: str) -> str:
+        """Get the type of a task.
 
-        :param task: The task to check the dependencies of.
-        :return: True if any dependency has failed or been skipped,
-                 False otherwise.
+        :param name: The name of the task.
+        :return: Either 'exec' or 'eval'.
         """
 
-        logger.debug(
-            "Deps status: "
-            f"{[self.tasks[dep].status for dep in task.dependencies]}"
-        )
-        return any(
-            self.tasks[dep].status in
-            (TaskStatus.FAILED, TaskStatus.SKIPPED)
-            for dep in task.dependencies)
+        return self.tasks[name].type
+
+    def pipes(self) -> Dict[str, List[str]]:
+        """Get the tasks that read the output of another task.
+
+        :return: The names of the tasks reading the stdout of every task
+                 that has any, in input order.
+        """
+
+        consumers = {}
+        for name, task in self.tasks.items():
+            if task.stdin_from is not None:
+                consumers.setdefault(task.stdin_from, []).append(name)
+        return consumers
+
+    def dependents_of(self, name: str) -> List[str]:
+        """Get the names of the tasks that depend on a task.
+
+        :param name: The name of the task.
+        :return: The names of its direct dependents.
+        """
+
+        return self.dependents[name]
+
+    def priority(self, name: str) -> float:
+        """Get the critical path priority of a task.
+
+        :param name: The name of the task.
+        :return: The priority, higher runs first.
+        """
+
+        return self.priorities.get(name, 0.0)
+
+    def expected_duration(self, name: str) -> Optional[float]:
+        """Get the expected duration of a task in seconds.
+
+        :param name: The name of the task.
+        :return: The declared duration of the task, else its duration in
+                 the history, else None.
+        """
+
+        duration = self.tasks[name].duration
+        if duration is None:
+            duration = self.history.get(name)
+        return duration
+
+    def timeout(self, name: str) -> Optional[float]:
+        """Get the declared timeout of a task in seconds, or None."""
+
+        return self.tasks[name].timeout
+
+    def requirements(self, name: str) -> Tuple[float, float]:
+        """Get the declared resource requirements of a task.
+
+        :param name: The name of the task.
+        :return: The number of CPUs and the memory in MiB, 0 for what the
+                 task does not declare.
+        """
+
+        task = self.tasks[name]
+        return task.cpus or 0.0, task.memory_mb or 0.0
+
+    def _compute_priorities(self):
+        """Compute the critical path priority of every task.
+
+        The priority of a task is the length of the longest path from the
+        task to the end of the graph, weighted by the expected durations.
+        Tasks without a known duration are weighted with the mean of the
+        known durations, or 1 if there are none. The tasks are visited in
+        reverse topological order, so each edge is followed once.
+        """
+
+        weights = {name: self.expected_duration(name) for name in self.tasks}
+        known = [weight for weight in weights.values() if weight is not None]
+        default = sum(known) / len(known) if known else 1.0
+
+        remaining = {name: len(dependents)
+                     for name, dependents in self.dependents.items()}
+        stack = [name for name, count in remaining.items() if count == 0]
+        self.priorities = {}
+        while stack:
+            name = stack.pop()
+            weight = weights[name]
+            self.priorities[name] = (
+                (default if weight is None else weight)
+                + max((self.priorities[dependent]
+                       for dependent in self.dependents[name]), default=0.0)
+            )
+            for dep in set(self.tasks[name].dependencies):
+                remaining[dep] -= 1
+                if remaining[dep] == 0:
+                    stack.append(dep)
 
     def get_ready(self) -> set[str]:
         """Get a set of tasks that are ready to be executed.
 
         This method retrieves tasks that are ready from the topological sorter.
-        It also checks for tasks whose dependencies have failed or been
-        skipped, and marks them as SKIPPED. Such tasks are not included in the
-        returned set.
+        Tasks that were skipped because a task upstream of them failed are
+        not included in the returned set. Neither are tasks that already
+        succeeded, for example when restored from a journal. Both are marked
+        done right away, and the tasks this unblocks are retrieved as well,
+        so a skipped subgraph is drained in a single call.
 
         :return: A set of names of the tasks that are ready to be executed.
         """
 
-        ready_tasks = self.topo_sorter.get_ready()
-
         to_run_tasks = set()
-        for task_name in ready_tasks:
-            if self._check_failed_dependencies(self.tasks[task_name]):
-                logger.info(f"Skipped: {task_name}")
-                self.tasks[task_name].status = TaskStatus.SKIPPED
-                self.topo_sorter.done(task_name)
-            else:
-                to_run_tasks.add(task_name)
+        ready_tasks = self.topo_sorter.get_ready()
+        while ready_tasks:
+            for task_name in ready_tasks:
+                status = self.tasks[task_name].status
+                if status == TaskStatus.OK:
+                    logger.info(f"Already done: {task_name}")
+                    self.done(task_name)
+                elif status == TaskStatus.SKIPPED:
+                    self.done(task_name)
+                else:
+                    to_run_tasks.add(task_name)
+            ready_tasks = self.topo_sorter.get_ready()
 
         return to_run_tasks
+
+    def done(self, name: str):
+        """Mark a task as finished, so that its dependents can become ready.
+
+        :param name: The name of a task returned by `get_ready()`.
+        """
+
+        self.topo_sorter.done(name)
+
+    def is_active(self) -> bool:
+        """Check whether any task is still ready, running or waiting.
+
+        :return: True until every task has been marked done.
+        """
+
+        return self.topo_sorter.is_active()
@@ -0,0 +1,266 @@
+import bisect
+import heapq
+import json
+import os
+import time
+from collections import Counter
+from scheduler.logger import get_logger
+from scheduler.models import TaskStatus
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = get_logger(__name__)
+
+# Upper bounds in seconds of the buckets of the exported histograms
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0,
+           10.0, 60.0, 300.0)
+
+
+class TaskTiming:
+    """The points in time a task went through, in `time.monotonic()`
+    seconds."""
+
+    __slots__ = ("type", "ready", "dispatched", "started", "finished",
+                 "status")
+
+    def __init__(self, task_type: str, ready: float):
+        self.type = task_type
+        self.ready = ready
+        self.dispatched: Optional[float] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.status: Optional[TaskStatus] = None
+
+    @property
+    def queued(self) -> float:
+        """Time between becoming ready and being dispatched."""
+
+        return (self.dispatched or self.ready) - self.ready
+
+    @property
+    def handoff(self) -> float:
+        """Time between being dispatched and starting to execute."""
+
+        if self.dispatched is None or self.started is None:
+            return 0.0
+        return self.started - self.dispatched
+
+    @property
+    def execution(self) -> float:
+        """Time between starting to execute and finishing."""
+
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+class Tracer:
+    """Record the timeline of a run.
+
+    The dispatcher and the runner report when each task became ready, was
+    dispatched, started executing and finished, and how long every
+    iteration of the dispatch loop took. The timeline can be written as a
+    Chrome trace (chrome://tracing, Perfetto) and aggregated into a
+    Prometheus textfile.
+    """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.end: Optional[float] = None
+        self.tasks: Dict[str, TaskTiming] = {}
+        self.loops: List[Tuple[float, float]] = []
+        self.skipped = 0
+
+    def ready(self, name: str, task_type: str):
+        self.tasks[name] = TaskTiming(task_type, time.monotonic())
+
+    def dispatched(self, name: str):
+        self.tasks[name].dispatched = time.monotonic()
+
+    def started(self, name: str, started: Optional[float]):
+        """Record the start of the execution.
+
+        :param name: The name of the task.
+        :param started: When the executor started the task, or None if it
+                        does not know, for example when it failed to start.
+        """
+
+        timing = self.tasks[name]
+        timing.started = started if started is not None else timing.dispatched
+
+    def finished(self, name: str, status: TaskStatus):
+        timing = self.tasks[name]
+        timing.finished = time.monotonic()
+        timing.status = status
+
+    def status_changed(self, name: str, status: TaskStatus):
+        """Count the skipped tasks, which never become ready.
+
+        This has the signature of a TaskTracker status listener.
+        """
+
+        if status == TaskStatus.SKIPPED:
+            self.skipped += 1
+
+    def loop(self, start: float, end: float):
+        """Record the time the dispatcher spent in one loop iteration."""
+
+        self.loops.append((start, end))
+
+    def close(self):
+        self.end = time.monotonic()
+
+    def _micros(self, timestamp: float) -> float:
+        return round((timestamp - self.start) * 1e6, 1)
+
+    def trace_events(self, dependencies: Dict[str, Iterable[str]]
+                     ) -> List[dict]:
+        """Build the Chrome trace events of the run.
+
+        Every task gets a lane (thread) of its own for as long as it is
+        ready or running, with a 'wait' slice from becoming ready to
+        starting and a slice for its execution. The dispatch loop has lane
+        0. The arguments of each execution slice include the dependency
+        that finished last, so the critical path can be followed back.
+
+        :param dependencies: The dependencies of each task by name.
+        :return: A list of trace events.
+        """
+
+        events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": 0,
+                   "args": {"name": "dispatcher"}}]
+        for start, end in self.loops:
+            events.append({"name": "dispatch", "cat": "scheduler", "ph": "X",
+                           "pid": 1, "tid": 0, "ts": self._micros(start),
+                           "dur": round((end - start) * 1e6, 1)})
+
+        # Assign lanes greedily by start time, reusing freed lanes
+        free: List[int] = []
+        busy: List[Tuple[float, int]] = []
+        lanes = 0
+        timings = sorted(
+            ((timing.ready, name, timing)
+             for name, timing in self.tasks.items()
+             if timing.finished is not None),
+            key=lambda item: item[0])
+        for ready, name, timing in timings:
+            while busy and busy[0][0] <= ready:
+                heapq.heappush(free, heapq.heappop(busy)[1])
+            if free:
+                lane = heapq.heappop(free)
+            else:
+                lanes += 1
+                lane = lanes
+            heapq.heappush(busy, (timing.finished, lane))
+
+            started = timing.started
+            if started is None:
+                started = timing.finished
+            if started > ready:
+                events.append({
+                    "name": name, "cat": "wait", "ph": "X", "pid": 1,
+                    "tid": lane, "ts": self._micros(ready),
+                    "dur": round((started - ready) * 1e6, 1),
+                    "args": {"queued_ms": timing.queued * 1e3,
+                             "handoff_ms": timing.handoff * 1e3}})
+
+            blocked_by = max(
+                (dep for dep in dependencies.get(name, ())
+                 if dep in self.tasks
+                 and self.tasks[dep].finished is not None),
+                key=lambda dep: self.tasks[dep].finished, default=None)
+            events.append({
+                "name": name, "cat": timing.type, "ph": "X", "pid": 1,
+                "tid": lane, "ts": self._micros(started),
+                "dur": round((timing.finished - started) * 1e6, 1),
+                "args": {"status": timing.status.name,
+                         "blocked_by": blocked_by}})
+        return events
+
+    def write_trace(self, path: str,
+                    dependencies: Dict[str, Iterable[str]]):
+        """Write the timeline in Chrome trace event format.
+
+        :param path: The path to the trace file.
+        :param dependencies: The dependencies of each task by name.
+        """
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events(dependencies),
+                       "displayTimeUnit": "ms"}, f)
+        logger.info(f"Wrote the trace of {len(self.tasks)} tasks to {path}")
+
+    def metrics(self) -> str:
+        """Aggregate the run into Prometheus text exposition format."""
+
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        counts = Counter((timing.type, timing.status.name)
+                         for timing in self.tasks.values()
+                         if timing.status is not None)
+        metric("scheduler_tasks_total", "counter",
+               "Tasks by type and final status.")
+        for (task_type, status), count in sorted(counts.items()):
+            lines.append(f'scheduler_tasks_total{{type="{task_type}",'
+                         f'status="{status}"}} {count}')
+
+        for phase, help_text in (
+                ("queued", "Time from ready to dispatched."),
+                ("handoff", "Time from dispatched to executing."),
+                ("execution", "Time from executing to finished.")):
+            name = f"scheduler_task_{phase}_seconds"
+            metric(name, "histogram", help_text)
+            by_type: Dict[str, List[float]] = {}
+            for timing in self.tasks.values():
+                if timing.finished is not None:
+                    by_type.setdefault(timing.type, []).append(
+                        getattr(timing, phase))
+            for task_type, values in sorted(by_type.items()):
+                lines.extend(_histogram(name, f'type="{task_type}"', values))
+
+        metric("scheduler_tasks_skipped_total", "counter",
+               "Tasks skipped because a task upstream of them failed.")
+        lines.append(f"scheduler_tasks_skipped_total {self.skipped}")
+
+        metric("scheduler_dispatch_loop_seconds_total", "counter",
+               "Time the dispatcher spent outside of waiting.")
+        lines.append("scheduler_dispatch_loop_seconds_total "
+                     f"{sum(end - start for start, end in self.loops)}")
+        metric("scheduler_dispatch_loop_iterations_total", "counter",
+               "Iterations of the dispatch loop.")
+        lines.append(
+            f"scheduler_dispatch_loop_iterations_total {len(self.loops)}")
+        metric("scheduler_makespan_seconds", "gauge",
+               "Duration of the run.")
+        end = self.end if self.end is not None else time.monotonic()
+        lines.append(f"scheduler_makespan_seconds {end - self.start}")
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path: str):
+        """Write the metrics for the textfile collector of node_exporter.
+
+        The file is replaced atomically, so the collector never reads a
+        partially written file.
+
+        :param path: The path to the .prom file.
+        """
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.metrics())
+        os.replace(tmp_path, path)
+
+
+def _histogram(name: str, labels: str, values: List[float]) -> List[str]:
+    values = sorted(values)
+    lines = []
+    for bound in BUCKETS:
+        count = bisect.bisect_right(values, bound)
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {len(values)}')
+    lines.append(f"{name}_sum{{{labels}}} {sum(values)}")
+    lines.append(f"{name}_count{{{labels}}} {len(values)}")
+    return lines
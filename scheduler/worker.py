@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import os
+import socket
+from scheduler.executor import TaskExecutor
+from scheduler.logger import get_logger
+from scheduler.models import RunnerConfig, Task
+from scheduler.protocol import (Message, encode_result, open_connection,
+                                read_token, receive, send)
+from typing import Dict, Optional
+
+logger = get_logger(__name__)
+
+
+async def run_worker(address: str, capacity: int,
+                     config: Optional[RunnerConfig] = None,
+                     heartbeat_interval: float = 1.0,
+                     name: Optional[str] = None,
+                     token: Optional[str] = None):
+    """Execute the tasks a coordinator sends until it disconnects.
+
+    The worker advertises its capacity, runs up to that many tasks at once
+    with a TaskExecutor of its own and sends a heartbeat every
+    `heartbeat_interval` seconds. The output of the tasks is returned to
+    the coordinator, which logs it like the output of local tasks.
+
+    :param address: The address of the coordinator, 'HOST:PORT' or
+                    'unix:PATH'.
+    :param capacity: The number of tasks to run at once.
+    :param config: The eval and exec options of the executor.
+    :param heartbeat_interval: Seconds between heartbeats.
+    :param name: The name to report to the coordinator, host and process id
+                 by default.
+    :param token: The token the coordinator was started with, if any.
+    """
+
+    config = (config or RunnerConfig()).model_copy(
+        update={"max_concurrency": capacity})
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    reader, writer = await open_connection(address)
+    hello = {"type": "hello", "name": name, "capacity": capacity}
+    if token is not None:
+        hello["token"] = token
+    send(writer, hello)
+    logger.info(f"Worker {name} connected to {address}")
+
+    running: Dict[int, asyncio.Task] = {}
+
+    async def execute(executor: TaskExecutor, message: Message):
+        task = Task.model_construct(**message["task"])
+        try:
+            result = await executor.execute(task)
+        finally:
+            running.pop(message["id"], None)
+        send(writer, {"type": "result", "id": message["id"],
+                      "result": encode_result(result)})
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(heartbeat_interval)
+            send(writer, {"type": "heartbeat"})
+
+    async with TaskExecutor(config) as executor:
+        heartbeats = asyncio.create_task(heartbeat())
+        try:
+            while True:
+                message = await receive(reader)
+                if message is None or message["type"] == "shutdown":
+                    break
+                if message["type"] == "error":
+                    logger.error(f"The coordinator rejected worker {name}: "
+                                 f"{message['message']}")
+                    break
+                if message["type"] == "task":
+                    running[message["id"]] = asyncio.create_task(
+                        execute(executor, message))
+                elif message["type"] == "cancel":
+                    task = running.pop(message["id"], None)
+                    if task is not None:
+                        task.cancel()
+        finally:
+            heartbeats.cancel()
+            for task in running.values():
+                task.cancel()
+            await asyncio.gather(heartbeats, *running.values(),
+                                 return_exceptions=True)
+            writer.close()
+    logger.info(f"Worker {name} disconnected")
+
+
+async def connect(address: str, retry: float, **kwargs):
+    """Run a worker, retrying until the coordinator accepts connections."""
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + retry
+    while True:
+        try:
+            return await run_worker(address, **kwargs)
+        except (ConnectionError, FileNotFoundError) as e:
+            if loop.time() >= deadline:
+                raise
+            logger.info(f"Coordinator not reachable ({e}), retrying")
+            await asyncio.sleep(0.5)
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Task Scheduler worker, runs tasks for a coordinator "
+                    "started with --listen")
+    parser.add_argument("--connect", required=True, metavar="ADDRESS",
+                        help="Address of the coordinator, HOST:PORT or "
+                             "unix:PATH")
+    parser.add_argument("--token-file", metavar="PATH",
+                        help="File with the token the coordinator was "
+                             "started with")
+    parser.add_argument("--capacity", type=int, default=os.cpu_count(),
+                        help="Number of tasks to run at once")
+    parser.add_argument("--eval-mode", choices=["thread", "process"],
+                        default="thread",
+                        help="Run 'eval' tasks in a thread pool or in a pool "
+                             "of worker processes")
+    parser.add_argument("--exec-mode", choices=["shell", "direct"],
+                        default="shell",
+                        help="Run every 'exec' task through /bin/sh, or start "
+                             "simple commands directly without a shell")
+    parser.add_argument("--heartbeat-interval", type=float, default=1.0,
+                        help="Seconds between heartbeats")
+    parser.add_argument("--retry", type=float, default=30.0,
+                        help="Seconds to keep retrying to connect")
+    parser.add_argument("--name",
+                        help="Name of the worker in the coordinator's logs")
+    args = parser.parse_args()
+
+    config = RunnerConfig(eval_mode=args.eval_mode, exec_mode=args.exec_mode)
+    token = (read_token(args.token_file)
+             if args.token_file is not None else None)
+    await connect(args.connect, args.retry, capacity=args.capacity,
+                  config=config, heartbeat_interval=args.heartbeat_interval,
+                  name=args.name, token=token)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+import graphlib
+import pytest
+from scheduler.compact_tracker import CompactTaskTracker
+from scheduler.models import Task, TaskStatus
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+
+def build_diamond(tracker):
+    """Add a diamond with a duplicated edge and a separate task."""
+    tracker.add_task("a", Task(type="exec", arguments="true", duration=1))
+    tracker.add_task(
+        "b", Task(type="eval", arguments="pass", dependencies=("a", "a"),
+                  duration=5)
+    )
+    tracker.add_task(
+        "c", Task(type="exec", arguments="true", dependencies=("a",),
+                  duration=2)
+    )
+    tracker.add_task(
+        "d", Task(type="exec", arguments="true", dependencies=("b", "c"))
+    )
+    tracker.add_task("e", Task(type="exec", arguments="true"))
+    tracker.history = {"d": 3, "e": 4}
+    return tracker
+
+
+def drain(tracker, failing=()):
+    """Run the ready/done protocol to the end and record the ready sets."""
+    steps = []
+    while tracker.is_active():
+        ready = tracker.get_ready()
+        steps.append(ready)
+        for name in sorted(ready):
+            status = TaskStatus.FAILED if name in failing else TaskStatus.OK
+            tracker.set_status(name, status)
+            tracker.done(name)
+    return steps
+
+
+@pytest.mark.parametrize("failing", [(), ("a",), ("c",)])
+def test_compact_tracker_matches_task_tracker(failing):
+    """Test that both trackers return the same ready sets and statuses."""
+    expected = build_diamond(TaskTracker())
+    expected.prepare_topo_sorter()
+    compact = build_diamond(CompactTaskTracker())
+    compact.prepare_topo_sorter()
+
+    assert drain(compact, failing) == drain(expected, failing)
+    assert ({name: task.status for name, task in compact.tasks.items()}
+            == {name: task.status for name, task in expected.tasks.items()})
+    assert ({name: compact.priority(name) for name in compact.tasks}
+            == expected.priorities)
+    assert compact.tasks["b"].dependencies == ("a",)
+    assert compact.dependents_of("a") == ["b", "c"]
+
+
+@pytest.mark.parametrize("selection", [
+    {"targets": ["b"]},
+    {"targets": ["d", "e"], "exclude": ["c"]},
+    {"downstream_of": ["b"]},
+])
+def test_compact_tracker_selects_like_task_tracker(selection):
+    """Test that both trackers keep the same tasks, dependencies and
+    declared values."""
+    expected = build_diamond(TaskTracker())
+    expected.select(**selection)
+    expected.prepare_topo_sorter()
+    compact = build_diamond(CompactTaskTracker())
+    compact.select(**selection)
+    compact.prepare_topo_sorter()
+
+    assert list(compact.tasks) == list(expected.tasks)
+    for name, task in expected.tasks.items():
+        assert set(compact.tasks[name].dependencies) == set(task.dependencies)
+        assert compact.tasks[name].duration == task.duration
+    assert drain(compact) == drain(expected)
+    with pytest.raises(ValueError):
+        compact.select(**selection)
+
+
+def test_compact_tracker_rejects_invalid_graphs():
+    """Test that unknown dependencies and cycles are reported."""
+    tracker = CompactTaskTracker()
+    tracker.add_task("a", Task(type="exec", arguments="", dependencies=("x",)))
+    with pytest.raises(KeyError):
+        tracker.prepare_topo_sorter()
+
+    tracker = CompactTaskTracker()
+    tracker.add_task("a", Task(type="exec", arguments="", dependencies=("b",)))
+    tracker.add_task("b", Task(type="exec", arguments="", dependencies=("a",)))
+    with pytest.raises(graphlib.CycleError):
+        tracker.prepare_topo_sorter()
+
+
+def test_compact_tracker_finds_every_name():
+    """Test that names survive the encoded name table as it grows, including
+    names that are not valid UTF-8, and that missing names are not found."""
+    names = [f"task{i}" for i in range(1000)] + ["", "t\u00e2che", "\ud800"]
+    tracker = CompactTaskTracker()
+    for name in names:
+        tracker.add_task(name, Task(type="exec", arguments=""))
+    with pytest.raises(ValueError):
+        tracker.add_task("task7", Task(type="exec", arguments=""))
+
+    assert list(tracker.tasks) == names
+    assert [tracker.ids[name] for name in names] == list(range(len(names)))
+    assert "task1000" not in tracker.tasks and None not in tracker.ids
+    with pytest.raises(KeyError):
+        tracker.status("task1000")
+
+
+def test_compact_tracker_done_requires_get_ready():
+    """Test that only tasks handed out by get_ready() can be marked done."""
+    tracker = CompactTaskTracker()
+    tracker.add_task("a", Task(type="exec", arguments=""))
+    tracker.add_task("b", Task(type="exec", arguments="", dependencies=("a",)))
+    tracker.prepare_topo_sorter()
+
+    with pytest.raises(ValueError):
+        tracker.done("b")
+    assert tracker.get_ready() == {"a"}
+    tracker.done("a")
+    with pytest.raises(ValueError):
+        tracker.done("a")
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_runs_compact_tracker():
+    """Test that a run on the compact tracker executes and skips tasks."""
+    tracker = CompactTaskTracker()
+    tracker.add_task("ok", Task(type="exec", arguments="true"))
+    tracker.add_task("bad", Task(type="eval", arguments="1 / 0"))
+    tracker.add_task(
+        "next", Task(type="exec", arguments="true", dependencies=("bad",))
+    )
+    tracker.prepare_topo_sorter()
+
+    await run_tasks(tracker)
+
+    assert tracker.status("ok") == TaskStatus.OK
+    assert tracker.status("bad") == TaskStatus.FAILED
+    assert tracker.status("next") == TaskStatus.SKIPPED
+    assert not tracker.is_active()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import socket
+import time
+import pytest
+from scheduler import daemon as daemon_module
+from scheduler.daemon import SchedulerDaemon
+from scheduler.protocol import open_connection, receive, send
+from scheduler.submit import SubmissionError, submit
+
+
+def chain(length: int, arguments: str = "pass"):
+    return {"tasks": [
+        {"name": f"task{i}", "type": "eval", "arguments": arguments,
+         "dependencies": [f"task{i - 1}"] if i else []}
+        for i in range(length)
+    ]}
+
+
+@pytest.mark.asyncio
+async def test_graphs_run_at_once_with_shared_pools(tmp_path):
+    """Test that submitted graphs run concurrently on the executor of the
+    daemon, with their status changes streamed back."""
+    address = f"unix:{tmp_path / 'daemon.sock'}"
+    input_file = tmp_path / "input.json"
+    input_file.write_text(json.dumps({"tasks": [
+        {"name": "sleep", "type": "exec", "arguments": "sleep 0.3"},
+        {"name": "bad", "type": "eval", "arguments": "1 / 0",
+         "dependencies": ["sleep"]},
+        {"name": "after", "type": "eval", "arguments": "pass",
+         "dependencies": ["bad"]},
+    ]}))
+    statuses = []
+
+    async with SchedulerDaemon(address) as daemon:
+        start = time.perf_counter()
+        first, second = await asyncio.gather(
+            submit(address, str(input_file),
+                   on_status=lambda name, status: statuses.append(
+                       (name, status))),
+            submit(address, document={"tasks": [
+                {"name": "sleep", "type": "exec", "arguments": "sleep 0.3"},
+            ]}))
+        elapsed = time.perf_counter() - start
+        assert not daemon.graphs
+
+    assert elapsed < 0.55
+    assert not first["ok"]
+    assert first["counts"] == {"OK": 1, "FAILED": 1, "SKIPPED": 1}
+    assert ("sleep", "RUNNING") in statuses
+    assert statuses[-1] == ("after", "SKIPPED")
+    assert second["ok"] and second["counts"] == {"OK": 1}
+
+
+@pytest.mark.asyncio
+async def test_invalid_submissions_are_rejected(tmp_path):
+    """Test that an invalid graph or option is reported to the client and
+    does not stop the daemon."""
+    address = f"unix:{tmp_path / 'daemon.sock'}"
+
+    async with SchedulerDaemon(address, schema_path="assignment/schema.json"):
+        with pytest.raises(SubmissionError, match="Unknown options"):
+            await submit(address, document=chain(2), options={"x": 1})
+        with pytest.raises(SubmissionError, match="cycle"):
+            await submit(address, document={"tasks": [
+                {"name": "a", "type": "eval", "arguments": "pass",
+                 "dependencies": ["a"]}]})
+        with pytest.raises(SubmissionError):
+            await submit(address, document={"tasks": [{"name": "a"}]})
+        done = await submit(address, document=chain(50),
+                            options={"max_concurrency": 1})
+
+    assert done["counts"] == {"OK": 50}
+
+
+@pytest.mark.asyncio
+async def test_disconnected_client_stops_its_graph(tmp_path):
+    """Test that the graph of a client that goes away is cancelled."""
+    address = f"unix:{tmp_path / 'daemon.sock'}"
+
+    async with SchedulerDaemon(address) as daemon:
+        reader, writer = await open_connection(address)
+        send(writer, {"type": "submit", "document": {"tasks": [
+            {"name": "slow", "type": "exec", "arguments": "sleep 10"}]}})
+        assert (await receive(reader))["type"] == "accepted"
+        assert (await receive(reader))["status"] == "RUNNING"
+        writer.close()
+
+        start = time.perf_counter()
+        while daemon.graphs:
+            await asyncio.sleep(0.01)
+        assert time.perf_counter() - start < 5
+
+
+@pytest.mark.asyncio
+async def test_tcp_submissions_need_the_token(tmp_path):
+    """Test that TCP requires a token, that submissions without it are
+    rejected, and that the Unix socket is private to the user."""
+    with pytest.raises(ValueError, match="token is required"):
+        SchedulerDaemon("127.0.0.1:0")
+
+    async with SchedulerDaemon("127.0.0.1:0", token="secret") as daemon:
+        port = daemon.server.sockets[0].getsockname()[1]
+        address = f"127.0.0.1:{port}"
+        with pytest.raises(SubmissionError, match="Invalid token"):
+            await submit(address, document=chain(1))
+        with pytest.raises(SubmissionError, match="Invalid token"):
+            await submit(address, document=chain(1), token="guess")
+        done = await submit(address, document=chain(1), token="secret")
+    assert done["ok"]
+
+    socket_path = tmp_path / "daemon.sock"
+    async with SchedulerDaemon(f"unix:{socket_path}"):
+        assert socket_path.stat().st_mode & 0o777 == 0o600
+
+
+@pytest.mark.asyncio
+async def test_stalled_client_misses_statuses(tmp_path, monkeypatch):
+    """Test that a client that stops reading makes the daemon drop status
+    messages beyond the backlog, and that the final message counts them."""
+    monkeypatch.setattr(daemon_module, "STATUS_BACKLOG", 10)
+    socket_path = str(tmp_path / "daemon.sock")
+    input_file = tmp_path / "input.json"
+    input_file.write_text(json.dumps(chain(5000)))
+
+    async with SchedulerDaemon(f"unix:{socket_path}") as daemon:
+        # A plain socket, so nothing reads the messages until the end
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(socket_path)
+        client.sendall(json.dumps({"type": "submit",
+                                   "input": str(input_file)}).encode()
+                       + b"\n")
+        while not daemon.graphs:
+            await asyncio.sleep(0.01)
+        while daemon.graphs:
+            await asyncio.sleep(0.01)
+
+        reader, writer = await asyncio.open_unix_connection(sock=client)
+        statuses = 0
+        while (message := await receive(reader))["type"] != "done":
+            statuses += message["type"] == "status"
+        writer.close()
+
+    assert message["counts"] == {"OK": 5000}
+    assert message["dropped"] > 0
+    assert statuses + message["dropped"] == 2 * 5000
@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from scheduler.coordinator import RemoteExecutor
+from scheduler.models import Task, TaskStatus
+from scheduler.protocol import open_connection, parse_address, receive, send
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+from scheduler.worker import run_worker
+
+
+def build_graph(count: int, arguments: str) -> TaskTracker:
+    task_tracker = TaskTracker()
+    task_tracker.add_task("root", Task(type="eval", arguments="pass"))
+    for i in range(count):
+        task_tracker.add_task(
+            f"task{i}",
+            Task(type="exec", arguments=arguments, dependencies=("root",)))
+    task_tracker.prepare_topo_sorter()
+    return task_tracker
+
+
+def test_parse_address():
+    """Test that TCP and Unix socket addresses are told apart."""
+    assert parse_address("localhost:7000") == ("localhost", 7000)
+    assert parse_address("unix:/tmp/s.sock") == (None, "/tmp/s.sock")
+    with pytest.raises(ValueError):
+        parse_address("localhost")
+
+
+@pytest.mark.asyncio
+async def test_tasks_run_on_all_workers(tmp_path):
+    """Test that a graph runs to completion on two workers, and that both
+    of them execute tasks."""
+    address = f"unix:{tmp_path / 'coordinator.sock'}"
+    task_tracker = build_graph(8, "sleep 0.1")
+    task_tracker.add_task("failing", Task(type="eval", arguments="1 / 0"))
+    task_tracker.prepare_topo_sorter()
+
+    async with RemoteExecutor(address) as executor:
+        workers = [asyncio.create_task(run_worker(address, 2, name=name))
+                   for name in ("a", "b")]
+        await run_tasks(task_tracker, executor=executor)
+        completed = {worker.name: worker.completed
+                     for worker in executor.workers}
+    await asyncio.gather(*workers)
+
+    assert task_tracker.tasks["failing"].status == TaskStatus.FAILED
+    del task_tracker.tasks["failing"]
+    assert all(task.status == TaskStatus.OK
+               for task in task_tracker.tasks.values())
+    assert completed["a"] > 0 and completed["b"] > 0
+
+
+@pytest.mark.asyncio
+async def test_tasks_of_a_lost_worker_are_reassigned(tmp_path):
+    """Test that the tasks of a worker that disconnects mid-task are run
+    again on the remaining worker."""
+    address = f"unix:{tmp_path / 'coordinator.sock'}"
+    task_tracker = build_graph(4, "sleep 0.2")
+
+    async with RemoteExecutor(address) as executor:
+        lost = asyncio.create_task(run_worker(address, 4, name="lost"))
+        while not executor.workers:
+            await asyncio.sleep(0.01)
+        run = asyncio.create_task(run_tasks(task_tracker, executor=executor))
+        await asyncio.sleep(0.1)
+        lost.cancel()
+        survivor = asyncio.create_task(run_worker(address, 4, name="ok"))
+        await run
+        completed = {worker.name: worker.completed
+                     for worker in executor.workers}
+    await asyncio.gather(lost, survivor, return_exceptions=True)
+
+    assert all(task.status == TaskStatus.OK
+               for task in task_tracker.tasks.values())
+    assert completed == {"ok": 4}
+
+
+@pytest.mark.asyncio
+async def test_silent_worker_is_dropped(tmp_path):
+    """Test that a worker which stops sending heartbeats loses its tasks
+    to a live worker."""
+    address = f"unix:{tmp_path / 'coordinator.sock'}"
+    task_tracker = build_graph(2, "true")
+
+    async with RemoteExecutor(address, heartbeat_timeout=0.4) as executor:
+        # A worker that accepts tasks but never answers
+        _, writer = await open_connection(address)
+        send(writer, {"type": "hello", "name": "silent", "capacity": 8})
+        while not executor.workers:
+            await asyncio.sleep(0.01)
+        run = asyncio.create_task(run_tasks(task_tracker, executor=executor))
+        await asyncio.sleep(0.1)
+        worker = asyncio.create_task(
+            run_worker(address, 2, heartbeat_interval=0.1, name="live"))
+        await asyncio.wait_for(run, 5)
+        names = [worker.name for worker in executor.workers]
+    await worker
+    writer.close()
+
+    assert names == ["live"]
+    assert all(task.status == TaskStatus.OK
+               for task in task_tracker.tasks.values())
+
+
+@pytest.mark.asyncio
+async def test_workers_need_the_token_and_a_valid_hello():
+    """Test that TCP requires a token, and that workers with a wrong token
+    or a malformed hello are rejected without affecting the others."""
+    with pytest.raises(ValueError, match="token is required"):
+        RemoteExecutor("127.0.0.1:0")
+
+    async with RemoteExecutor("127.0.0.1:0", token="secret") as executor:
+        port = executor.server.sockets[0].getsockname()[1]
+        address = f"127.0.0.1:{port}"
+        await asyncio.wait_for(run_worker(address, 2, name="guess",
+                                          token="guess"), 5)
+        for hello in ({"type": "hello", "name": "x", "token": "secret"},
+                      {"type": "hello", "name": "x", "capacity": "2",
+                       "token": "secret"},
+                      {"type": "hello", "name": "x", "capacity": 0,
+                       "token": "secret"},
+                      ["hello"], "not json"):
+            reader, writer = await open_connection(address)
+            if hello == "not json":
+                writer.write(b"not json\n")
+            else:
+                send(writer, hello)
+            reply = await receive(reader)
+            assert reply["type"] == "error"
+            assert await receive(reader) is None
+            writer.close()
+        assert not executor.workers
+
+        worker = asyncio.create_task(run_worker(address, 2, name="ok",
+                                                token="secret"))
+        result = await executor.execute(Task(type="eval", arguments="pass"))
+        assert [worker.name for worker in executor.workers] == ["ok"]
+    await worker
+    assert result.exception is None
@@ -1,6 +1,16 @@
+import asyncio
+import logging
+import threading
+import time
 import pytest
-from scheduler.executor import execute_task
-from scheduler.models import Task
+from scheduler.executor import (
+    TaskExecutor,
+    compile_cache_info,
+    create_eval_executor,
+    execute_task,
+    parse_simple_command,
+)
+from scheduler.models import RunnerConfig, Task
 
 
 @pytest.mark.asyncio
@@ -70,3 +80,167 @@ async def test_execute_eval_exception():
     assert result.stdout == ""
     assert result.stderr == ""
     assert isinstance(result.exception, ValueError)
+
+
+@pytest.mark.asyncio
+async def test_execute_eval_batch():
+    """Test that a batch of 'eval' tasks keeps the output and errors of
+    every task apart, and stops once its time budget is used up."""
+    tasks = [Task(type="eval", arguments="print('one')"),
+             Task(type="eval", arguments="1 / 0"),
+             Task(type="eval", arguments="import time; time.sleep(0.05)"),
+             Task(type="eval", arguments="print('four')")]
+    config = RunnerConfig(eval_batch_time=0.01)
+    async with TaskExecutor(config) as executor:
+        results = await executor.execute_batch(tasks)
+
+    assert len(results) == 3
+    assert (results[0].return_code, results[0].stdout) == (0, "one")
+    assert isinstance(results[1].exception, ZeroDivisionError)
+    assert results[1].return_code is None
+    assert results[2].return_code == 0
+    assert results[2].duration >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_eval_snippets_are_compiled_once():
+    """Test that repeated 'eval' snippets hit the compile cache."""
+    code = "x = 'compile cache test'"
+    before = compile_cache_info()
+    for _ in range(3):
+        result = await execute_task(Task(type="eval", arguments=code))
+        assert result.return_code == 0
+    after = compile_cache_info()
+    assert after.misses - before.misses == 1
+    assert after.hits - before.hits == 2
+
+
+@pytest.mark.asyncio
+async def test_execute_exec_output_is_bounded(tmp_path):
+    """Test that only the head and tail of a large output are kept in memory
+    while the full output is spilled to a file."""
+    task = Task(type="exec", arguments="seq 1 20000")
+    config = RunnerConfig(output_limit=1000, output_dir=str(tmp_path))
+    result = await execute_task(task, name="big", config=config)
+
+    assert result.return_code == 0
+    assert result.stdout.startswith("1\n2\n3\n")
+    assert result.stdout.endswith("19999\n20000")
+    assert "bytes truncated" in result.stdout
+    assert len(result.stdout) < 1100
+    spilled = (tmp_path / "big.stdout").read_text().split()
+    assert spilled == [str(i) for i in range(1, 20001)]
+
+
+@pytest.mark.asyncio
+async def test_spill_files_of_similar_names_are_distinct(tmp_path):
+    """Test that names differing only by a path separator spill apart."""
+    config = RunnerConfig(output_dir=str(tmp_path))
+    for name in ("a/b", "a_b"):
+        task = Task(type="exec", arguments=f"echo {name}")
+        await execute_task(task, name=name, config=config)
+
+    spilled = sorted(path.read_text()
+                     for path in tmp_path.glob("*.stdout"))
+    assert spilled == ["a/b\n", "a_b\n"]
+    assert (tmp_path / "a_b.stdout").read_text() == "a_b\n"
+
+
+@pytest.mark.asyncio
+async def test_execute_exec_output_is_forwarded(caplog):
+    """Test that 'exec' output lines are logged as they arrive."""
+    caplog.set_level(logging.INFO)
+    task = Task(type="exec", arguments="echo one; echo two >&2")
+    result = await execute_task(task, name="lines")
+
+    assert result.streamed
+    assert result.stdout == "one"
+    assert result.stderr == "two"
+    assert "Output lines: one" in caplog.text
+    assert "Stderr lines: two" in caplog.text
+
+
+def test_parse_simple_command():
+    """Test that only commands without shell features are split."""
+    assert parse_simple_command("echo 'hello world'") == [
+        "echo", "hello world"]
+    assert parse_simple_command("touch a b") == ["touch", "a", "b"]
+    assert parse_simple_command("echo a | cat") is None
+    assert parse_simple_command("echo $HOME") is None
+    assert parse_simple_command("ls *.py") is None
+    assert parse_simple_command("FOO=1 env") is None
+    assert parse_simple_command("exit 1") is None
+    assert parse_simple_command("no-such-program-here") is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("spawner", [False, True])
+async def test_execute_exec_direct_mode(spawner):
+    """Test that 'exec' tasks behave the same without a shell and through
+    the spawner helper."""
+    config = RunnerConfig(exec_mode="direct", exec_spawner=spawner)
+    async with TaskExecutor(config) as executor:
+        result = await executor.execute(
+            Task(type="exec", arguments="echo 'hello world'"))
+        assert result.return_code == 0
+        assert result.stdout == "hello world"
+
+        result = await executor.execute(
+            Task(type="exec", arguments="echo out; echo err >&2; exit 3"))
+        assert result.return_code == 3
+        assert result.stdout == "out"
+        assert result.stderr == "err"
+
+
+@pytest.mark.asyncio
+async def test_execute_exec_timeout_kills_process_group():
+    """Test that an 'exec' task that runs out of time is stopped together
+    with the children that keep its pipes open."""
+    task = Task(type="exec", arguments="sleep 10 & sleep 10", timeout=0.2)
+    start = time.perf_counter()
+    result = await execute_task(task)
+
+    assert time.perf_counter() - start < 5
+    assert result.timed_out
+    assert result.return_code != 0
+
+
+@pytest.mark.asyncio
+async def test_execute_eval_timeout_abandons_thread():
+    """Test that an 'eval' snippet that runs out of time in thread mode is
+    marked timed out right away, while its thread is left to finish."""
+    task = Task(type="eval", arguments="import time; time.sleep(0.5)",
+                timeout=0.1)
+    start = time.perf_counter()
+    result = await execute_task(task)
+    assert time.perf_counter() - start < 0.4
+    assert result.timed_out
+    assert result.exception is None
+    assert any(thread.name == "eval-timeout"
+               for thread in threading.enumerate())
+
+    for _ in range(50):
+        if not any(thread.name == "eval-timeout"
+                   for thread in threading.enumerate()):
+            break
+        await asyncio.sleep(0.1)
+    else:
+        pytest.fail("The abandoned thread did not finish")
+
+
+@pytest.mark.asyncio
+async def test_execute_eval_timeout_stops_process():
+    """Test that a runaway 'eval' snippet is stopped in process mode."""
+    task = Task(type="eval", arguments="while True: pass", timeout=0.2)
+    eval_executor = create_eval_executor("process", 1)
+    try:
+        start = time.perf_counter()
+        result = await execute_task(task, eval_executor)
+        assert time.perf_counter() - start < 5
+        assert result.timed_out
+
+        task = Task(type="eval", arguments="print('next')", timeout=5)
+        result = await execute_task(task, eval_executor)
+        assert result.stdout == "next"
+    finally:
+        eval_executor.shutdown()
@@ -0,0 +1,22 @@
+import pytest
+from pathlib import Path
+from benchmarks.generators import SHAPES, write_input
+from scheduler.loader import load_tasks
+from scheduler.task_tracker import TaskTracker
+
+ASSIGNMENT_DIR = Path(__file__).parent.parent / "assignment"
+
+
+@pytest.mark.parametrize("shape", sorted(SHAPES))
+@pytest.mark.parametrize("size", [1, 2, 50])
+def test_generated_graphs_are_valid(tmp_path, shape, size):
+    """Test that every benchmark graph is a valid input of the given
+    size."""
+    input_file = tmp_path / "input.json"
+    write_input(input_file, SHAPES[shape](size, "exec"))
+
+    task_tracker = TaskTracker()
+    load_tasks(task_tracker, input_file, ASSIGNMENT_DIR / "schema.json")
+    task_tracker.prepare_topo_sorter()
+
+    assert len(task_tracker.tasks) == size
@@ -0,0 +1,149 @@
+import json
+import os
+import time
+from graphlib import CycleError
+import pytest
+from pathlib import Path
+from scheduler import loader
+from scheduler.compact_tracker import CompactTaskTracker
+from scheduler.graph_cache import cache_key, cache_path
+from scheduler.loader import load_tasks
+from scheduler.models import Task, TaskStatus
+from scheduler.task_tracker import TaskTracker
+
+SCHEMA = str(Path(__file__).parent.parent / "assignment" / "schema.json")
+
+TASKS = [
+    {"name": "a", "type": "exec", "arguments": "true", "dependencies": [],
+     "duration": 2},
+    {"name": "b", "type": "eval", "arguments": "x = 1",
+     "dependencies": ["a", "a"], "timeout": 5},
+    {"name": "c", "type": "exec", "arguments": "true",
+     "dependencies": ["a", "b"], "cpus": 2, "memory_mb": 100},
+    {"name": "d", "type": "exec", "arguments": "cat", "dependencies": ["c"],
+     "stdin_from": "c"},
+]
+
+
+def write_input(path, tasks, **settings):
+    with open(path, "w") as f:
+        json.dump({"tasks": tasks, **settings}, f)
+    return str(path)
+
+
+def describe(tracker):
+    """Return the graph of a prepared tracker and its ready/done order."""
+    tasks = {name: (task.type, task.arguments, set(task.dependencies),
+                    task.duration, task.timeout, task.cpus, task.memory_mb,
+                    task.stdin_from)
+             for name, task in tracker.tasks.items()}
+    steps = []
+    while tracker.is_active():
+        ready = tracker.get_ready()
+        steps.append(ready)
+        for name in ready:
+            tracker.set_status(name, TaskStatus.OK)
+            tracker.done(name)
+    return tasks, steps
+
+
+@pytest.mark.parametrize("writer", [TaskTracker, CompactTaskTracker])
+@pytest.mark.parametrize("reader", [TaskTracker, CompactTaskTracker])
+def test_cached_graph_matches_loaded_graph(tmp_path, monkeypatch, writer,
+                                           reader):
+    """Test that a cache hit skips the loader and gives the same graph,
+    whichever tracker wrote it."""
+    path = write_input(tmp_path / "input.json", TASKS, default_timeout=7)
+    cache_dir = str(tmp_path / "cache")
+    expected = reader()
+    load_tasks(expected, path, SCHEMA)
+    expected.prepare_topo_sorter()
+    load_tasks(writer(), path, SCHEMA, cache_dir=cache_dir)
+
+    def fail(*args):
+        raise AssertionError("the input was read")
+
+    monkeypatch.setattr(loader, "read_tasks", fail)
+    tracker = reader()
+    settings = load_tasks(tracker, path, SCHEMA, cache_dir=cache_dir)
+    tracker.prepare_topo_sorter()
+
+    assert settings.default_timeout == 7
+    assert describe(tracker) == describe(expected)
+
+
+def test_changed_input_invalidates_the_cache(tmp_path):
+    """Test that the cache is keyed by the contents of the files and that
+    a selection can follow a hit."""
+    path = write_input(tmp_path / "input.json", TASKS)
+    cache_dir = str(tmp_path / "cache")
+    load_tasks(CompactTaskTracker(), path, SCHEMA, cache_dir=cache_dir)
+    key = cache_key(path, SCHEMA)
+    assert os.path.exists(cache_path(cache_dir, key))
+    assert cache_key(path) != key
+
+    write_input(path, TASKS[:2])
+    assert cache_key(path, SCHEMA) != key
+    tracker = CompactTaskTracker()
+    load_tasks(tracker, path, SCHEMA, cache_dir=cache_dir)
+    tracker.select(targets=["b"])
+    tracker.prepare_topo_sorter()
+    assert describe(tracker)[1] == [{"a"}, {"b"}]
+
+
+def test_invalid_graphs_are_not_cached(tmp_path):
+    """Test that cycles are reported when caching and nothing is written,
+    and that a damaged cache file is ignored."""
+    cycle = [dict(TASKS[0], dependencies=["b"]), TASKS[1]]
+    path = write_input(tmp_path / "cycle.json", cycle)
+    cache_dir = str(tmp_path / "cache")
+    with pytest.raises(CycleError):
+        load_tasks(TaskTracker(), path, SCHEMA, cache_dir=cache_dir)
+    assert not os.path.exists(cache_dir)
+
+    path = write_input(tmp_path / "input.json", TASKS)
+    os.makedirs(cache_dir)
+    with open(cache_path(cache_dir, cache_key(path, SCHEMA)), "wb") as f:
+        f.write(b"ISGRAPH1 and then some garbage")
+    tracker = TaskTracker()
+    load_tasks(tracker, path, SCHEMA, cache_dir=cache_dir)
+    assert list(tracker.tasks) == ["a", "b", "c", "d"]
+
+
+def test_least_recently_used_graphs_are_pruned(tmp_path, monkeypatch):
+    """Test that storing a graph removes the least recently used ones and
+    stale temporary files once the cache is too large, and that a hit on a
+    TaskTracker constructs its tasks without validating them."""
+    cache_dir = str(tmp_path / "cache")
+    paths = [write_input(tmp_path / f"input{i}.json", TASKS,
+                         default_timeout=i + 1)
+             for i in range(3)]
+    for path in paths[:2]:
+        load_tasks(TaskTracker(), path, SCHEMA, cache_dir=cache_dir)
+    files = [cache_path(cache_dir, cache_key(path, SCHEMA))
+             for path in paths]
+    now = time.time()
+    os.utime(files[0], (now - 100, now - 100))
+    os.utime(files[1], (now - 50, now - 50))
+    stale = os.path.join(cache_dir, "leftover.tmp")
+    open(stale, "w").close()
+    os.utime(stale, (now - 7200, now - 7200))
+
+    def validate(*args, **kwargs):
+        raise AssertionError("validated a cached task")
+
+    monkeypatch.setattr(Task, "model_validate", validate)
+    tracker = TaskTracker()
+    load_tasks(tracker, paths[0], SCHEMA, cache_dir=cache_dir)
+    assert tracker.tasks["a"].duration == 2.0
+    monkeypatch.undo()
+
+    size = sum(os.path.getsize(path) for path in files[:2])
+    load_tasks(TaskTracker(), paths[2], SCHEMA, cache_dir=cache_dir,
+               cache_max_bytes=size)
+    assert [os.path.exists(path) for path in files] == [True, False, True]
+    assert not os.path.exists(stale)
+
+    load_tasks(TaskTracker(), paths[1], SCHEMA, cache_dir=cache_dir,
+               cache_max_bytes=1)
+    assert sorted(os.listdir(cache_dir)) == [os.path.basename(files[1])]
@@ -0,0 +1,12 @@
+from scheduler.history import load_history, update_history
+
+
+def test_history_is_smoothed(tmp_path):
+    """Test that measured durations are merged into the history file."""
+    path = str(tmp_path / "history.json")
+    assert load_history(path) == {}
+
+    update_history(path, {"task1": 4.0})
+    update_history(path, {"task1": 2.0, "task2": 1.0})
+
+    assert load_history(path) == {"task1": 3.0, "task2": 1.0}
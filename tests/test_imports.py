@@ -0,0 +1,24 @@
+import json
+import subprocess
+import sys
+import pytest
+
+
+def imported_modules(module: str) -> set:
+    """Import a module in a fresh interpreter and return the names of all
+    loaded modules."""
+    process = subprocess.run(
+        [sys.executable, "-c",
+         f"import json, sys, {module}; print(json.dumps(list(sys.modules)))"],
+        capture_output=True, text=True, check=True)
+    return set(json.loads(process.stdout))
+
+
+@pytest.mark.parametrize("module, heavy", [
+    ("scheduler.runner", ["jsonschema", "tabulate", "scheduler.coordinator"]),
+    ("scheduler.submit", ["pydantic", "jsonschema"]),
+])
+def test_heavy_dependencies_are_imported_lazily(module, heavy):
+    """Test that the command line entry points do not import dependencies
+    that only some code paths need."""
+    assert not set(heavy) & imported_modules(module)
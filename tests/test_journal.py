@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from scheduler import journal as journal_module
+from scheduler.journal import Journal, read_journal
+from scheduler.models import Task, TaskStatus
+from scheduler.report import Reporter
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+
+def build_task_tracker(tmp_path) -> TaskTracker:
+    task_tracker = TaskTracker()
+    task_tracker.add_task(
+        "task1", Task(type="exec", arguments=f"echo 1 >> {tmp_path}/runs")
+    )
+    task_tracker.add_task(
+        "task2",
+        Task(type="exec", arguments=f"test -e {tmp_path}/flag",
+             dependencies=("task1",)),
+    )
+    task_tracker.add_task(
+        "task3", Task(type="exec", arguments="true", dependencies=("task2",))
+    )
+    return task_tracker
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_succeeded_tasks(tmp_path):
+    """Test that resuming from a journal only runs the tasks that did not
+    succeed in the interrupted run."""
+    journal_path = str(tmp_path / "journal")
+
+    task_tracker = build_task_tracker(tmp_path)
+    task_tracker.prepare_topo_sorter()
+    with Journal(journal_path) as journal:
+        task_tracker.status_listeners.append(journal.record)
+        await run_tasks(task_tracker)
+
+    assert read_journal(journal_path) == {
+        "task1": TaskStatus.OK,
+        "task2": TaskStatus.FAILED,
+        "task3": TaskStatus.SKIPPED,
+    }
+
+    (tmp_path / "flag").touch()
+    task_tracker = build_task_tracker(tmp_path)
+    restored = task_tracker.restore(read_journal(journal_path))
+    task_tracker.prepare_topo_sorter()
+    reporter = Reporter(len(task_tracker.tasks), restored=restored)
+    task_tracker.status_listeners.append(reporter.record)
+    await run_tasks(task_tracker)
+
+    assert (tmp_path / "runs").read_text() == "1\n"
+    assert restored == 1
+    assert reporter.summary().splitlines()[0] == "3 tasks: OK 2, RESTORED 1"
+    assert all(task.status == TaskStatus.OK
+               for task in task_tracker.tasks.values())
+
+
+def test_truncated_journal_entry_is_ignored(tmp_path):
+    """Test that a partially written last entry and malformed entries do
+    not break resuming."""
+    journal_path = tmp_path / "journal"
+    with Journal(str(journal_path)) as journal:
+        journal.record("task1", TaskStatus.RUNNING)
+        journal.record("task1", TaskStatus.OK)
+    with open(journal_path, "a") as f:
+        f.write('{"time": 1, "task": "task2"}\n')
+        f.write('{"time": 1, "task": "task3", "status": "DONE"}\n')
+        f.write('{"time": 1, "task": ["task4"], "status": "OK"}\n')
+        f.write('[1, 2]\n')
+        f.write('{"time": 1, "task": "tas')
+
+    assert read_journal(str(journal_path)) == {"task1": TaskStatus.OK}
+
+
+@pytest.mark.asyncio
+async def test_idle_journal_is_synced(tmp_path, monkeypatch):
+    """Test that changes recorded before an idle period are fsynced once the
+    interval expires, without waiting for the next change."""
+    synced = []
+    monkeypatch.setattr(journal_module.os, "fsync", synced.append)
+
+    with Journal(str(tmp_path / "journal"), fsync_interval=0.1) as journal:
+        journal.record("task1", TaskStatus.RUNNING)
+        journal.record("task2", TaskStatus.RUNNING)
+        assert not synced
+        await asyncio.sleep(0.3)
+        assert len(synced) == 1 and journal.unsynced == 0
+    # Nothing is left to sync on close
+    assert len(synced) == 1
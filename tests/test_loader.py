@@ -1,16 +1,22 @@
 from graphlib import CycleError
 import json
 import pytest
+from pathlib import Path
 from jsonschema import ValidationError as JsonSchemaValidationError
 from pydantic import ValidationError as PydanticValidationError
+from scheduler import loader
 from scheduler.loader import (
     load_and_validate_data,
+    load_tasks,
     populate_task_tracker,
+    validate_eval_snippets,
     validate_unique_task_names,
 )
 from scheduler.models import InputTaskModel
 from scheduler.task_tracker import TaskTracker
 
+ASSIGNMENT_DIR = Path(__file__).parent.parent / "assignment"
+
 
 def create_schema_file(tmp_path, schema):
     schema_file = tmp_path / "schema.json"
@@ -147,3 +153,211 @@ def test_duplicate_task_name_fails():
 
     with pytest.raises(ValueError):
         validate_unique_task_names(task_defs)
+
+
+def test_eval_syntax_error_fails_at_load_time():
+    """
+    Test that a SyntaxError is raised when an 'eval' task contains invalid
+    code, before any task runs.
+    """
+    task_defs = [
+        InputTaskModel(name="task1", type="eval", arguments="print('ok')"),
+        InputTaskModel(name="task2", type="eval", arguments="def broken("),
+    ]
+
+    with pytest.raises(SyntaxError, match="task2"):
+        validate_eval_snippets(task_defs)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024 * 1024])
+def test_streaming_load_matches_full_load(monkeypatch, chunk_size):
+    """
+    Test that streaming the tasks out of the input file in chunks of any
+    size gives the same tasks as loading the whole document.
+    """
+    monkeypatch.setattr(loader, "_CHUNK_SIZE", chunk_size)
+    input_file = ASSIGNMENT_DIR / "input1.json"
+    schema_file = ASSIGNMENT_DIR / "schema.json"
+
+    task_tracker = TaskTracker()
+    load_tasks(task_tracker, input_file, schema_file)
+
+    expected = load_and_validate_data(input_file, schema_file).tasks
+    assert list(task_tracker.tasks) == [task.name for task in expected]
+    for task in expected:
+        loaded = task_tracker.tasks[task.name]
+        assert loaded.arguments == task.arguments
+        assert loaded.dependencies == task.dependencies
+
+
+def test_streaming_load_validates_each_task(tmp_path):
+    """
+    Test that schema errors, duplicate names and a missing tasks array are
+    detected by the streaming loader.
+    """
+    input_file = tmp_path / "input.json"
+    schema_file = ASSIGNMENT_DIR / "schema.json"
+
+    input_file.write_text('{"tasks": [{"name": "t", "type": "exec"}]}')
+    with pytest.raises(JsonSchemaValidationError):
+        load_tasks(TaskTracker(), input_file, schema_file)
+
+    input_file.write_text(json.dumps({"tasks": [
+        {"name": "t", "type": "exec", "arguments": "true"},
+        {"name": "t", "type": "exec", "arguments": "true"},
+    ]}))
+    with pytest.raises(ValueError, match="Duplicate"):
+        load_tasks(TaskTracker(), input_file)
+
+    input_file.write_text('{"other": []}')
+    with pytest.raises(JsonSchemaValidationError):
+        load_tasks(TaskTracker(), input_file, schema_file)
+    with pytest.raises(ValueError, match="No tasks"):
+        load_tasks(TaskTracker(), input_file)
+
+
+def test_timeouts_are_loaded(tmp_path):
+    """
+    Test that per-task timeouts are loaded into the tracker and that the
+    default timeout of the input is returned.
+    """
+    input_file = tmp_path / "input.json"
+    input_file.write_text(json.dumps({"default_timeout": 30, "tasks": [
+        {"name": "a", "type": "exec", "arguments": "true", "timeout": 1.5},
+        {"name": "b", "type": "exec", "arguments": "true"},
+    ]}))
+    task_tracker = TaskTracker()
+    settings = load_tasks(task_tracker, input_file,
+                          ASSIGNMENT_DIR / "schema.json")
+
+    assert settings.default_timeout == 30
+    assert task_tracker.timeout("a") == 1.5
+    assert task_tracker.timeout("b") is None
+
+    input_file.write_text(json.dumps({"tasks": [
+        {"name": "a", "type": "exec", "arguments": "true", "timeout": 0},
+    ]}))
+    with pytest.raises(JsonSchemaValidationError):
+        load_tasks(TaskTracker(), input_file, ASSIGNMENT_DIR / "schema.json")
+
+
+def test_trusted_load_matches_full_load(tmp_path):
+    """
+    Test that the trusted fast path builds the same tasks and still rejects
+    duplicate names and invalid snippets.
+    """
+    input_file = tmp_path / "input.json"
+    records = [
+        {"name": "a", "type": "eval", "arguments": "x = 1", "timeout": 2},
+        {"name": "b", "type": "exec", "arguments": "true",
+         "dependencies": ["a"], "duration": 0.5},
+    ]
+    input_file.write_text(json.dumps({"tasks": records}))
+    full, trusted = TaskTracker(), TaskTracker()
+    load_tasks(full, input_file)
+    load_tasks(trusted, input_file, trusted=True)
+    assert trusted.tasks == full.tasks
+
+    input_file.write_text(json.dumps({"tasks": records + records[:1]}))
+    with pytest.raises(ValueError, match="Duplicate"):
+        load_tasks(TaskTracker(), input_file, trusted=True)
+    input_file.write_text(json.dumps({"tasks": [
+        {"name": "a", "type": "eval", "arguments": "x ="}]}))
+    with pytest.raises(SyntaxError, match="eval task a"):
+        load_tasks(TaskTracker(), input_file, trusted=True)
+
+
+@pytest.mark.parametrize("field, value", [
+    ("type", "shell"),
+    ("arguments", 1),
+    ("dependencies", "a"),
+    ("dependencies", [1]),
+    ("duration", -1),
+    ("timeout", 0),
+    ("cpus", True),
+    ("memory_mb", "1"),
+    ("stdin_from", ["a"]),
+])
+def test_trusted_load_checks_the_fields(tmp_path, field, value):
+    """
+    Test that the trusted fast path, which builds the tasks without the
+    model, still rejects fields of the wrong type or out of bounds.
+    """
+    input_file = tmp_path / "input.json"
+    record = {"name": "a", "type": "exec", "arguments": "true"}
+    record[field] = value
+    input_file.write_text(json.dumps({"tasks": [record]}))
+    with pytest.raises(ValueError, match=f"Invalid task {field}"):
+        load_tasks(TaskTracker(), input_file, trusted=True)
+
+
+def test_records_are_validated_once(tmp_path, monkeypatch):
+    """
+    Test that a schema covering the input model makes the model validation
+    redundant, and that a looser schema still falls back to the model.
+    """
+    input_file = tmp_path / "input.json"
+    records = [
+        {"name": "a", "type": "eval", "arguments": "x = 1", "timeout": 2},
+        {"name": "b", "type": "exec", "arguments": "true",
+         "dependencies": ["a"], "duration": 1, "stdin_from": "a"},
+    ]
+    input_file.write_text(json.dumps({"tasks": records}))
+    expected = TaskTracker()
+    load_tasks(expected, input_file)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("validated twice")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(InputTaskModel, "model_validate", fail)
+        task_tracker = TaskTracker()
+        load_tasks(task_tracker, input_file, ASSIGNMENT_DIR / "schema.json")
+    assert task_tracker.tasks == expected.tasks
+
+    schema = json.loads((ASSIGNMENT_DIR / "schema.json").read_text())
+    del (schema["properties"]["tasks"]["items"]["properties"]["timeout"]
+         ["exclusiveMinimum"])
+    input_file.write_text(json.dumps({"tasks": [
+        {"name": "a", "type": "exec", "arguments": "true", "timeout": 0}]}))
+    with pytest.raises(PydanticValidationError):
+        load_tasks(TaskTracker(), input_file,
+                   create_schema_file(tmp_path, schema))
+
+
+@pytest.mark.parametrize("tasks, keywords, valid", [
+    (["a"], {"minItems": 1}, True),
+    ([], {"minItems": 1}, False),
+    (["a", "b"], {"maxItems": 1}, False),
+    (["a", "b"], {"uniqueItems": True}, True),
+    (["a", "b"], {"contains": {"properties": {"name": {"const": "b"}}}},
+     True),
+    (["a"], {"contains": {"properties": {"name": {"const": "b"}}}}, False),
+])
+def test_array_keywords_are_checked_on_the_records(tmp_path, tasks,
+                                                   keywords, valid):
+    """
+    Test that the keywords of the tasks array are checked on the streamed
+    records like on the whole document, and that schemas the loader cannot
+    split still see the records.
+    """
+    input_file = tmp_path / "input.json"
+    input_file.write_text(json.dumps({"tasks": [
+        {"name": name, "type": "exec", "arguments": "true"}
+        for name in tasks]}))
+    schema = json.loads((ASSIGNMENT_DIR / "schema.json").read_text())
+    schema["properties"]["tasks"].update(keywords)
+    split = create_schema_file(tmp_path, schema)
+    whole = tmp_path / "whole.json"
+    whole.write_text(json.dumps({"$schema": schema["$schema"],
+                                 "allOf": [schema]}))
+
+    for schema_file in (split, whole):
+        if valid:
+            load_and_validate_data(input_file, schema_file)
+            load_tasks(TaskTracker(), input_file, schema_file)
+            continue
+        with pytest.raises(JsonSchemaValidationError):
+            load_and_validate_data(input_file, schema_file)
+        with pytest.raises(JsonSchemaValidationError):
+            load_tasks(TaskTracker(), input_file, schema_file)
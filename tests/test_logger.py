@@ -0,0 +1,64 @@
+import io
+import json
+import logging
+from scheduler import logger as scheduler_logger
+from scheduler.logger import JsonFormatter, configure_logging, get_logger
+
+
+def test_json_formatter_includes_task_fields():
+    """Test that the structured fields of a record become JSON fields."""
+    record = logging.LogRecord("scheduler.runner", logging.INFO, __file__,
+                               1, "Ended:   %s", ("task1",), None)
+    record.task = "task1"
+    record.status = "OK"
+    record.duration = 0.5
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "Ended:   task1"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "scheduler.runner"
+    assert (entry["task"], entry["status"], entry["duration"]) == \
+        ("task1", "OK", 0.5)
+
+
+def test_queued_records_are_written_in_the_background():
+    """Test that records go through the queue and are all written out when
+    switching back to synchronous logging."""
+    stream = io.StringIO()
+    previous = scheduler_logger._output.setStream(stream)
+    try:
+        configure_logging("json")
+        logger = get_logger("scheduler.test")
+        for i in range(100):
+            logger.info(f"line {i}", extra={"task": f"task{i}"})
+        configure_logging("json", queued=False)
+
+        lines = stream.getvalue().splitlines()
+        assert [json.loads(line)["task"] for line in lines] == \
+            [f"task{i}" for i in range(100)]
+    finally:
+        configure_logging()
+        scheduler_logger._output.setStream(previous)
+
+
+def test_queued_exceptions_keep_their_field():
+    """Test that the traceback of a queued record is written as the
+    exception field and not folded into the message."""
+    stream = io.StringIO()
+    previous = scheduler_logger._output.setStream(stream)
+    try:
+        configure_logging("json")
+        logger = get_logger("scheduler.test")
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("it failed")
+        configure_logging("json", queued=False)
+
+        entry = json.loads(stream.getvalue())
+        assert entry["message"] == "it failed"
+        assert "ZeroDivisionError" in entry["exception"]
+    finally:
+        configure_logging()
+        scheduler_logger._output.setStream(previous)
@@ -0,0 +1,115 @@
+import pytest
+from scheduler.compact_tracker import CompactTaskTracker
+from scheduler.models import RunnerConfig, Task, TaskStatus
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+
+def exec_task(command: str, dependencies=(), stdin_from=None) -> Task:
+    return Task(type="exec", arguments=command, dependencies=dependencies,
+                stdin_from=stdin_from)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tracker_class", [TaskTracker, CompactTaskTracker])
+async def test_output_is_piped_into_dependent_tasks(tmp_path, tracker_class):
+    """Test a chain and a fan-out of tasks reading each other's output."""
+    task_tracker = tracker_class()
+    task_tracker.add_task("setup", exec_task("true"))
+    task_tracker.add_task("produce", exec_task(
+        "printf 'a\\nb\\nc\\n'", ("setup",)))
+    task_tracker.add_task("upper", exec_task(
+        "tr a-z A-Z", ("produce", "setup"), "produce"))
+    task_tracker.add_task("count", exec_task(
+        f"wc -l > {tmp_path}/count", ("upper",), "upper"))
+    task_tracker.add_task("copy", exec_task(
+        f"cat > {tmp_path}/copy", ("upper",), "upper"))
+    task_tracker.add_task("after", exec_task(
+        f"cat {tmp_path}/copy", ("copy",)))
+    task_tracker.prepare_topo_sorter()
+
+    await run_tasks(task_tracker, RunnerConfig(max_exec=1))
+
+    assert all(task.status == TaskStatus.OK
+               for task in task_tracker.tasks.values())
+    assert (tmp_path / "count").read_text().strip() == "3"
+    assert (tmp_path / "copy").read_text() == "A\nB\nC\n"
+
+
+@pytest.mark.asyncio
+async def test_failed_source_fails_its_readers():
+    """Test that a pipeline fails like with pipefail."""
+    task_tracker = TaskTracker()
+    task_tracker.add_task("produce", exec_task("echo x; exit 3"))
+    task_tracker.add_task("consume", exec_task("cat", ("produce",),
+                                               "produce"))
+    task_tracker.add_task("after", exec_task("true", ("consume",)))
+    task_tracker.prepare_topo_sorter()
+
+    await run_tasks(task_tracker)
+
+    assert task_tracker.tasks["produce"].status == TaskStatus.FAILED
+    assert task_tracker.tasks["consume"].status == TaskStatus.FAILED
+    assert task_tracker.tasks["after"].status == TaskStatus.SKIPPED
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tracker_class", [TaskTracker, CompactTaskTracker])
+async def test_restored_sources_run_again_for_their_readers(tmp_path,
+                                                            tracker_class):
+    """Test that the sources of a reader that did not succeed are run again
+    on resume, and that a reader that did succeed is left alone."""
+    task_tracker = tracker_class()
+    task_tracker.add_task("produce", exec_task("echo y"))
+    task_tracker.add_task("upper", exec_task("tr a-z A-Z", ("produce",),
+                                             "produce"))
+    task_tracker.add_task("read", exec_task(
+        f"cat > {tmp_path}/read", ("upper",), "upper"))
+    task_tracker.add_task("other", exec_task("echo z"))
+    task_tracker.add_task("copied", exec_task(
+        f"cat > {tmp_path}/copied", ("other",), "other"))
+    restored = task_tracker.restore({name: TaskStatus.OK for name in
+                                     ("produce", "upper", "other",
+                                      "copied")})
+    task_tracker.prepare_topo_sorter()
+
+    # The sources of "read" run again and are not counted
+    assert restored == 2
+
+    await run_tasks(task_tracker)
+
+    assert all(task.status == TaskStatus.OK
+               for task in task_tracker.tasks.values())
+    assert (tmp_path / "read").read_text() == "Y\n"
+    assert not (tmp_path / "copied").exists()
+
+
+@pytest.mark.parametrize("tracker_class", [TaskTracker, CompactTaskTracker])
+@pytest.mark.parametrize("tasks, message", [
+    ({"a": Task(type="eval", arguments="print(1)"),
+      "b": exec_task("cat", ("a",), "a")}, "only 'exec' tasks"),
+    ({"a": exec_task("true"),
+      "b": exec_task("cat", (), "a")}, "not one of its dependencies"),
+    ({"a": exec_task("true"), "c": exec_task("true"),
+      "b": exec_task("cat", ("a", "c"), "a")}, "dependencies of 'a' too: c"),
+])
+def test_invalid_pipes_are_rejected(tracker_class, tasks, message):
+    """Test that only tasks that can start together can be piped."""
+    task_tracker = tracker_class()
+    for name, task in tasks.items():
+        task_tracker.add_task(name, task)
+
+    with pytest.raises(ValueError, match=message):
+        task_tracker.prepare_topo_sorter()
+
+
+def test_selection_drops_unselected_sources():
+    """Test that a task whose source is not selected reads nothing."""
+    task_tracker = TaskTracker()
+    task_tracker.add_task("a", exec_task("true"))
+    task_tracker.add_task("b", exec_task("cat", ("a",), "a"))
+    task_tracker.add_task("c", exec_task("cat", ("b",), "b"))
+    task_tracker.select(exclude=["a"])
+
+    assert task_tracker.pipes() == {"b": ["c"]}
+    assert task_tracker.tasks["b"].stdin_from is None
@@ -0,0 +1,43 @@
+from scheduler.models import RunnerConfig, Task
+from scheduler.plan import Plan
+from scheduler.task_tracker import TaskTracker
+
+
+def build_graph():
+    """Build a diamond next to a separate task, all with durations."""
+    task_tracker = TaskTracker()
+    task_tracker.add_task("a", Task(type="exec", arguments="", duration=1))
+    task_tracker.add_task("b", Task(type="exec", arguments="", duration=5,
+                                    dependencies=("a",)))
+    task_tracker.add_task("c", Task(type="eval", arguments="", duration=2,
+                                    dependencies=("a",)))
+    task_tracker.add_task("d", Task(type="exec", arguments="", duration=1,
+                                    dependencies=("b", "c")))
+    task_tracker.add_task("e", Task(type="exec", arguments="", duration=4))
+    task_tracker.prepare_topo_sorter()
+    return task_tracker
+
+
+def test_plan_describes_the_graph():
+    """Test the depth, widths, critical path and parallelism of a graph."""
+    plan = Plan(build_graph())
+
+    assert plan.depth == 3
+    assert plan.widths == [2, 2, 1]
+    assert plan.total_work == 13
+    assert plan.critical_path == ["a", "b", "d"]
+    assert plan.critical_path_length == 7
+    assert plan.peak_parallelism == 3
+
+
+def test_plan_estimates_the_makespan():
+    """Test that the simulated run follows the priorities and the limits."""
+    plan = Plan(build_graph())
+
+    assert plan.makespan(RunnerConfig(max_concurrency=1)) == 13
+    # a and e start first; b runs on the freed slot and c after e
+    assert plan.makespan(RunnerConfig(max_concurrency=2)) == 7
+    # A single exec slot runs a, b, d and e one after the other
+    assert plan.makespan(RunnerConfig(max_exec=1)) == 11
+    assert plan.makespan(RunnerConfig()) == plan.critical_path_length
+    assert "Critical path: 7.000s, 3 tasks" in plan.summary()
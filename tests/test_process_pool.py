@@ -0,0 +1,91 @@
+import asyncio
+import os
+import sys
+import time
+import pytest
+from scheduler.executor import create_eval_executor, execute_task
+from scheduler.models import Task
+from scheduler.process_pool import (
+    CallTimeoutError,
+    WorkerLostError,
+    WorkerProcessPool,
+)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_eval_output_is_not_mixed():
+    """Test that concurrent 'eval' tasks in worker processes each capture
+    their own output."""
+    tasks = [
+        Task(type="eval",
+             arguments=f"import time\nfor _ in range(3):\n"
+                       f"    print({i}); time.sleep(0.01)")
+        for i in range(8)
+    ]
+    with create_eval_executor("process", max_workers=4) as pool:
+        results = await asyncio.gather(
+            *(execute_task(task, pool) for task in tasks))
+
+    for i, result in enumerate(results):
+        assert result.return_code == 0
+        assert result.stdout == "\n".join([str(i)] * 3)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_eval_output_in_threads_is_not_mixed():
+    """Test that concurrent 'eval' tasks in the thread pool each capture
+    their own output and leave the standard streams untouched."""
+    stdout = sys.stdout
+    tasks = [
+        Task(type="eval",
+             arguments=f"import time\nfor _ in range(3):\n"
+                       f"    print({i}); time.sleep(0.01)")
+        for i in range(8)
+    ]
+    with create_eval_executor("thread", max_workers=8) as pool:
+        results = await asyncio.gather(
+            *(execute_task(task, pool) for task in tasks))
+
+    for i, result in enumerate(results):
+        assert result.stdout == "\n".join([str(i)] * 3)
+    assert sys.stdout is stdout
+
+
+@pytest.mark.asyncio
+async def test_eval_exception_in_worker_process():
+    """Test that exceptions raised in a worker process are reported."""
+    task = Task(type="eval", arguments="raise ValueError('eval exception')")
+    with create_eval_executor("process", max_workers=1) as pool:
+        result = await execute_task(task, pool)
+    assert result.return_code is None
+    assert isinstance(result.exception, ValueError)
+
+
+@pytest.mark.asyncio
+async def test_preloaded_modules_are_available():
+    """Test that preloaded modules can be used without importing them."""
+    task = Task(type="eval", arguments="print(json.dumps([1]))")
+    with create_eval_executor("process", max_workers=1,
+                              preload=["json"]) as pool:
+        result = await execute_task(task, pool)
+    assert result.stdout == "[1]"
+
+
+def test_lost_worker_is_replaced():
+    """Test that a worker that dies only fails its own call and is
+    replaced by a new process."""
+    with WorkerProcessPool(max_workers=1) as pool:
+        pid = pool.submit(os.getpid).result()
+        with pytest.raises(WorkerLostError):
+            pool.submit(os._exit, 1).result()
+        assert pool.submit(os.getpid).result() != pid
+
+
+def test_timed_out_worker_is_replaced():
+    """Test that a call that runs out of time kills its worker, and that
+    the pool keeps serving calls with a new process."""
+    with WorkerProcessPool(max_workers=1) as pool:
+        pid = pool.submit(os.getpid).result()
+        with pytest.raises(CallTimeoutError):
+            pool.submit_with_timeout(0.2, time.sleep, 10).result()
+        assert pool.submit_with_timeout(5, os.getpid).result() != pid
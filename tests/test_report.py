@@ -0,0 +1,83 @@
+import csv
+import json
+import pytest
+from scheduler.models import Task, TaskStatus
+from scheduler.report import Reporter
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+
+
+def build_tracker(skipped: int = 30):
+    task_tracker = TaskTracker()
+    task_tracker.add_task("ok", Task(type="eval", arguments="pass"))
+    task_tracker.add_task("bad", Task(type="eval", arguments="1 / 0"))
+    for i in range(skipped):
+        task_tracker.add_task(
+            f"skip{i}",
+            Task(type="eval", arguments="pass", dependencies=("bad",)),
+        )
+    task_tracker.prepare_topo_sorter()
+    return task_tracker
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("file_name", ["report.jsonl", "report.csv"])
+async def test_results_are_streamed_to_the_report(tmp_path, file_name):
+    """Test that every finished task is written to the report file."""
+    task_tracker = build_tracker()
+    path = tmp_path / file_name
+    reporter = Reporter(len(task_tracker.tasks), str(path))
+    task_tracker.status_listeners.append(reporter.record)
+
+    await run_tasks(task_tracker)
+    reporter.close()
+
+    with open(path, newline="") as f:
+        if file_name.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f]
+    statuses = {row["task"]: row["status"] for row in rows}
+    assert len(rows) == len(task_tracker.tasks)
+    assert statuses["ok"] == "OK"
+    assert statuses["bad"] == "FAILED"
+    assert statuses["skip0"] == "SKIPPED"
+    assert all(row["duration"] for row in rows if row["status"] != "SKIPPED")
+
+
+@pytest.mark.asyncio
+async def test_summary_is_aggregated():
+    """Test that the summary counts statuses and only lists a bounded
+    number of skipped tasks."""
+    task_tracker = build_tracker()
+    reporter = Reporter(len(task_tracker.tasks) + 1, slowest=1, listed=5)
+    task_tracker.status_listeners.append(reporter.record)
+
+    await run_tasks(task_tracker)
+    lines = reporter.summary().splitlines()
+
+    assert lines[0] == "33 tasks: OK 1, FAILED 1, SKIPPED 30, NOT RUN 1"
+    assert lines[1] == "Slowest tasks:"
+    assert len([line for line in lines if line.startswith("  ")]) == 1
+    assert "Failed: bad" in lines
+    assert lines[-1] == ("Skipped: skip0, skip1, skip2, skip3, skip4 "
+                         "and 25 more")
+    assert reporter.counts[TaskStatus.SKIPPED] == 30
+
+
+@pytest.mark.asyncio
+async def test_timeouts_are_reported_separately():
+    """Test that tasks that ran out of time are counted and listed apart
+    from failed tasks."""
+    task_tracker = build_tracker(skipped=0)
+    task_tracker.add_task(
+        "stuck", Task(type="exec", arguments="sleep 10", timeout=0.2))
+    task_tracker.prepare_topo_sorter()
+    reporter = Reporter(len(task_tracker.tasks))
+    task_tracker.status_listeners.append(reporter.record)
+
+    await run_tasks(task_tracker)
+    lines = reporter.summary().splitlines()
+
+    assert lines[0] == "3 tasks: OK 1, FAILED 1, TIMEOUT 1"
+    assert "Timed out: stuck" in lines
@@ -0,0 +1,55 @@
+import os
+from scheduler.resources import ResourcePool, detect_capacity
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_capacity_is_capped_by_cgroup_v2(tmp_path):
+    """Test that the CPU quota and the memory left in a cgroup v2 cap the
+    detected capacity."""
+    proc, cgroup = str(tmp_path / "proc"), str(tmp_path / "cgroup")
+    write(f"{proc}/self/cgroup", "0::/job\n")
+    write(f"{proc}/meminfo", "MemTotal: 8388608 kB\n"
+                             "MemAvailable: 4194304 kB\n")
+    write(f"{cgroup}/job/cpu.max", "50000 100000\n")
+    write(f"{cgroup}/job/memory.max", str(3 * 2 ** 30))
+    write(f"{cgroup}/job/memory.current", str(2 ** 30))
+
+    assert detect_capacity(proc, cgroup) == (0.5, 2048)
+
+    write(f"{cgroup}/job/cpu.max", "max 100000\n")
+    write(f"{cgroup}/job/memory.max", "max\n")
+    cpus, memory = detect_capacity(proc, cgroup)
+    assert cpus == len(os.sched_getaffinity(0))
+    assert memory == 4096
+
+
+def test_capacity_is_capped_by_cgroup_v1(tmp_path):
+    """Test that cgroup v1 limits are read from the mount root when the
+    cgroup of the process is not visible, as in containers."""
+    proc, cgroup = str(tmp_path / "proc"), str(tmp_path / "cgroup")
+    write(f"{proc}/self/cgroup", "4:memory:/outside\n1:cpu,cpuacct:/\n")
+    write(f"{proc}/meminfo", "MemAvailable: 4194304 kB\n")
+    write(f"{cgroup}/cpu/cpu.cfs_quota_us", "200000\n")
+    write(f"{cgroup}/cpu/cpu.cfs_period_us", "100000\n")
+    write(f"{cgroup}/memory/memory.limit_in_bytes", str(2 ** 30))
+    write(f"{cgroup}/memory/memory.usage_in_bytes", str(2 ** 29))
+
+    cpus, memory = detect_capacity(proc, cgroup)
+    assert cpus == min(2, len(os.sched_getaffinity(0)))
+    assert memory == 512
+
+
+def test_pool_clamps_oversized_requirements():
+    """Test that requirements beyond the capacity are capped, so the task
+    can run once the pool is idle."""
+    pool = ResourcePool(cpus=4, memory_mb=1000)
+    assert pool.clamp(8, 2000) == (4, 1000)
+    pool.acquire(1, 100)
+    assert not pool.fits(4, 1000)
+    pool.release(1, 100)
+    assert pool.fits(4, 1000)
@@ -0,0 +1,341 @@
+import asyncio
+import logging
+import time
+import pytest
+from scheduler.executor import TaskExecutor
+from scheduler.models import ExecutionResult, RunnerConfig, Task, TaskStatus
+from scheduler.resources import ResourcePool
+from scheduler.runner import Dispatcher, run_tasks
+from scheduler.task_tracker import TaskTracker
+
+
+@pytest.mark.asyncio
+async def test_chain_is_dispatched_without_polling():
+    """Test that a long chain of trivial tasks finishes without idle time
+    between dependent tasks."""
+    task_tracker = TaskTracker()
+    for i in range(50):
+        dependencies = (f"task{i - 1}",) if i else ()
+        task_tracker.add_task(
+            f"task{i}",
+            Task(type="eval", arguments="pass", dependencies=dependencies),
+        )
+    task_tracker.prepare_topo_sorter()
+
+    start = time.perf_counter()
+    await run_tasks(task_tracker)
+
+    # With a 0.25s polling interval this would take more than 12 seconds
+    assert time.perf_counter() - start < 2
+    assert all(task.status == TaskStatus.OK
+               for task in task_tracker.tasks.values())
+
+
+@pytest.mark.asyncio
+async def test_skipped_tasks_do_not_stall_dispatch():
+    """Test that the dispatcher drains skipped subtrees when nothing else
+    is running."""
+    task_tracker = TaskTracker()
+    task_tracker.add_task("task1", Task(type="exec", arguments="false"))
+    task_tracker.add_task(
+        "task2", Task(type="exec", arguments="true", dependencies=("task1",))
+    )
+    task_tracker.add_task(
+        "task3", Task(type="exec", arguments="true", dependencies=("task2",))
+    )
+    task_tracker.prepare_topo_sorter()
+
+    await run_tasks(task_tracker)
+
+    assert task_tracker.tasks["task1"].status == TaskStatus.FAILED
+    assert task_tracker.tasks["task2"].status == TaskStatus.SKIPPED
+    assert task_tracker.tasks["task3"].status == TaskStatus.SKIPPED
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limits_are_respected(monkeypatch):
+    """Test that no more tasks run at once than the configured limits."""
+    running = {"exec": 0, "eval": 0}
+    peak = {"exec": 0, "eval": 0, "total": 0}
+
+    async def fake_execute(self, task, name=None):
+        running[task.type] += 1
+        peak[task.type] = max(peak[task.type], running[task.type])
+        peak["total"] = max(peak["total"], sum(running.values()))
+        await asyncio.sleep(0.01)
+        running[task.type] -= 1
+        return ExecutionResult(return_code=0)
+
+    monkeypatch.setattr(TaskExecutor, "execute", fake_execute)
+
+    task_tracker = TaskTracker()
+    for i in range(20):
+        task_tracker.add_task(f"exec{i}", Task(type="exec", arguments=""))
+        task_tracker.add_task(f"eval{i}", Task(type="eval", arguments=""))
+    task_tracker.prepare_topo_sorter()
+
+    await run_tasks(task_tracker, RunnerConfig(max_concurrency=5,
+                                               max_exec=3,
+                                               max_eval=2,
+                                               eval_batch_threshold=0))
+
+    assert peak == {"exec": 3, "eval": 2, "total": 5}
+    assert all(task.status == TaskStatus.OK
+               for task in task_tracker.tasks.values())
+
+
+@pytest.mark.asyncio
+async def test_critical_path_is_started_first(monkeypatch):
+    """Test that with limited concurrency the ready task on the longest
+    path is started before cheap independent tasks."""
+    started = []
+
+    async def fake_execute(self, task, name=None):
+        started.append(name)
+        return ExecutionResult(return_code=0)
+
+    monkeypatch.setattr(TaskExecutor, "execute", fake_execute)
+
+    task_tracker = TaskTracker()
+    for i in range(5):
+        task_tracker.add_task(f"wide{i}", Task(type="exec", arguments=""))
+    for i in range(5):
+        dependencies = (f"chain{i - 1}",) if i else ()
+        task_tracker.add_task(
+            f"chain{i}",
+            Task(type="exec", arguments="", dependencies=dependencies),
+        )
+    task_tracker.prepare_topo_sorter()
+
+    await run_tasks(task_tracker, RunnerConfig(max_concurrency=1))
+
+    assert started[0] == "chain0"
+
+
+@pytest.mark.asyncio
+async def test_fail_fast_cancels_running_tasks():
+    """Test that the first failure cancels the running tasks and stops
+    dispatching in fail-fast mode."""
+    task_tracker = TaskTracker()
+    task_tracker.add_task("slow", Task(type="exec", arguments="sleep 10"))
+    task_tracker.add_task(
+        "bad", Task(type="exec", arguments="sleep 0.2; false")
+    )
+    task_tracker.add_task(
+        "after", Task(type="exec", arguments="true", dependencies=("slow",))
+    )
+    task_tracker.prepare_topo_sorter()
+
+    start = time.perf_counter()
+    await run_tasks(task_tracker, RunnerConfig(fail_fast=True))
+
+    assert time.perf_counter() - start < 5
+    assert task_tracker.tasks["bad"].status == TaskStatus.FAILED
+    assert task_tracker.tasks["slow"].status == TaskStatus.CANCELLED
+    assert task_tracker.tasks["after"].status == TaskStatus.PENDING
+
+
+@pytest.mark.asyncio
+async def test_short_eval_tasks_are_batched(monkeypatch, caplog):
+    """Test that tiny 'eval' tasks run in batches, while their status and
+    output are still recorded per task."""
+    calls = []
+    execute_batch = TaskExecutor.execute_batch
+
+    async def counting_execute_batch(self, tasks):
+        calls.append(len(tasks))
+        return await execute_batch(self, tasks)
+
+    monkeypatch.setattr(TaskExecutor, "execute_batch",
+                        counting_execute_batch)
+
+    task_tracker = TaskTracker()
+    task_tracker.add_task("root", Task(type="eval", arguments="pass"))
+    for i in range(200):
+        task_tracker.add_task(
+            f"task{i}",
+            Task(type="eval", arguments=f"print({i})",
+                 dependencies=("root",)))
+    task_tracker.add_task(
+        "failing", Task(type="eval", arguments="1 / 0",
+                        dependencies=("root",)))
+    task_tracker.add_task(
+        "after", Task(type="eval", arguments="pass",
+                      dependencies=("failing",)))
+    task_tracker.add_task(
+        "long", Task(type="eval", arguments="pass", duration=1.0,
+                     dependencies=("root",)))
+    task_tracker.prepare_topo_sorter()
+
+    # A generous time budget, so no task is postponed on a loaded machine
+    with caplog.at_level(logging.INFO):
+        await run_tasks(task_tracker, RunnerConfig(eval_batch_time=1.0))
+
+    assert sum(calls) == 201 and len(calls) < 10
+    assert task_tracker.tasks["task7"].status == TaskStatus.OK
+    assert "Output task7: 7" in caplog.text
+    assert task_tracker.tasks["failing"].status == TaskStatus.FAILED
+    assert task_tracker.tasks["after"].status == TaskStatus.SKIPPED
+    assert task_tracker.tasks["long"].status == TaskStatus.OK
+    assert all(name in task_tracker.durations
+               for name in ("root", "task0", "task199", "long"))
+
+
+@pytest.mark.asyncio
+async def test_eval_tasks_are_not_batched_before_a_measurement(monkeypatch):
+    """Test that nothing is batched while no 'eval' task has finished, as
+    the duration of the first ones is unknown."""
+    calls = []
+    execute_batch = TaskExecutor.execute_batch
+
+    async def counting_execute_batch(self, tasks):
+        calls.append(len(tasks))
+        return await execute_batch(self, tasks)
+
+    monkeypatch.setattr(TaskExecutor, "execute_batch",
+                        counting_execute_batch)
+
+    task_tracker = TaskTracker()
+    for i in range(50):
+        task_tracker.add_task(f"task{i}", Task(type="eval", arguments="pass"))
+    task_tracker.prepare_topo_sorter()
+
+    await run_tasks(task_tracker,
+                    RunnerConfig(max_eval=1, eval_batch_time=1.0))
+
+    # The first task runs on its own, the rest once it was measured
+    assert sum(calls) == 49
+    assert all(task.status == TaskStatus.OK
+               for task in task_tracker.tasks.values())
+
+
+@pytest.mark.asyncio
+async def test_timed_out_task_skips_dependents():
+    """Test that a task that exceeds its timeout is marked TIMEOUT, its
+    dependents are skipped, and the default timeout applies to the other
+    tasks."""
+    task_tracker = TaskTracker()
+    task_tracker.add_task(
+        "stuck", Task(type="exec", arguments="sleep 10", timeout=0.2))
+    task_tracker.add_task(
+        "after", Task(type="exec", arguments="true", dependencies=("stuck",)))
+    # Thread mode cannot stop a snippet, so this one ends on its own
+    task_tracker.add_task(
+        "slow", Task(type="eval", arguments="import time; time.sleep(2)"))
+    task_tracker.add_task("quick", Task(type="eval", arguments="pass"))
+    task_tracker.prepare_topo_sorter()
+
+    start = time.perf_counter()
+    await run_tasks(task_tracker, RunnerConfig(default_timeout=0.5))
+
+    assert time.perf_counter() - start < 5
+    assert task_tracker.tasks["stuck"].status == TaskStatus.TIMEOUT
+    assert task_tracker.tasks["after"].status == TaskStatus.SKIPPED
+    assert task_tracker.tasks["slow"].status == TaskStatus.TIMEOUT
+    assert task_tracker.tasks["quick"].status == TaskStatus.OK
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backfill_window", [10.0, 0.0])
+async def test_tasks_are_packed_by_requirements(monkeypatch,
+                                                backfill_window):
+    """Test that tasks with CPU and memory requirements never oversubscribe
+    the capacity, that small tasks backfill around a task that does not fit,
+    and that without a backfill window that task goes first."""
+    started = []
+    used = {"cpus": 0.0, "memory": 0.0}
+    peak = {"cpus": 0.0, "memory": 0.0}
+
+    async def fake_execute(self, task, name=None):
+        started.append(name)
+        used["cpus"] += task.cpus
+        used["memory"] += task.memory_mb
+        peak["cpus"] = max(peak["cpus"], used["cpus"])
+        peak["memory"] = max(peak["memory"], used["memory"])
+        await asyncio.sleep(task.duration)
+        used["cpus"] -= task.cpus
+        used["memory"] -= task.memory_mb
+        return ExecutionResult(return_code=0)
+
+    monkeypatch.setattr(TaskExecutor, "execute", fake_execute)
+
+    task_tracker = TaskTracker()
+    task_tracker.add_task("medium", Task(type="exec", arguments="",
+                                         duration=0.2, cpus=2, memory_mb=100))
+    task_tracker.add_task("big", Task(type="exec", arguments="",
+                                      duration=0.1, cpus=4, memory_mb=800))
+    for i in range(6):
+        task_tracker.add_task(f"small{i}", Task(type="exec", arguments="",
+                                                duration=0.01, cpus=1,
+                                                memory_mb=300))
+    task_tracker.prepare_topo_sorter()
+
+    await run_tasks(task_tracker, RunnerConfig(
+        cpu_capacity=4, memory_capacity_mb=1000,
+        backfill_window=backfill_window))
+
+    assert peak["cpus"] <= 4 and peak["memory"] <= 1000
+    assert started[0] == "medium"
+    if backfill_window:
+        assert started.index("big") > started.index("small0")
+    else:
+        assert started[1] == "big"
+    assert all(task.status == TaskStatus.OK
+               for task in task_tracker.tasks.values())
+
+
+@pytest.mark.asyncio
+async def test_dispatchers_share_a_resource_pool(monkeypatch):
+    """Test that a dispatcher whose task does not fit in a shared pool waits
+    for the other dispatcher to release it instead of spinning."""
+    running = []
+
+    async def fake_execute(self, task, name=None):
+        running.append(name)
+        assert len(running) == 1
+        await asyncio.sleep(0.1)
+        running.remove(name)
+        return ExecutionResult(return_code=0)
+
+    monkeypatch.setattr(TaskExecutor, "execute", fake_execute)
+
+    resources = ResourcePool(cpus=2, memory_mb=1000)
+    dispatchers = []
+    for graph in ("first", "second"):
+        task_tracker = TaskTracker()
+        for i in range(2):
+            task_tracker.add_task(f"{graph}{i}", Task(
+                type="exec", arguments="", cpus=2))
+        task_tracker.prepare_topo_sorter()
+        dispatchers.append(Dispatcher(task_tracker, resources=resources))
+
+    await asyncio.wait_for(asyncio.gather(
+        *(dispatcher.run() for dispatcher in dispatchers)), 5)
+
+    assert all(task.status == TaskStatus.OK
+               for dispatcher in dispatchers
+               for task in dispatcher.task_tracker.tasks.values())
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("task_type", ["exec", "eval"])
+async def test_raising_runner_fails_its_task(monkeypatch, task_type):
+    """Test that a task whose runner raises is recorded as FAILED and the
+    run still finishes."""
+
+    async def broken_execute(self, task, name=None):
+        raise RuntimeError("broken executor")
+
+    monkeypatch.setattr(TaskExecutor, "execute", broken_execute)
+
+    task_tracker = TaskTracker()
+    task_tracker.add_task("broken", Task(type=task_type, arguments=""))
+    task_tracker.add_task("after", Task(type=task_type, arguments="",
+                                        dependencies=("broken",)))
+    task_tracker.prepare_topo_sorter()
+
+    await asyncio.wait_for(run_tasks(
+        task_tracker, RunnerConfig(eval_batch_threshold=0)), 5)
+
+    assert task_tracker.tasks["broken"].status == TaskStatus.FAILED
+    assert task_tracker.tasks["after"].status == TaskStatus.SKIPPED
@@ -33,3 +33,47 @@ async def test_missing_schema_file(tmp_path, caplog):
         await runner.main()
         assert "Failed to load tasks" in caplog.text
         assert "No such file or directory" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_plan_does_not_run_tasks(tmp_path, capsys):
+    """
+    Test that --plan prints the analysis of the graph without running it.
+    """
+    marker = tmp_path / "ran"
+    input_file = tmp_path / "input.json"
+    input_file.write_text(
+        '{"tasks": [{"name": "a", "type": "exec", "arguments": "touch %s", '
+        '"dependencies": []}]}' % marker)
+    with patch("sys.argv",
+               ["runner.py",
+                "--input",
+                str(input_file),
+                "--plan"]):
+        await runner.main()
+    assert "Depth: 1 levels" in capsys.readouterr().out
+    assert not marker.exists()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("eval_mode, logged", [("thread", True),
+                                               ("process", False)])
+async def test_compile_cache_is_logged_in_thread_mode(tmp_path, caplog,
+                                                      eval_mode, logged):
+    """
+    Test that the counters of the compile cache are only logged when the
+    snippets ran in this process, whose cache they describe.
+    """
+    input_file = tmp_path / "input.json"
+    input_file.write_text(
+        '{"tasks": [{"name": "a", "type": "eval", "arguments": "x = 1"}]}')
+    with patch("sys.argv",
+               ["runner.py",
+                "--input",
+                str(input_file),
+                "--eval-mode",
+                eval_mode]):
+        with caplog.at_level("INFO"):
+            await runner.main()
+    assert "Ended:   a" in caplog.text
+    assert ("Eval compile cache" in caplog.text) == logged
@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+import pytest
+from scheduler.schema import covers_task_model, split_tasks_schema
+
+SCHEMA = json.loads(
+    (Path(__file__).parent.parent / "assignment" / "schema.json").read_text()
+)
+ITEM_SCHEMA = SCHEMA["properties"]["tasks"]["items"]
+
+
+def test_array_keywords_are_split_off():
+    """Test that the keywords of the tasks array that depend on its items
+    are removed from the schema of the document and returned."""
+    tasks = dict(SCHEMA["properties"]["tasks"], minItems=1, uniqueItems=True)
+    schema = dict(SCHEMA, properties=dict(SCHEMA["properties"], tasks=tasks))
+
+    document_schema, items, keywords = split_tasks_schema(schema)
+    assert keywords == {"minItems": 1, "uniqueItems": True}
+    assert items == ITEM_SCHEMA
+    assert document_schema["properties"]["tasks"] == SCHEMA["properties"][
+        "tasks"]
+    assert split_tasks_schema(SCHEMA) == (SCHEMA, ITEM_SCHEMA, {})
+
+
+@pytest.mark.parametrize("schema", [
+    {"allOf": [{"properties": {"tasks": {"minItems": 2}}}]},
+    {"properties": {"tasks": {"$ref": "#/definitions/tasks"}}},
+    {"properties": {"tasks": {"items": [{"type": "object"}]}}},
+    {"properties": {"tasks": {"prefixItems": [{"type": "object"}]}}},
+])
+def test_schemas_of_the_whole_array_are_not_split(schema):
+    """Test that schemas that constrain the tasks array in other ways are
+    left to validate the whole array."""
+    assert split_tasks_schema(schema) is None
+
+
+def test_item_schema_covers_the_task_model():
+    """Test that only item schemas as strict as the input model cover it."""
+    assert covers_task_model(ITEM_SCHEMA)
+    loose = json.loads(json.dumps(ITEM_SCHEMA))
+    del loose["properties"]["timeout"]["exclusiveMinimum"]
+    assert not covers_task_model(loose)
+    del loose["properties"]["timeout"]
+    assert not covers_task_model(loose)
+    assert covers_task_model(dict(loose, additionalProperties=False))
@@ -1,3 +1,4 @@
+import pytest
 from scheduler.models import Task, TaskStatus
 from scheduler.task_tracker import TaskTracker
 
@@ -44,18 +45,73 @@ def test_dependencies_of_failed_task_are_skipped():
 
     task_tracker.prepare_topo_sorter()
 
-    # Simulate task1 failing
-    task_tracker.tasks["task1"].status = TaskStatus.FAILED
+    # Simulate task1 failing: its whole downstream is skipped at once
     ready_tasks = task_tracker.get_ready()
-    assert "task1" in ready_tasks
-    task_tracker.topo_sorter.done("task1")
-
-    # Now, task2 should be skipped
-    ready_tasks = task_tracker.get_ready()
-    assert not ready_tasks
+    assert ready_tasks == {"task1"}
+    task_tracker.set_status("task1", TaskStatus.FAILED)
     assert task_tracker.tasks["task2"].status == TaskStatus.SKIPPED
+    assert task_tracker.tasks["task3"].status == TaskStatus.SKIPPED
+    task_tracker.done("task1")
 
-    # And task3 should also be skipped
+    # The skipped tasks are drained without being returned
     ready_tasks = task_tracker.get_ready()
     assert not ready_tasks
-    assert task_tracker.tasks["task3"].status == TaskStatus.SKIPPED
+    assert not task_tracker.is_active()
+
+
+def test_priorities_follow_the_critical_path():
+    """Test that the priority of a task is the longest weighted path from
+    the task to the end of the graph."""
+    task_tracker = TaskTracker()
+    task_tracker.add_task("a", Task(type="exec", arguments="", duration=1))
+    task_tracker.add_task(
+        "b", Task(type="exec", arguments="", dependencies=("a",), duration=5)
+    )
+    task_tracker.add_task(
+        "c", Task(type="exec", arguments="", dependencies=("a",), duration=2)
+    )
+    task_tracker.add_task(
+        "d", Task(type="exec", arguments="", dependencies=("b", "c"))
+    )
+    task_tracker.add_task("e", Task(type="exec", arguments=""))
+    task_tracker.history = {"d": 3, "e": 4}
+
+    task_tracker.prepare_topo_sorter()
+
+    assert task_tracker.priorities == {
+        "a": 9, "b": 8, "c": 5, "d": 3, "e": 4,
+    }
+
+
+def test_select_prunes_the_graph():
+    """Test that selection keeps the targets and their dependencies, or the
+    tasks downstream of a change, and drops edges to excluded tasks."""
+    def build():
+        task_tracker = TaskTracker()
+        task_tracker.add_task("a", Task(type="exec", arguments=""))
+        task_tracker.add_task("b", Task(type="exec", arguments="",
+                                        dependencies=("a",)))
+        task_tracker.add_task("c", Task(type="exec", arguments="",
+                                        dependencies=("a",)))
+        task_tracker.add_task("d", Task(type="exec", arguments="",
+                                        dependencies=("b", "c")))
+        task_tracker.add_task("e", Task(type="exec", arguments=""))
+        return task_tracker
+
+    task_tracker = build()
+    task_tracker.select(targets=["b"])
+    assert list(task_tracker.tasks) == ["a", "b"]
+
+    task_tracker = build()
+    task_tracker.select(targets=["d"], exclude=["b"])
+    assert list(task_tracker.tasks) == ["a", "c", "d"]
+    assert task_tracker.tasks["d"].dependencies == ("c",)
+
+    task_tracker = build()
+    task_tracker.select(downstream_of=["c"])
+    assert list(task_tracker.tasks) == ["c", "d"]
+    task_tracker.prepare_topo_sorter()
+    assert task_tracker.get_ready() == {"c"}
+
+    with pytest.raises(KeyError):
+        build().select(targets=["x"])
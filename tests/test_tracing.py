@@ -0,0 +1,72 @@
+import json
+import pytest
+from scheduler.models import Task
+from scheduler.runner import run_tasks
+from scheduler.task_tracker import TaskTracker
+from scheduler.tracing import Tracer
+
+
+def build_tracker():
+    task_tracker = TaskTracker()
+    task_tracker.add_task("a", Task(type="eval", arguments="pass"))
+    task_tracker.add_task("b", Task(type="exec", arguments="sleep 0.05"))
+    task_tracker.add_task(
+        "c", Task(type="eval", arguments="pass", dependencies=("a", "b"))
+    )
+    task_tracker.add_task("bad", Task(type="exec", arguments="false"))
+    task_tracker.add_task(
+        "after", Task(type="exec", arguments="true", dependencies=("bad",))
+    )
+    task_tracker.prepare_topo_sorter()
+    return task_tracker
+
+
+@pytest.mark.asyncio
+async def test_trace_records_every_phase(tmp_path):
+    """Test that every executed task is traced from ready to finished and
+    that its slices do not overlap other tasks on the same lane."""
+    task_tracker = build_tracker()
+    tracer = Tracer()
+    await run_tasks(task_tracker, tracer=tracer)
+
+    assert set(tracer.tasks) == {"a", "b", "c", "bad"}
+    for timing in tracer.tasks.values():
+        assert (timing.ready <= timing.dispatched <= timing.started
+                <= timing.finished)
+
+    trace_file = tmp_path / "trace.json"
+    tracer.write_trace(trace_file, {
+        name: task.dependencies for name, task in task_tracker.tasks.items()})
+    events = json.loads(trace_file.read_text())["traceEvents"]
+
+    slices = [event for event in events
+              if event["ph"] == "X" and event["cat"] in ("exec", "eval")]
+    assert {event["name"] for event in slices} == {"a", "b", "c", "bad"}
+    c = next(event for event in slices if event["name"] == "c")
+    assert c["args"] == {"status": "OK", "blocked_by": "b"}
+
+    lanes = {}
+    for event in sorted(events, key=lambda event: event.get("ts", 0)):
+        if event["ph"] == "X" and event["tid"]:
+            # Timestamps are rounded to 0.1us
+            assert event["ts"] >= lanes.get(event["tid"], 0) - 1
+            lanes[event["tid"]] = event["ts"] + event["dur"]
+
+
+@pytest.mark.asyncio
+async def test_metrics_aggregate_the_run(tmp_path):
+    """Test the Prometheus textfile export."""
+    task_tracker = build_tracker()
+    tracer = Tracer()
+    await run_tasks(task_tracker, tracer=tracer)
+
+    metrics_file = tmp_path / "scheduler.prom"
+    tracer.write_metrics(metrics_file)
+    lines = metrics_file.read_text().splitlines()
+
+    assert 'scheduler_tasks_total{type="eval",status="OK"} 2' in lines
+    assert 'scheduler_tasks_total{type="exec",status="FAILED"} 1' in lines
+    assert "scheduler_tasks_skipped_total 1" in lines
+    assert ('scheduler_task_execution_seconds_bucket'
+            '{type="exec",le="+Inf"} 2') in lines
+    assert "# TYPE scheduler_task_queued_seconds histogram" in lines